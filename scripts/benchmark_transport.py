@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+传输层基准测试
+
+以相同的并发任务请求和文件下载分别测试 requests 传输和 httpx（HTTP/2）传输，
+输出吞吐量、延迟分位数和使用的连接数。
+
+默认在本机启动后端替身（tests/fake_backend.py，HTTP/1.1），此时 http2 传输
+协商为 HTTP/1.1，比较的是连接池复用；使用 --url 指向支持 HTTP/2 的后端
+（https，或配合 --h2c 使用明文 HTTP/2）时可比较多路复用。
+
+用法:
+    python scripts/benchmark_transport.py
+    python scripts/benchmark_transport.py --requests 500 --concurrency 32 --download-size 1048576
+    python scripts/benchmark_transport.py --url https://browser-api.internal:52101 --file-id <file_id>
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.metrics import LatencyHistogram  # noqa: E402
+from src.transport import create_transport  # noqa: E402
+
+
+def run_benchmark(transport, base_url, total, concurrency, file_id):
+    """并发发送任务请求和下载请求（各占一半），返回 (耗时, 任务直方图, 下载直方图, 失败数)"""
+    tasks, downloads = LatencyHistogram(), LatencyHistogram()
+    failures = 0
+
+    def one(index):
+        nonlocal failures
+        started = time.monotonic()
+        try:
+            if file_id and index % 2:
+                response = transport.request("GET", f"{base_url}/downloads/{file_id}", timeout=60, stream=True)
+                for _ in response.iter_content(chunk_size=64 * 1024):
+                    pass
+                histogram = downloads
+            else:
+                response = transport.request(
+                    "POST",
+                    f"{base_url}/agent/task",
+                    json={"query": "基准测试", "task_id": f"bench-{index}", "timeout": 60},
+                    timeout=60,
+                    stream=True
+                )
+                b"".join(response.iter_content(chunk_size=64 * 1024))
+                histogram = tasks
+            response.raise_for_status()
+            response.close()
+            histogram.record(time.monotonic() - started)
+        except Exception:
+            failures += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    return time.monotonic() - started, tasks, downloads, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较 requests 与 HTTP/2 传输的吞吐量和延迟")
+    parser.add_argument("--url", help="后端地址，默认启动本机后端替身")
+    parser.add_argument("--file-id", help="用于下载测试的文件ID（--url 时需要）")
+    parser.add_argument("--requests", type=int, default=200, help="每种传输的请求总数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发数")
+    parser.add_argument("--download-size", type=int, default=256 * 1024, help="本机后端替身的下载文件大小（字节）")
+    parser.add_argument("--task-delay", type=float, default=0.05, help="本机后端替身的任务处理耗时（秒）")
+    parser.add_argument("--max-connections", type=int, default=64, help="http2 传输的最大连接数")
+    parser.add_argument("--h2c", action="store_true", help="明文 http:// 后端直接使用 HTTP/2")
+    parser.add_argument("--transports", default="requests,http2", help="要测试的传输，逗号分隔")
+    args = parser.parse_args()
+
+    backend = None
+    base_url, file_id = args.url, args.file_id
+    if not base_url:
+        from tests.fake_backend import FakeBackend
+
+        backend = FakeBackend().start()
+        backend.task_delay = args.task_delay
+        backend.files["bench"] = b"x" * args.download_size
+        base_url, file_id = backend.url, "bench"
+
+    print(f"后端: {base_url}，请求数 {args.requests}，并发 {args.concurrency}")
+    try:
+        for name in [n.strip() for n in args.transports.split(",") if n.strip()]:
+            options = {"max_connections": args.max_connections, "prior_knowledge": args.h2c} if name == "http2" else {}
+            try:
+                transport = create_transport(name, **options)
+            except ImportError as e:
+                print(f"⏭️  {name}: {e}")
+                continue
+
+            if backend:
+                backend.connections.clear()
+            try:
+                elapsed, tasks, downloads, failures = run_benchmark(
+                    transport, base_url.rstrip("/"), args.requests, args.concurrency, file_id
+                )
+            finally:
+                transport.close()
+
+            print(f"\n{name}: {args.requests / elapsed:.1f} 请求/秒，失败 {failures}")
+            for label, histogram in (("任务", tasks), ("下载", downloads)):
+                if histogram.count:
+                    stats = histogram.summary()
+                    print(
+                        f"   {label}: p50 {stats['p50'] * 1000:.1f}ms  p95 {stats['p95'] * 1000:.1f}ms  "
+                        f"p99 {stats['p99'] * 1000:.1f}ms"
+                    )
+            if backend:
+                print(f"   连接数: {len(backend.connections)}")
+    finally:
+        if backend:
+            backend.stop()
+
+
+if __name__ == "__main__":
+    main()
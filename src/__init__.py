@@ -4,10 +4,32 @@
 通过自然语言执行浏览器自动化任务。
 """
 
-from .main import execute_browser_task
+from .aio import execute_browser_task_async
+from .health import HealthProber, install_health_prober
+from .limiter import LimiterGroup, install_limiter_group
+from .main import cancel_browser_task, close_session, execute_browser_task, execute_task_plan, monitor_browser_task
+from .outputs import iter_records, iter_text
+from .scheduler import TaskScheduler
+from .sessions import SessionManager, SessionPool, install_session_manager, install_session_pool
 
 __all__ = [
     "execute_browser_task",
+    "execute_browser_task_async",
+    "cancel_browser_task",
+    "close_session",
+    "monitor_browser_task",
+    "execute_task_plan",
+    "iter_text",
+    "iter_records",
+    "TaskScheduler",
+    "SessionPool",
+    "install_session_pool",
+    "SessionManager",
+    "install_session_manager",
+    "LimiterGroup",
+    "install_limiter_group",
+    "HealthProber",
+    "install_health_prober",
 ]
 
 __version__ = "0.1.0"
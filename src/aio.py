@@ -0,0 +1,32 @@
+"""
+asyncio 接口
+
+在工作线程中执行阻塞的 execute_browser_task，协程被取消时通知后端停止任务。
+"""
+
+import asyncio
+import uuid
+from typing import Any
+
+from .main import cancel_browser_task, execute_browser_task
+
+
+async def execute_browser_task_async(urls: str | list[str], query: str, **kwargs: Any) -> dict:
+    """
+    execute_browser_task 的协程版本
+
+    参数与返回值同 execute_browser_task。协程被取消（如 asyncio.wait_for 超时、
+    所属任务被 cancel）时，会向后端发送取消请求后再抛出 CancelledError。
+
+    Examples:
+        >>> result = await asyncio.wait_for(
+        ...     execute_browser_task_async("https://example.com", "提取页面标题"),
+        ...     timeout=30
+        ... )
+    """
+    task_id = kwargs.pop("task_id", None) or uuid.uuid4().hex
+    try:
+        return await asyncio.to_thread(execute_browser_task, urls, query, task_id=task_id, **kwargs)
+    except asyncio.CancelledError:
+        await asyncio.shield(asyncio.to_thread(cancel_browser_task, task_id))
+        raise
@@ -0,0 +1,259 @@
+"""
+持久化任务队列
+
+基于 SQLite（WAL 模式）的本地任务队列，工作进程崩溃后队列中和执行中的任务不会丢失：
+- enqueue: 入队，相同幂等键只入队一次
+- lease: 领取任务并设置租约到期时间（可见性超时）
+- ack: 记录结果并完成任务
+- fail: 任务执行异常或可重试的失败，未超过最大尝试次数时重新排队
+
+租约到期仍未确认的任务会被重新领取；工作进程重启后可用 release_leases()
+立即收回自己之前持有的租约。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 任务状态
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires, id);
+"""
+
+
+class DurableQueue:
+    """
+    SQLite 持久化任务队列
+
+    Args:
+        path: 数据库文件路径
+        visibility_timeout: 租约时长（秒），应大于任务超时时间；
+            到期仍未确认的任务会被其他工作进程重新领取
+        max_attempts: 最大尝试次数，执行异常或租约到期累计达到后标记为失败
+
+    Examples:
+        >>> queue = DurableQueue("data/state/queue.db")
+        >>> queue.enqueue({"urls": "https://example.com", "query": "提取标题"}, idempotency_key="daily-001")
+        >>> # 另一个进程中运行: python -m src.worker --db data/state/queue.db
+        >>> queue.get_by_key("daily-001")["status"]
+        'done'
+    """
+
+    def __init__(self, path: str | Path, visibility_timeout: float = 900.0, max_attempts: int = 3):
+        self.path = Path(path)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def enqueue(self, payload: Dict[str, Any], idempotency_key: Optional[str] = None) -> int:
+        """
+        任务入队
+
+        Args:
+            payload: execute_browser_task 的关键字参数
+            idempotency_key: 幂等键（可选），相同键的任务只入队一次
+
+        Returns:
+            任务ID；幂等键已存在时返回已有任务的ID
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            if idempotency_key is not None:
+                row = conn.execute("SELECT id FROM tasks WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+                if row is not None:
+                    return row["id"]
+            cursor = conn.execute(
+                "INSERT INTO tasks (idempotency_key, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (idempotency_key, json.dumps(payload, ensure_ascii=False), QUEUED, now, now)
+            )
+            return cursor.lastrowid
+
+    def lease(self, owner: str, limit: int = 1) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        领取待执行的任务
+
+        领取排队中的任务和租约已到期的任务，按入队顺序。
+
+        Args:
+            owner: 工作进程标识
+            limit: 最多领取的任务数
+
+        Returns:
+            [(任务ID, payload)]
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # 租约到期次数已用尽的任务不再领取
+            conn.execute(
+                "UPDATE tasks SET status = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_expires <= ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts)
+            )
+            rows = conn.execute(
+                "SELECT id, payload FROM tasks "
+                "WHERE status = ? OR (status = ? AND lease_expires <= ?) "
+                "ORDER BY id LIMIT ?",
+                (QUEUED, LEASED, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = ?, lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(LEASED, owner, now + self.visibility_timeout, now, row["id"]) for row in rows]
+            )
+        return [(row["id"], json.loads(row["payload"])) for row in rows]
+
+    def ack(self, task_id: int, result: Dict[str, Any], owner: Optional[str] = None) -> bool:
+        """
+        记录任务结果并完成任务
+
+        Args:
+            task_id: 任务ID
+            result: 任务结果
+            owner: 工作进程标识（可选），指定时只确认自己持有的租约
+
+        Returns:
+            是否确认成功（租约已被他人收回时返回 False）
+        """
+        return self._finish(task_id, DONE, result, owner)
+
+    def fail(self, task_id: int, error: str, owner: Optional[str] = None) -> None:
+        """
+        任务执行异常或可重试的失败：未超过最大尝试次数时重新排队，否则标记为失败
+
+        Args:
+            task_id: 任务ID
+            error: 错误信息
+            owner: 工作进程标识（可选）
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, lease_owner FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None or (owner is not None and row["lease_owner"] != owner):
+                return
+            status = FAILED if row["attempts"] >= self.max_attempts else QUEUED
+            conn.execute(
+                "UPDATE tasks SET status = ?, lease_owner = NULL, lease_expires = NULL, result = ?, "
+                "updated_at = ? WHERE id = ?",
+                (status, json.dumps({"success": False, "error": error}, ensure_ascii=False), now, task_id)
+            )
+
+    def release_leases(self, owner: str) -> int:
+        """
+        收回某个工作进程持有的全部租约（工作进程重启后调用）
+
+        Returns:
+            重新排队的任务数
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_owner = ?",
+                (QUEUED, time.time(), LEASED, owner)
+            )
+            return cursor.rowcount
+
+    def get(self, task_id: int) -> Optional[Dict[str, Any]]:
+        """
+        查询任务
+
+        Returns:
+            {"id", "idempotency_key", "status", "attempts", "payload", "result"}，不存在时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._row_to_dict(row)
+
+    def get_by_key(self, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        """按幂等键查询任务，返回结构同 get()"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        return self._row_to_dict(row)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        返回各状态的任务数
+
+        Returns:
+            {"queued", "leased", "done", "failed"}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status").fetchall()
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "DurableQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _finish(self, task_id: int, status: str, result: Dict[str, Any], owner: Optional[str]) -> bool:
+        query = (
+            "UPDATE tasks SET status = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND status = ?"
+        )
+        params: List[Any] = [status, json.dumps(result, ensure_ascii=False), time.time(), task_id, LEASED]
+        if owner is not None:
+            query += " AND lease_owner = ?"
+            params.append(owner)
+        with self._transaction() as conn:
+            return conn.execute(query, params).rowcount == 1
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """持有线程锁并以 BEGIN IMMEDIATE 开启写事务，避免多个进程同时领取同一任务"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _row_to_dict(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "idempotency_key": row["idempotency_key"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "payload": json.loads(row["payload"]),
+            "result": json.loads(row["result"]) if row["result"] else None
+        }
@@ -0,0 +1,321 @@
+"""
+结果文件的筛选与延迟下载
+
+FileFilter 按 MIME 类型、文件名通配符和大小上限筛选任务产生的文件。未通过
+筛选的文件不下载、不写入输出目录，只在结果的 skipped_files 中返回元数据：
+- 文件引用：下载前按后端给出的元数据判断；后端未给出大小时，下载超过上限即中止
+- 内联文件：内容已随响应到达，丢弃暂存内容，不写入输出目录
+- 文件包：筛选条件作为查询参数发给后端，后端未筛选时下载后剔除不符合条件的条目
+
+LazyFile 是文件引用的延迟下载句柄：任务返回时只包含文件名、大小、MIME 类型和
+file_id，首次访问 path、open() 或 read() 时才下载到输出目录，可选在后台预取。
+"""
+
+import fnmatch
+import mimetypes
+import threading
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+DEFAULT_MIME_TYPE = "application/octet-stream"
+
+# 后台预取的并发下载数
+PREFETCH_WORKERS = 4
+
+
+class FileDownloadError(IOError):
+    """延迟下载的文件下载失败"""
+
+
+class FileTooLarge(Exception):
+    """下载的文件超过大小上限"""
+
+    def __init__(self, size_bytes: int):
+        super().__init__(f"文件超过大小上限: {size_bytes} 字节")
+        self.size_bytes = size_bytes
+
+
+def guess_mime_type(filename: str, mime_type: Optional[str] = None) -> str:
+    """
+    返回文件的 MIME 类型，未给出时按扩展名推断
+
+    Args:
+        filename: 文件名
+        mime_type: 后端给出的 MIME 类型（可选）
+
+    Returns:
+        MIME 类型，无法推断时为 application/octet-stream
+    """
+    if mime_type:
+        return mime_type.split(";")[0].strip().lower()
+    return mimetypes.guess_type(filename)[0] or DEFAULT_MIME_TYPE
+
+
+class FileFilter:
+    """
+    文件筛选条件，各条件同时满足时文件才会被保存
+
+    Args:
+        file_types: 允许的 MIME 类型列表，支持 "image/*" 形式的通配
+        file_pattern: 文件名通配符（不区分大小写），如 "*.pdf"、"report_*"
+        max_file_size: 单个文件的大小上限（字节）
+
+    Examples:
+        >>> file_filter = FileFilter(file_types=["application/pdf"], max_file_size=10 * 1024 * 1024)
+        >>> file_filter.reject_reason("a.pdf", "application/pdf", 1024) is None
+        True
+        >>> file_filter.reject_reason("shot.png", None, 1024)
+        '类型不匹配'
+    """
+
+    def __init__(
+        self,
+        file_types: Optional[List[str]] = None,
+        file_pattern: Optional[str] = None,
+        max_file_size: Optional[int] = None
+    ):
+        self.file_types = [t.strip().lower() for t in file_types or [] if t.strip()]
+        self.file_pattern = file_pattern
+        self.max_file_size = max_file_size
+
+    @classmethod
+    def from_options(
+        cls,
+        file_types: Optional[str | List[str]] = None,
+        file_pattern: Optional[str] = None,
+        max_file_size: Optional[int] = None
+    ) -> Optional["FileFilter"]:
+        """
+        根据公开接口的参数构建筛选条件
+
+        Args:
+            file_types: MIME 类型列表，或逗号分隔的字符串
+            file_pattern: 文件名通配符
+            max_file_size: 大小上限（字节）
+
+        Returns:
+            筛选条件，未指定任何条件时返回 None
+
+        Raises:
+            ValueError: 参数格式不正确
+        """
+        if isinstance(file_types, str):
+            file_types = file_types.split(",")
+        if file_types is not None and not all(isinstance(t, str) for t in file_types):
+            raise ValueError("文件类型格式不正确，应为 MIME 类型列表")
+        if file_pattern is not None and not isinstance(file_pattern, str):
+            raise ValueError("文件名模式格式不正确")
+        if max_file_size is not None and (not isinstance(max_file_size, int) or max_file_size < 0):
+            raise ValueError("文件大小上限不正确")
+
+        file_filter = cls(file_types, file_pattern or None, max_file_size)
+        return file_filter if file_filter.active else None
+
+    @property
+    def active(self) -> bool:
+        """是否指定了任何筛选条件"""
+        return bool(self.file_types or self.file_pattern or self.max_file_size is not None)
+
+    def reject_reason(self, filename: str, mime_type: Optional[str], size_bytes: Optional[int]) -> Optional[str]:
+        """
+        判断文件是否通过筛选
+
+        Args:
+            filename: 文件名
+            mime_type: MIME 类型（可选，缺失时按扩展名推断）
+            size_bytes: 文件大小（可选，未知时不按大小判断）
+
+        Returns:
+            未通过的原因，通过时返回 None
+        """
+        if self.file_types and not any(
+            fnmatch.fnmatchcase(guess_mime_type(filename, mime_type), pattern) for pattern in self.file_types
+        ):
+            return "类型不匹配"
+        if self.file_pattern and not fnmatch.fnmatchcase(filename.lower(), self.file_pattern.lower()):
+            return "文件名不匹配"
+        if self.max_file_size is not None and size_bytes is not None and size_bytes > self.max_file_size:
+            return "超过大小上限"
+        return None
+
+    def to_request(self) -> Dict[str, Any]:
+        """转换为发给后端的筛选条件"""
+        request: Dict[str, Any] = {}
+        if self.file_types:
+            request["mime_types"] = self.file_types
+        if self.file_pattern:
+            request["pattern"] = self.file_pattern
+        if self.max_file_size is not None:
+            request["max_size"] = self.max_file_size
+        return request
+
+    def to_query(self) -> str:
+        """转换为文件包下载地址的查询参数"""
+        return urlencode({
+            key: ",".join(value) if isinstance(value, list) else value
+            for key, value in self.to_request().items()
+        })
+
+
+def skipped_file(
+    filename: str,
+    mime_type: Optional[str],
+    size_bytes: Optional[int],
+    reason: str,
+    file_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """构造未保存文件的元数据"""
+    info = {
+        "filename": filename,
+        "mime_type": guess_mime_type(filename, mime_type),
+        "size_bytes": size_bytes,
+        "reason": reason
+    }
+    if file_id:
+        info["file_id"] = file_id
+    return info
+
+
+def filter_bundle(path: Path, file_filter: FileFilter) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    剔除 ZIP 文件包中未通过筛选的条目
+
+    所有条目都通过时不改写文件；否则将保留的条目写入临时文件后原子替换。
+
+    Args:
+        path: ZIP 文件路径
+        file_filter: 筛选条件
+
+    Returns:
+        (保留的文件数, 被剔除条目的元数据列表)
+    """
+    skipped = []
+    with zipfile.ZipFile(path) as bundle:
+        kept = []
+        for info in bundle.infolist():
+            if info.is_dir():
+                continue
+            reason = file_filter.reject_reason(Path(info.filename).name, None, info.file_size)
+            if reason:
+                skipped.append(skipped_file(info.filename, None, info.file_size, reason))
+            else:
+                kept.append(info)
+        if not skipped:
+            return len(kept), []
+
+        part_path = path.with_name(f".{path.name}.part")
+        try:
+            with zipfile.ZipFile(part_path, "w") as filtered:
+                for info in kept:
+                    with bundle.open(info) as source, filtered.open(info, "w") as target:
+                        while chunk := source.read(1024 * 1024):
+                            target.write(chunk)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+    part_path.replace(path)
+    return len(kept), skipped
+
+
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+_prefetch_lock = threading.Lock()
+
+
+def _prefetcher() -> ThreadPoolExecutor:
+    global _prefetch_executor
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="file-prefetch")
+        return _prefetch_executor
+
+
+class LazyFile(dict):
+    """
+    文件引用的延迟下载句柄
+
+    本身是包含 filename、file_id、mime_type、size_bytes 的字典（可直接序列化为 JSON，
+    幂等重放的结果中为普通字典），首次访问 path、open() 或 read() 时下载文件，
+    多个线程同时访问时只下载一次。size_bytes 在后端未给出时为 None，下载后更新。
+
+    Args:
+        filename: 文件名
+        file_id: 后端的文件ID
+        mime_type: MIME 类型
+        size_bytes: 文件大小（字节，可选）
+        fetch: 下载函数，接收目标路径，返回文件大小
+        output_path: 下载的目标路径
+
+    Examples:
+        >>> result = execute_browser_task(urls="https://example.com", query="下载报表", lazy_files=True)
+        >>> handle = result["file_handles"][0]
+        >>> handle["filename"], handle["size_bytes"]
+        ('report.pdf', 52133)
+        >>> data = handle.read()  # 此时才下载
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        file_id: str,
+        mime_type: Optional[str],
+        size_bytes: Optional[int],
+        fetch: Callable[[Path], int],
+        output_path: Path
+    ):
+        super().__init__(
+            filename=filename,
+            file_id=file_id,
+            mime_type=guess_mime_type(filename, mime_type),
+            size_bytes=size_bytes
+        )
+        self._fetch = fetch
+        self._output_path = output_path
+        self._lock = threading.Lock()
+        self._downloaded = False
+        self._prefetch: Optional[Future] = None
+
+    @property
+    def downloaded(self) -> bool:
+        """文件是否已下载"""
+        return self._downloaded
+
+    @property
+    def path(self) -> Path:
+        """
+        本地文件路径，尚未下载时先下载
+
+        Raises:
+            FileDownloadError: 下载失败（如文件已过期）
+        """
+        with self._lock:
+            if not self._downloaded:
+                try:
+                    self["size_bytes"] = self._fetch(self._output_path)
+                except Exception as e:
+                    raise FileDownloadError(f"文件下载失败: {self['filename']}") from e
+                self._downloaded = True
+        return self._output_path
+
+    def open(self, mode: str = "rb") -> IO:
+        """下载（如需要）并打开文件，只支持读取模式"""
+        if any(flag in mode for flag in "wax+"):
+            raise ValueError("延迟下载的文件只能以读取模式打开")
+        return open(self.path, mode)
+
+    def read(self) -> bytes:
+        """下载（如需要）并读取文件的全部内容"""
+        return self.path.read_bytes()
+
+    def prefetch(self) -> Future:
+        """在后台开始下载，返回完成时结果为本地路径的 Future；重复调用返回同一个 Future"""
+        with self._lock:
+            if self._prefetch is None:
+                self._prefetch = _prefetcher().submit(lambda: self.path)
+            return self._prefetch
+
+    def __repr__(self) -> str:
+        state = "已下载" if self._downloaded else "未下载"
+        return f"LazyFile({self['filename']!r}, {state})"
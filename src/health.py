@@ -0,0 +1,256 @@
+"""
+后端健康与容量探测
+
+HealthProber 在后台线程中定期请求每个后端的 GET /health：
+    {"status": "ok", "total_slots": 8, "free_slots": 3}
+结果带时间戳缓存，超过 max_staleness 的结果视为未知。启用后
+（install_health_prober），新任务按探测结果选择后端：
+- 有空闲浏览器槽位的后端优先，空闲越多越靠前
+- 没有新鲜结果或未报告容量的后端其次，保持配置顺序
+- 槽位已满的后端再次之
+- 不健康（请求失败、非 2xx 或 status 不为 ok）的后端跳过；全部不健康时按配置顺序尝试
+
+两次探测之间，每分派一个任务即在缓存中占用一个空闲槽位，避免所有任务
+涌向同一个后端。已有会话的任务仍固定在会话所在的后端。
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# 状态为 ok 的后端视为健康
+HEALTHY_STATUSES = ("ok", "healthy")
+
+
+def probe_backend(api_base_url: str, timeout: float) -> Dict[str, Any]:
+    """
+    请求后端的健康检查接口
+
+    Args:
+        api_base_url: 后端地址
+        timeout: 请求超时时间（秒）
+
+    Returns:
+        {"healthy", "free_slots", "total_slots"}，未报告容量时对应值为 None
+    """
+    from .transport import get_transport
+
+    response = get_transport().request("GET", f"{api_base_url.rstrip('/')}/health", timeout=timeout)
+    try:
+        if not 200 <= response.status_code < 300:
+            return {"healthy": False, "free_slots": None, "total_slots": None}
+        data = response.json()
+    finally:
+        response.close()
+    return {
+        "healthy": str(data.get("status", "ok")).lower() in HEALTHY_STATUSES,
+        "free_slots": _optional_int(data.get("free_slots")),
+        "total_slots": _optional_int(data.get("total_slots"))
+    }
+
+
+class HealthProber:
+    """
+    后端健康探测器
+
+    Args:
+        interval: 探测间隔（秒），决定探测开销与结果新鲜度
+        timeout: 单次探测的超时时间（秒）
+        max_staleness: 结果的有效期（秒），超过后视为未知，应大于 interval
+        backends: 需要探测的后端列表，或返回列表的函数；默认为 BROWSER_API_URL 中的后端
+        probe_fn: 探测函数 (后端地址, 超时) -> {"healthy", "free_slots", "total_slots"}，
+                  默认请求 GET /health
+
+    Examples:
+        >>> from src.health import HealthProber, install_health_prober
+        >>> prober = HealthProber(interval=5, max_staleness=15)
+        >>> prober.start()
+        >>> install_health_prober(prober)
+        >>> prober.stats()["backends"]["http://node-a:52101"]
+        {'healthy': True, 'free_slots': 3, 'total_slots': 8, 'age': 1.2, 'probe_seconds': 0.004, 'error': None}
+    """
+
+    def __init__(
+        self,
+        interval: float = 10.0,
+        timeout: float = 2.0,
+        max_staleness: float = 30.0,
+        backends: Optional[Iterable[str] | Callable[[], Iterable[str]]] = None,
+        probe_fn: Optional[Callable[[str, float], Dict[str, Any]]] = None
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.max_staleness = max_staleness
+        self._backends = backends
+        self._probe_fn = probe_fn or probe_backend
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._probes = 0
+        self._failures = 0
+        self._probe_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "HealthProber":
+        """启动后台探测线程（立即进行第一轮探测）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止后台探测"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=self.timeout + 1)
+
+    def probe_all(self) -> None:
+        """立即探测所有后端"""
+        for backend in self._backend_list():
+            self.probe(backend)
+
+    def probe(self, backend: str) -> Dict[str, Any]:
+        """
+        立即探测一个后端并缓存结果
+
+        Returns:
+            探测结果 {"healthy", "free_slots", "total_slots", "error"}
+        """
+        started = time.monotonic()
+        try:
+            result = dict(self._probe_fn(backend, self.timeout))
+            result.setdefault("free_slots", None)
+            result.setdefault("total_slots", None)
+            result["error"] = None
+        except Exception as e:
+            result = {"healthy": False, "free_slots": None, "total_slots": None, "error": type(e).__name__}
+        elapsed = time.monotonic() - started
+
+        result["checked_at"] = time.monotonic()
+        result["probe_seconds"] = elapsed
+        with self._lock:
+            self._results[backend] = result
+            self._probes += 1
+            self._failures += not result["healthy"]
+            self._probe_seconds += elapsed
+        return result
+
+    def status(self, backend: str) -> Optional[Dict[str, Any]]:
+        """返回后端在有效期内的探测结果，没有或已过期时返回 None"""
+        with self._lock:
+            result = self._results.get(backend)
+            if result is None or time.monotonic() - result["checked_at"] > self.max_staleness:
+                return None
+            return dict(result)
+
+    def rank(self, backends: List[str]) -> List[str]:
+        """
+        按探测结果排列后端，跳过不健康的后端
+
+        Args:
+            backends: 按配置顺序排列的后端列表
+
+        Returns:
+            排序后的后端列表；全部不健康时返回原列表
+        """
+        ranked = []
+        for order, backend in enumerate(backends):
+            result = self.status(backend)
+            if result is None:
+                ranked.append((1, 0, order, backend))
+            elif not result["healthy"]:
+                continue
+            elif result["free_slots"] is None:
+                ranked.append((1, 0, order, backend))
+            elif result["free_slots"] > 0:
+                ranked.append((0, -result["free_slots"], order, backend))
+            else:
+                ranked.append((2, 0, order, backend))
+        if not ranked:
+            return list(backends)
+        return [backend for *_, backend in sorted(ranked)]
+
+    def claim(self, backend: str) -> None:
+        """记录向后端分派了一个任务：在缓存中占用一个空闲槽位，直到下一次探测"""
+        with self._lock:
+            result = self._results.get(backend)
+            if result is not None and result.get("free_slots"):
+                result["free_slots"] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回探测统计
+
+        Returns:
+            {"probes", "failures", "probe_seconds", "backends": {后端: {"healthy", "free_slots",
+             "total_slots", "age", "probe_seconds", "error"}}}
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "probes": self._probes,
+                "failures": self._failures,
+                "probe_seconds": round(self._probe_seconds, 3),
+                "backends": {
+                    backend: {
+                        "healthy": result["healthy"],
+                        "free_slots": result["free_slots"],
+                        "total_slots": result["total_slots"],
+                        "age": round(now - result["checked_at"], 3),
+                        "probe_seconds": round(result["probe_seconds"], 3),
+                        "error": result["error"]
+                    }
+                    for backend, result in sorted(self._results.items())
+                }
+            }
+
+    def _backend_list(self) -> List[str]:
+        backends = self._backends
+        if backends is None:
+            from .main import _api_base_urls
+            return _api_base_urls()
+        if callable(backends):
+            return list(backends())
+        return list(backends)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.probe_all()
+            except Exception:
+                # 读取后端列表失败等情况下等待下一轮
+                pass
+            self._stop.wait(self.interval)
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+_default_prober: Optional[HealthProber] = None
+
+
+def install_health_prober(prober: Optional[HealthProber]) -> Optional[HealthProber]:
+    """
+    设置默认的健康探测器，新任务据此选择后端
+
+    Args:
+        prober: 健康探测器，传入 None 表示停用（不会停止其后台线程）
+
+    Returns:
+        之前的默认健康探测器
+    """
+    global _default_prober
+    previous, _default_prober = _default_prober, prober
+    return previous
+
+
+def get_health_prober() -> Optional[HealthProber]:
+    """返回当前的默认健康探测器"""
+    return _default_prober
@@ -0,0 +1,128 @@
+"""
+对冲请求
+
+主请求耗时超过历史耗时分位数仍未返回时，向另一个后端（或另一条连接）
+发出重复请求，先返回成功结果的一方胜出，另一方被取消。
+对冲预算限制额外请求占总请求的比例，避免在整体变慢时放大负载。
+"""
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def _start(fn: Callable[[], Any]) -> Future:
+    """在守护线程中执行 fn，返回对应的 Future"""
+    future: Future = Future()
+
+    def runner() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=runner, name="hedged-request", daemon=True).start()
+    return future
+
+
+class Hedger:
+    """
+    对冲请求执行器
+
+    Args:
+        budget_ratio: 对冲请求占总请求数的最大比例，默认 10%
+        budget_burst: 预算之外允许的少量突发对冲数
+    """
+
+    def __init__(self, budget_ratio: float = 0.1, budget_burst: int = 1):
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._fired = 0
+        self._won = 0
+        self._denied = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回对冲统计
+
+        Returns:
+            {"requests", "hedges_fired", "hedges_won", "budget_denied", "fire_rate", "win_rate"}
+        """
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "hedges_fired": self._fired,
+                "hedges_won": self._won,
+                "budget_denied": self._denied,
+                "fire_rate": self._fired / self._requests if self._requests else 0.0,
+                "win_rate": self._won / self._fired if self._fired else 0.0
+            }
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self._fired < self.budget_ratio * self._requests + self.budget_burst:
+                self._fired += 1
+                return True
+            self._denied += 1
+            return False
+
+    def run(
+        self,
+        primary: Callable[[], Any],
+        hedge: Optional[Callable[[], Any]],
+        delay: Optional[float],
+        on_lose: Optional[Callable[[int], None]] = None,
+        on_discard: Optional[Callable[[Any], None]] = None
+    ) -> Tuple[int, Any]:
+        """
+        执行主请求，必要时发出对冲请求
+
+        Args:
+            primary: 主请求
+            hedge: 对冲请求（None 表示没有可用的对冲目标）
+            delay: 主请求超过该秒数仍未完成时发出对冲；None 表示不对冲
+            on_lose: 失败方的取消回调，参数为失败方序号（0 主请求，1 对冲请求）
+            on_discard: 失败方仍成功返回时对其结果的清理回调（如删除暂存文件）
+
+        Returns:
+            (胜出方序号, 结果)
+
+        Raises:
+            所有已发出的请求都失败时，抛出主请求的异常
+        """
+        with self._lock:
+            self._requests += 1
+
+        futures: List[Future] = [_start(primary)]
+        done, _ = wait(futures, timeout=delay)
+        if done or hedge is None or delay is None or not self._take_budget():
+            return 0, futures[0].result()
+
+        futures.append(_start(hedge))
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = futures.index(future)
+                    if winner == 1:
+                        with self._lock:
+                            self._won += 1
+                    loser = 1 - winner
+                    if not futures[loser].done() and on_lose is not None:
+                        on_lose(loser)
+                    if on_discard is not None:
+                        futures[loser].add_done_callback(
+                            lambda f: on_discard(f.result()) if f.exception() is None else None
+                        )
+                    return winner, future.result()
+
+        return 0, futures[0].result()
+
+
+# 进程内共享的对冲执行器，stats() 可查看对冲触发与胜出次数
+default_hedger = Hedger()
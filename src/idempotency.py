@@ -0,0 +1,109 @@
+"""
+幂等执行
+
+同一个幂等键的任务只执行一次：
+- 成功结果记录在本地日志中，有效期内的重试直接返回记录的结果
+- 相同键的任务正在本进程中执行时，重试等待并共享该次执行的结果
+- 幂等键同时通过 Idempotency-Key 请求头发给后端，后端可据此合并重复请求
+"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# 进程内执行中的任务：幂等键 -> 结果 Future
+_IN_FLIGHT: Dict[str, Future] = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+
+def derive_key(**fields: Any) -> str:
+    """
+    根据任务参数推导幂等键
+
+    Args:
+        fields: 决定任务内容的参数（如规范化后的 URL、任务描述、会话ID）
+
+    Returns:
+        32 位十六进制字符串
+    """
+    data = json.dumps(fields, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+class IdempotencyJournal:
+    """
+    幂等结果日志（每个幂等键一个 JSON 文件）
+
+    Args:
+        directory: 日志目录
+        ttl: 记录的有效期（秒）
+    """
+
+    def __init__(self, directory: Path, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """返回有效期内记录的结果，没有记录时返回 None"""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or time.time() - entry.get("recorded_at", 0) > self.ttl:
+            return None
+        return entry["result"]
+
+    def record(self, key: str, result: Dict[str, Any]) -> None:
+        """记录结果（先写临时文件再原子替换）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        entry = {"key": key, "recorded_at": time.time(), "result": result}
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def run(self, key: str, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        以幂等方式执行任务
+
+        Args:
+            key: 幂等键
+            fn: 执行任务并返回结果字典的函数
+
+        Returns:
+            任务结果；来自日志或其他正在执行的调用时带有 "replayed": True
+        """
+        recorded = self.get(key)
+        if recorded is not None:
+            return {**recorded, "replayed": True}
+
+        with _IN_FLIGHT_LOCK:
+            future = _IN_FLIGHT.get(key)
+            owner = future is None
+            if owner:
+                future = _IN_FLIGHT[key] = Future()
+
+        if not owner:
+            return {**future.result(), "replayed": True}
+
+        try:
+            result = fn()
+            # 只记录成功结果，失败的任务重试时重新执行
+            if result.get("success"):
+                self.record(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _IN_FLIGHT_LOCK:
+                _IN_FLIGHT.pop(key, None)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{derive_key(key=key)}.json"
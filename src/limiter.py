@@ -0,0 +1,248 @@
+"""
+后端背压与自适应并发限制
+
+后端浏览器槽位耗尽时返回 429/503（可带 Retry-After）。AdaptiveLimiter 限制
+发往单个后端的并发任务数，超出的请求按到达顺序排队：
+- 任务正常完成：加性增加，每完成约一个窗口（当前上限个）的任务上限加 1
+- 被拒绝（429/503）或耗时超过 latency_threshold：乘性减少，上限乘以 backoff_ratio，
+  cooldown 秒内最多减少一次，避免同一批拒绝把上限压到最低
+- Retry-After：在给定时间内暂停放行新请求
+
+LimiterGroup 为每个后端维护一个 AdaptiveLimiter，通过 install_limiter_group()
+启用后，execute_browser_task 的任务请求经其排队，遇到 429/503 时按 Retry-After
+等待后重试。
+"""
+
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional
+
+
+class BackendOverloaded(Exception):
+    """后端繁忙：请求被 429/503 拒绝，或排队等待超时"""
+
+    def __init__(self, message: str = "后端繁忙", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头
+
+    Args:
+        value: 秒数或 HTTP 日期
+
+    Returns:
+        需要等待的秒数，无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 并发限制器
+
+    Args:
+        initial_limit: 初始并发上限
+        min_limit: 并发上限的下限
+        max_limit: 并发上限的上限
+        backoff_ratio: 乘性减少的系数
+        cooldown: 两次乘性减少之间的最短间隔（秒）
+        latency_threshold: 耗时阈值（秒，可选），超过时视为拥塞信号
+        default_retry_after: 被拒绝且没有 Retry-After 时暂停放行的时间（秒）
+        max_queue: 最大排队数（可选），超出时立即抛出 BackendOverloaded
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff_ratio: float = 0.5,
+        cooldown: float = 1.0,
+        latency_threshold: Optional[float] = None,
+        default_retry_after: float = 1.0,
+        max_queue: Optional[int] = None
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.cooldown = cooldown
+        self.latency_threshold = latency_threshold
+        self.default_retry_after = default_retry_after
+        self.max_queue = max_queue
+        self.rejections = 0
+
+        self._limit = float(min(max_limit, max(min_limit, initial_limit)))
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting: Deque[object] = deque()
+        self._paused_until = 0.0
+        self._last_decrease = -float("inf")
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return int(self._limit)
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        等待一个并发名额（先到先得）
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Raises:
+            BackendOverloaded: 排队已满，或等待超时
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+        with self._cond:
+            if self.max_queue is not None and len(self._waiting) >= self.max_queue:
+                raise BackendOverloaded("排队请求过多")
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiting[0] is ticket and self._in_flight < self.limit and now >= self._paused_until:
+                        self._waiting.popleft()
+                        self._in_flight += 1
+                        # 名额可能不止一个，唤醒下一个排队者
+                        self._cond.notify_all()
+                        return
+
+                    wait = self._paused_until - now if now < self._paused_until else None
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise BackendOverloaded("等待后端空闲超时", retry_after=wait)
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+                raise
+
+    def release(
+        self,
+        latency: Optional[float] = None,
+        rejected: bool = False,
+        retry_after: Optional[float] = None
+    ) -> None:
+        """
+        归还名额并根据结果调整并发上限
+
+        Args:
+            latency: 请求耗时（秒），None 表示没有可用的信号（如连接失败），上限不变
+            rejected: 请求是否被后端以 429/503 拒绝
+            retry_after: 后端给出的 Retry-After（秒，可选）
+        """
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            now = time.monotonic()
+            if rejected:
+                self.rejections += 1
+                pause = retry_after if retry_after is not None else self.default_retry_after
+                self._paused_until = max(self._paused_until, now + pause)
+                self._decrease(now)
+            elif latency is not None:
+                if self.latency_threshold is not None and latency > self.latency_threshold:
+                    self._decrease(now)
+                else:
+                    self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回当前状态
+
+        Returns:
+            {"limit", "in_flight", "queued", "rejections", "paused_seconds"}
+        """
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "queued": len(self._waiting),
+                "rejections": self.rejections,
+                "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3)
+            }
+
+    def _decrease(self, now: float) -> None:
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+
+
+class LimiterGroup:
+    """
+    按后端地址维护 AdaptiveLimiter
+
+    Args:
+        limiter_options: 传给每个 AdaptiveLimiter 的参数
+
+    Examples:
+        >>> from src.limiter import LimiterGroup, install_limiter_group
+        >>> group = LimiterGroup(initial_limit=4, max_limit=16)
+        >>> install_limiter_group(group)
+        >>> # ... 并发执行任务 ...
+        >>> group.stats()
+        {'http://browser-api:52101': {'limit': 6, 'in_flight': 6, 'queued': 12, 'rejections': 2, ...}}
+    """
+
+    def __init__(self, **limiter_options: Any):
+        self._options = limiter_options
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_backend(self, api_base_url: str) -> AdaptiveLimiter:
+        """返回后端的限制器，不存在时创建"""
+        with self._lock:
+            limiter = self._limiters.get(api_base_url)
+            if limiter is None:
+                limiter = self._limiters[api_base_url] = AdaptiveLimiter(**self._options)
+            return limiter
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """返回各后端限制器的状态 {后端地址: stats()}"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {url: limiter.stats() for url, limiter in sorted(limiters.items())}
+
+
+_default_group: Optional[LimiterGroup] = None
+
+
+def install_limiter_group(group: Optional[LimiterGroup]) -> Optional[LimiterGroup]:
+    """
+    设置默认的后端限制器组
+
+    Args:
+        group: 限制器组，传入 None 表示停用
+
+    Returns:
+        之前的默认限制器组
+    """
+    global _default_group
+    previous, _default_group = _default_group, group
+    return previous
+
+
+def get_limiter_group() -> Optional[LimiterGroup]:
+    """返回当前的默认限制器组"""
+    return _default_group
@@ -15,8 +15,27 @@
    - 将会话中的所有文件打包为 ZIP
    - 适用于多文件任务结果
 
+3. cancel_browser_task: 取消正在执行的任务
+   - 通过客户端生成的 task_id 通知后端停止浏览器和 LLM
+   - 客户端超时或被中断时会自动尝试取消
+
+4. close_session: 关闭不再需要的会话
+   - 立即释放后端的浏览器上下文
+
+5. monitor_browser_task: 以监控方式执行任务
+   - 按 URL 和任务描述保存结果指纹，内容未变化时不保存文件
+   - 上次的指纹发给后端，后端可跳过未变化的处理
+
+6. execute_task_plan: 在一个会话中执行多步骤任务计划
+   - 一次提交全部步骤，后端逐步返回结果
+   - 前面步骤的文件下载与后续步骤的执行重叠
+
 环境变量配置:
-- BROWSER_API_URL: 后端 API 服务地址（必需）
+- BROWSER_API_URL: 后端 API 服务地址（必需），多个后端用逗号分隔，
+  第一个为主后端，其余用于对冲请求；同一主机上的后端可以写为
+  unix:///path/to/backend.sock，经 Unix 域套接字访问
+- BROWSER_API_TRANSPORT: HTTP 传输方式（可选），requests（默认）或 http2，
+  http2 需要安装 httpx[http2]，未安装时回退到 requests
 
 使用示例:
     >>> # 单个 URL
@@ -46,6 +65,9 @@
     >>> bundle = download_bundle(session)
     >>> print(bundle['files'][0])
 
+    >>> # 用完后关闭会话
+    >>> close_session(session)
+
 返回结构:
     {
         "success": True/False,
@@ -56,20 +78,120 @@
     }
 """
 
+import json
 import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Any, Dict, Optional
 import requests
 
+from . import hedging, metrics, profiling
+from .files import FileFilter, FileTooLarge, LazyFile, filter_bundle, skipped_file
+from .health import get_health_prober
+from .idempotency import IdempotencyJournal, derive_key
+from .limiter import BackendOverloaded, get_limiter_group, parse_retry_after
+from .monitoring import FingerprintStore, result_fingerprint
+from .outputs import RECORD_FORMATS, spill_text, text_preview, write_records
+from .sessions import SessionManager, get_session_manager, get_session_pool
+from .sharding import URL_SEPARATOR, ShardCheckpoint, merge_shard_results, shard_key, split_urls
+from .streaming import discard_spooled, iter_ndjson, parse_task_response
+from .timeouts import LatencyTracker, iter_with_throughput
+from .transport import get_transport, is_read_timeout, normalize_base_url
+from .urls import dedupe_urls, resolve_url_rules, url_domain
+
 # 输出文件路径（Gateway 会自动上传此目录中的文件）
 DATA_OUTPUTS = Path("data/outputs")
 
+# 本地状态目录（检查点等，不会被 Gateway 上传）
+DATA_STATE = Path("data/state")
+
+# 内联文件解码的暂存目录，保存时移动到 DATA_OUTPUTS
+DATA_SPOOL = DATA_STATE / "spool"
+
+# 分片配置：单个分片中 URL 文本的最大字符数、并发执行的分片数、检查点中成功结果的有效期（秒）
+SHARD_MAX_QUERY_CHARS = 4000
+SHARD_MAX_WORKERS = 4
+SHARD_CHECKPOINT_TTL = 24 * 3600
+
+# 自适应超时：参考分位数、安全系数和超时下限（秒）
+ADAPTIVE_TIMEOUT_PERCENTILE = 99
+ADAPTIVE_TIMEOUT_MULTIPLIER = 2.0
+ADAPTIVE_TIMEOUT_FLOOR = 30
+
+# 文件下载：单次读取的停顿超时（秒）、最低平均速度（字节/秒）及其宽限期（秒）
+DOWNLOAD_READ_TIMEOUT = 60
+DOWNLOAD_MIN_BYTES_PER_SEC = 32 * 1024
+DOWNLOAD_GRACE_PERIOD = 10
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 对冲请求：主请求耗时超过该分位数时发出对冲
+HEDGE_PERCENTILE = 95
+
+# 会话与后端的对应关系在内存中最多保留的条数，以及记录在本地状态目录中的保留时间（秒）
+SESSION_AFFINITY_LIMIT = 1024
+SESSION_AFFINITY_TTL = 24 * 3600
+
+# 取消请求的超时时间（秒）
+CANCEL_TIMEOUT = 5
+
+# 会话创建、重置与关闭请求的超时时间（秒）
+SESSION_CREATE_TIMEOUT = 60
+SESSION_CLOSE_TIMEOUT = 10
+
+# 后端繁忙（429/503）时的最大重试次数（仅在启用限制器组时重试）
+BACKPRESSURE_MAX_RETRIES = 3
+OVERLOAD_STATUS_CODES = (429, 503)
+
+# 任务计划：并发处理步骤结果（下载文件等）的线程数；后端不支持 /agent/plan 时的状态码
+PLAN_RESULT_WORKERS = 4
+PLAN_FALLBACK_STATUS_CODES = (404, 405, 501)
+PLAN_OUTPUTS = ("text", "file", "records")
+
+# 幂等结果的保留时间（秒）
+IDEMPOTENCY_TTL = 24 * 3600
+
+# 文本结果超过该字节数时写入文件，结果中只保留预览
+SPILL_THRESHOLD = 1024 * 1024
+SPILL_PREVIEW_CHARS = 500
+
+# 按 (目标域名, 任务类型) 统计的滚动耗时，用于自适应超时和对冲
+_LATENCY = LatencyTracker()
+
+# 会话ID -> 创建该会话的后端地址（会话只存在于创建它的后端上）
+_SESSION_BACKENDS: "OrderedDict[str, str]" = OrderedDict()
+_SESSION_BACKENDS_LOCK = threading.Lock()
+
+# 执行中的任务ID -> 已发往的后端地址，用于取消
+_IN_FLIGHT_TASKS: Dict[str, list[str]] = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
 
 def execute_browser_task(
     urls: str | list[str],
     query: str,
     session_id: Optional[str] = None,
-    timeout: int = 600
+    timeout: int = 600,
+    max_urls_per_task: int = 20,
+    canonicalize_urls: bool = True,
+    url_rules: Optional[dict] = None,
+    adaptive_timeout: bool = False,
+    hedge: bool = False,
+    task_id: Optional[str] = None,
+    spill_threshold: Optional[int] = SPILL_THRESHOLD,
+    output_format: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    profile: bool = False,
+    file_types: Optional[list[str]] = None,
+    file_pattern: Optional[str] = None,
+    max_file_size: Optional[int] = None,
+    lazy_files: bool = False,
+    prefetch_files: bool = False
 ) -> dict:
     """
     执行浏览器自动化任务
@@ -89,15 +211,74 @@ def execute_browser_task(
             - "分别访问这些网站并截图"（多URL时）
         session_id: 会话ID（可选），用于保持对话连续性。
                    如果提供，将在相同会话中执行任务。
-        timeout: 任务超时时间（秒），默认 600（10分钟）
+        timeout: 任务超时时间（秒），默认 600（10分钟）；分片执行时为单个分片的超时
+        max_urls_per_task: 单个后端任务最多包含的 URL 数量，默认 20。
+                   超出时自动拆分为多个分片任务并发执行，结果合并返回；
+                   已成功的分片会记录检查点，重跑时自动跳过。
+        canonicalize_urls: 是否在构建查询前规范化并去重 URL，默认 True
+        url_rules: URL 规范化规则（可选），覆盖默认规则中的对应项：
+                   lowercase_host、drop_default_port、drop_fragment、
+                   strip_trailing_slash、strip_tracking_params、
+                   tracking_params（如 ["utm_*", "gclid"]）。drop_fragment 不会去除
+                   单页应用的哈希路由（#/、#!）
+        adaptive_timeout: 是否启用自适应超时，默认 False。启用后根据同一域名、
+                   同类任务最近耗时的 p99 推算超时，timeout 作为上限；
+                   样本不足时仍使用 timeout
+        hedge: 是否启用对冲请求，默认 False。主请求耗时超过同类任务 p95
+                   仍未返回时，向另一个后端发出重复请求，先成功者胜出。
+                   需要配置多个后端；指定 session_id 的任务固定在会话所在后端，
+                   不会对冲。文件下载的对冲请求发往同一后端的新连接
+        task_id: 客户端任务ID（可选），默认自动生成。可在其他线程中通过
+                   cancel_browser_task(task_id) 取消任务；分片执行时各分片的
+                   任务ID为 "{task_id}-{序号}"。客户端超时、KeyboardInterrupt
+                   等中断发生时会自动通知后端取消
+        spill_threshold: 文本结果的大小阈值（字节），默认 1 MB。超过时完整文本
+                   写入输出目录，message 中只保留开头的预览，文件名在 text_file
+                   和 files 中返回，可用 src.outputs.iter_text() 分块读取；
+                   None 表示不限制
+        output_format: 结构化输出格式（可选），"ndjson" 或 "csv"。指定后要求后端
+                   按行返回记录（适合表格提取），记录逐行写入输出目录的文件，
+                   结果中的 records 给出字段、行数和文件名，可用
+                   src.outputs.iter_records() 逐行读取；后端仍返回文本时按文本处理
+        idempotency_key: 幂等键（可选），传入 "auto" 时根据规范化后的 URL、任务描述、
+                   session_id 和 output_format 推导。相同幂等键的任务只执行一次：
+                   24 小时内的重试直接返回已记录的成功结果，本进程中正在执行时
+                   等待并共享该次结果（均带有 replayed: True）；幂等键还通过
+                   Idempotency-Key 请求头发给后端，分片执行时为 "{幂等键}-{序号}"
+        profile: 是否采集步骤耗时，默认 False。启用后要求后端返回每个代理步骤
+                   （导航、等待元素、LLM 调用、下载等）的耗时，转换为 Chrome trace
+                   文件（trace_{task_id}.json，可在 chrome://tracing 或 Perfetto 中查看）
+                   写入输出目录，并计入 src.profiling.default_profile 的按工具汇总
+        file_types: 只保存这些 MIME 类型的文件（可选），如 ["application/pdf", "image/*"]
+        file_pattern: 只保存文件名匹配该通配符的文件（可选，不区分大小写），如 "*.pdf"
+        max_file_size: 单个文件的大小上限（字节，可选）
+                   未通过筛选的文件不下载、不写入输出目录，只在 skipped_files 中
+                   返回元数据；筛选条件同时发给后端，后端可据此不生成或不内联这些文件
+        lazy_files: 是否延迟下载文件，默认 False。启用后任务返回时不下载后端的文件引用，
+                   file_handles 中的 LazyFile（文件名、大小、MIME 类型、file_id）在首次访问
+                   path、open() 或 read() 时才下载到输出目录；内联文件仍直接保存。
+                   后端文件过期后将无法下载，幂等重放的结果中为普通字典；
+                   任务使用会话池中的热会话时，会话归还前会清除后端文件，因此仍直接下载
+        prefetch_files: 延迟下载时是否立即在后台开始下载，默认 False（仅在 lazy_files 为 True 时生效），
+                   可通过 handle.prefetch() 取得下载的 Future
 
     Returns:
         包含任务执行结果的字典：
         {
             "success": True/False,
             "message": "任务执行描述",
-            "session_id": "会话ID（用于后续请求或下载文件包）",
+            "session_id": "会话ID（用于后续请求或下载文件包）",  # 使用会话池中的热会话时不返回
             "files": ["文件名1", "文件名2"],  # 仅当有文件时存在
+            "shards": {"total": 3, "succeeded": 3, "failed": 0},  # 仅分片执行时存在
+            "url_map": {"原始URL": "实际访问的规范URL"},  # 仅当 URL 被规范化或合并时存在
+            "text_file": "完整文本的文件名",  # 仅当文本结果超过 spill_threshold 时存在
+            "records": {"file": "文件名", "format": "csv", "schema": [...], "row_count": 120},
+                       # 仅当指定 output_format 且后端返回记录时存在，分片执行时为各分片的列表
+            "replayed": True,  # 仅当结果来自相同幂等键的已有执行时存在
+            "trace_file": "trace_xxx.json",  # 仅当 profile 为 True 且后端返回步骤耗时时存在，分片执行时为列表
+            "skipped_files": [{"filename": "shot.png", "mime_type": "image/png", "size_bytes": 20480,
+                               "reason": "类型不匹配", "file_id": "..."}],  # 仅当有文件未通过筛选时存在
+            "file_handles": [LazyFile(...)],  # 仅当 lazy_files 为 True 且有文件引用时存在
             "error": "错误信息"  # 失败时存在
         }
 
@@ -134,74 +315,1000 @@ def execute_browser_task(
     """
     try:
         # 参数验证和规范化
-        if isinstance(urls, str):
-            # 单个 URL
-            url_list = [urls]
-        elif isinstance(urls, list):
-            # URL 列表
-            if not urls or not all(isinstance(u, str) for u in urls):
-                return {
-                    "success": False,
-                    "error": "URL 列表格式不正确"
-                }
-            url_list = urls
-        else:
+        url_list, error = _validate_task_args(urls, query)
+        if error:
+            return error
+
+        if output_format is not None and output_format not in RECORD_FORMATS:
             return {
                 "success": False,
-                "error": "URL 格式不正确，应为字符串或字符串列表"
+                "error": "输出格式不正确，应为 ndjson 或 csv"
             }
 
-        if not query or not isinstance(query, str):
+        try:
+            file_filter = FileFilter.from_options(file_types, file_pattern, max_file_size)
+        except ValueError as e:
             return {
                 "success": False,
-                "error": "任务描述不能为空"
+                "error": str(e)
             }
 
         # 获取后端 API 地址
-        api_base_url = os.environ.get('BROWSER_API_URL')
-        if not api_base_url:
+        api_base_urls = _api_base_urls()
+        if not api_base_urls:
             return {
                 "success": False,
                 "error": "未配置 API 地址"
             }
 
-        # 构建完整查询（包含 URL）
-        if len(url_list) == 1:
-            # 单个 URL
-            full_query = f"访问 {url_list[0]}，然后{query}"
-        else:
-            # 多个 URL
-            urls_text = "、".join(url_list)
-            full_query = f"访问以下网站：{urls_text}。然后{query}"
+        # 规范化并去重 URL，避免重复访问等价页面
+        url_map = {}
+        if canonicalize_urls:
+            url_list, url_map = dedupe_urls(url_list, resolve_url_rules(url_rules))
+
+        task_id = task_id or uuid.uuid4().hex
+        if idempotency_key == "auto":
+            # 筛选条件改变保存的文件，只在指定时计入幂等键
+            filter_fields = {"file_filter": file_filter.to_request()} if file_filter else {}
+            idempotency_key = derive_key(
+                urls=url_list, query=query, session_id=session_id, output_format=output_format, **filter_fields
+            )
+        result_options = {
+            "spill_threshold": spill_threshold,
+            "output_format": output_format,
+            "idempotency_key": idempotency_key,
+            "profile": profile,
+            "file_filter": file_filter,
+            "lazy_files": lazy_files,
+            "prefetch_files": prefetch_files
+        }
+
+        run = partial(
+            _execute_task, api_base_urls, url_list, url_map, query, session_id, timeout, adaptive_timeout, hedge,
+            task_id, result_options, max_urls_per_task
+        )
+
+        with metrics.default_recorder.timer("task"):
+            if idempotency_key:
+                journal = IdempotencyJournal(DATA_STATE / "idempotency", ttl=IDEMPOTENCY_TTL)
+                return journal.run(idempotency_key, run)
+            return run()
+
+    except Exception:
+        return {
+            "success": False,
+            "error": "任务执行失败"
+        }
+
+
+def monitor_browser_task(
+    urls: str | list[str],
+    query: str,
+    session_id: Optional[str] = None,
+    timeout: int = 600,
+    output_format: Optional[str] = None,
+    monitor_key: Optional[str] = None
+) -> dict:
+    """
+    以监控方式执行浏览器自动化任务，只在结果变化时保存
+
+    适合按计划反复对相同页面执行相同的提取任务。每次结果计算一个指纹（响应文本、
+    结果数据和文件内容的哈希），按监控键保存在本地状态目录：
+    - 首次执行或指纹变化：与 execute_browser_task 一样保存文件，changed 为 True
+    - 指纹与上次相同：不写入输出文件、不做后续处理，changed 为 False
+    上次的指纹随请求发给后端（previous_fingerprint），后端可在内容未变化时直接返回
+    {"status": "unchanged"}，或在响应中给出 fingerprint 代替客户端计算。
+    后端只返回文件引用且没有给出 sha256 时，文件先下载到暂存目录计算哈希，
+    内容未变化时删除，不写入输出目录。
+
+    Args:
+        urls: 目标网页 URL，可以是单个 URL 字符串或 URL 列表（在一个任务中执行，不分片）
+        query: 任务描述（自然语言）
+        session_id: 会话ID（可选），在该会话中执行任务
+        timeout: 任务超时时间（秒），默认 600（10分钟）
+        output_format: 结构化输出格式（可选），"ndjson" 或 "csv"
+        monitor_key: 监控键（可选），默认根据规范化后的 URL、任务描述和 output_format 推导
+
+    Returns:
+        包含任务执行结果的字典：
+        {
+            "success": True/False,
+            "changed": True/False,  # 结果是否与上次不同（首次执行为 True），失败时不存在
+            "fingerprint": "结果指纹",  # 成功时存在
+            "message": "任务执行描述",  # 未变化时为 "内容未变化"
+            "session_id": "会话ID",
+            "files": ["文件名"],  # 仅当变化且有文件时存在
+            "error": "错误信息"  # 失败时存在
+        }
+
+    Examples:
+        >>> result = monitor_browser_task(
+        ...     urls="https://example.com/notices",
+        ...     query="提取最新的公告列表"
+        ... )
+        >>> if result['success'] and result['changed']:
+        ...     print(result['message'])
+    """
+    try:
+        url_list, error = _validate_task_args(urls, query)
+        if error:
+            return error
+
+        if output_format is not None and output_format not in RECORD_FORMATS:
+            return {
+                "success": False,
+                "error": "输出格式不正确，应为 ndjson 或 csv"
+            }
+
+        api_base_urls = _api_base_urls()
+        if not api_base_urls:
+            return {
+                "success": False,
+                "error": "未配置 API 地址"
+            }
+
+        url_list, _ = dedupe_urls(url_list, resolve_url_rules(None))
+        monitor_key = monitor_key or derive_key(urls=url_list, query=query, output_format=output_format)
+        store = FingerprintStore(DATA_STATE / "monitor")
+        previous = store.get(monitor_key)
+        monitor = {"previous": previous["fingerprint"] if previous else None}
+        result_options = {
+            "spill_threshold": SPILL_THRESHOLD,
+            "output_format": output_format,
+            "monitor": monitor
+        }
+
+        with metrics.default_recorder.timer("monitor"):
+            result = _run_task(api_base_urls, url_list, query, session_id, timeout, result_options=result_options)
+        if result.get("success") and result.get("changed"):
+            store.record(monitor_key, result["fingerprint"])
+        return result
+
+    except Exception:
+        return {
+            "success": False,
+            "error": "任务执行失败"
+        }
+
+
+def execute_task_plan(
+    steps: list[dict],
+    session_id: Optional[str] = None,
+    timeout: int = 600,
+    task_id: Optional[str] = None
+) -> dict:
+    """
+    在一个会话中依次执行多步骤任务计划
+
+    全部步骤一次提交给后端（POST /agent/plan），后端在同一会话中连续执行，
+    每完成一步即流式返回该步骤的结果（NDJSON）。客户端收到一步的结果后立即在
+    后台处理（下载文件、写入记录等），与后端执行后续步骤重叠，不必每步往返一次。
+    后端不提供 /agent/plan 时，退回为在同一会话中逐步调用任务接口，某一步失败后
+    不再执行后续步骤。
+
+    Args:
+        steps: 步骤列表，按顺序执行，每个步骤为字典：
+               - query: 任务描述（必需）
+               - url: 目标网页 URL（可选），省略时在当前页面上继续操作
+               - expected_output: 预期输出（可选），"text"、"file" 或 "records"；
+                 records 要求后端按行返回结构化记录，写入 NDJSON 文件
+        session_id: 会话ID（可选），默认由后端新建会话
+        timeout: 超时时间（秒），默认 600（10分钟）。经 /agent/plan 执行时随请求发给后端作为
+                   整个计划的时间预算，客户端则以此作为读取超时：相邻两次收到数据的间隔
+                   超过该值时取消计划，计划的总耗时可能超过该值；逐步执行时为每一步的超时
+        task_id: 客户端任务ID（可选），默认自动生成，可通过 cancel_browser_task 取消；
+                 逐步执行时各步骤的任务ID为 "{task_id}-{序号}"
+
+    Returns:
+        包含计划执行结果的字典：
+        {
+            "success": True/False,  # 所有步骤是否都成功
+            "message": "完成 3/3 个步骤",
+            "session_id": "会话ID",
+            "steps": [{"success": True, "message": "...", "files": [...]}, ...],
+                      # 按步骤顺序，结构同 execute_browser_task 的返回值
+            "files": ["文件名"],  # 所有步骤的文件，仅当有文件时存在
+            "error": "错误信息"  # 有步骤失败时存在
+        }
+
+    Examples:
+        >>> result = execute_task_plan([
+        ...     {"url": "https://example.com/login", "query": "使用测试账号登录"},
+        ...     {"query": "打开报表页面，下载本月报表", "expected_output": "file"},
+        ...     {"query": "提取报表列表中的所有条目", "expected_output": "records"}
+        ... ])
+        >>> for step in result['steps']:
+        ...     print(step['success'], step.get('files'))
+    """
+    try:
+        plan_steps, error = _validate_plan_steps(steps)
+        if error:
+            return error
+
+        api_base_urls = _api_base_urls()
+        if not api_base_urls:
+            return {
+                "success": False,
+                "error": "未配置 API 地址"
+            }
+
+        task_id = task_id or uuid.uuid4().hex
+        manager = _session_manager_for(session_id)
+        if manager and session_id:
+            manager.acquire(session_id)
+        try:
+            with metrics.default_recorder.timer("plan"):
+                results = _run_plan_pipelined(api_base_urls, plan_steps, session_id, timeout, task_id)
+                if results is None:
+                    results = _run_plan_sequential(api_base_urls, plan_steps, session_id, timeout, task_id)
+        finally:
+            if manager and session_id:
+                manager.release(session_id)
+
+        succeeded = [r for r in results if r.get("success")]
+        result = {
+            "success": len(succeeded) == len(results),
+            "message": f"完成 {len(succeeded)}/{len(results)} 个步骤",
+            "session_id": session_id or next((r["session_id"] for r in results if r.get("session_id")), None),
+            "steps": results
+        }
+        files = [f for r in succeeded for f in r.get("files", [])]
+        if files:
+            result["files"] = files
+        if len(succeeded) < len(results):
+            result["error"] = next(r.get("error") for r in results if not r.get("success")) or "部分步骤执行失败"
+
+        new_session = result["session_id"]
+        if new_session and new_session != session_id:
+            manager = _session_manager_for(new_session)
+            if manager:
+                manager.touch(new_session)
+        return result
+
+    except Exception:
+        return {
+            "success": False,
+            "error": "任务执行失败"
+        }
+
+
+def _validate_plan_steps(steps: Any) -> tuple[list[dict], Optional[dict]]:
+    """
+    验证并规范化任务计划的步骤
+
+    Returns:
+        (规范化后的步骤列表, 错误结果字典)，参数正确时错误结果为 None
+    """
+    if not isinstance(steps, list) or not steps:
+        return [], {
+            "success": False,
+            "error": "步骤列表不能为空"
+        }
 
-        # 构建请求数据
-        request_data = {"query": full_query}
+    plan_steps = []
+    for index, step in enumerate(steps, start=1):
+        if not isinstance(step, dict) or not step.get("query") or not isinstance(step["query"], str):
+            return [], {
+                "success": False,
+                "error": f"第 {index} 步的任务描述不能为空"
+            }
+        url = step.get("url")
+        if url is not None and (not isinstance(url, str) or not url):
+            return [], {
+                "success": False,
+                "error": f"第 {index} 步的 URL 格式不正确"
+            }
+        expected_output = step.get("expected_output")
+        if expected_output is not None and expected_output not in PLAN_OUTPUTS:
+            return [], {
+                "success": False,
+                "error": f"第 {index} 步的预期输出不正确，应为 text、file 或 records"
+            }
+        plan_steps.append({"query": step["query"], "url": url, "expected_output": expected_output})
+    return plan_steps, None
+
+
+def _step_result_options(step: Dict[str, Any]) -> Dict[str, Any]:
+    """返回处理步骤结果的选项"""
+    return {
+        "spill_threshold": SPILL_THRESHOLD,
+        "output_format": "ndjson" if step["expected_output"] == "records" else None
+    }
+
+
+def _run_plan_pipelined(
+    api_base_urls: list[str],
+    steps: list[dict],
+    session_id: Optional[str],
+    timeout: int,
+    task_id: str
+) -> Optional[list[dict]]:
+    """
+    经 /agent/plan 执行任务计划，边接收边处理各步骤的结果
+
+    Returns:
+        按步骤顺序的结果列表；后端不提供 /agent/plan 时返回 None
+    """
+    api_base_url = _backend_for_session(session_id, api_base_urls)
+    plan_steps = []
+    for step in steps:
+        plan_step = {"query": _build_full_query([step["url"]] if step["url"] else [], step["query"])}
+        if step["expected_output"]:
+            plan_step["expected_output"] = step["expected_output"]
+        if step["expected_output"] == "records":
+            plan_step["result_format"] = "records"
+        plan_steps.append(plan_step)
+    request_data = {"task_id": task_id, "timeout": timeout, "steps": plan_steps}
+    if session_id:
+        request_data["session_id"] = session_id
+
+    futures: list[Optional[Future]] = [None] * len(steps)
+    failure = None
+    with _IN_FLIGHT_LOCK:
+        _IN_FLIGHT_TASKS[task_id] = [api_base_url]
+    try:
+        with ThreadPoolExecutor(max_workers=PLAN_RESULT_WORKERS) as executor:
+            try:
+                response = get_transport().request(
+                    "POST", f"{api_base_url}/agent/plan", json=request_data, timeout=timeout, stream=True
+                )
+                try:
+                    if response.status_code in PLAN_FALLBACK_STATUS_CODES:
+                        return None
+                    if response.status_code in OVERLOAD_STATUS_CODES:
+                        raise BackendOverloaded(retry_after=parse_retry_after(response.headers.get("Retry-After")))
+                    response.raise_for_status()
+
+                    # 不指定块大小，收到多少处理多少，每一步的结果到达后立即处理
+                    chunks = response.iter_content(chunk_size=None)
+                    for api_result in iter_ndjson(chunks, DATA_SPOOL):
+                        index = api_result.get("step")
+                        if not isinstance(index, int) or not 0 <= index < len(steps) or futures[index]:
+                            discard_spooled(api_result)
+                            continue
+                        _remember_session_backend(api_result.get("session_id"), api_base_url)
+                        # 结果处理（下载文件等）与后端执行后续步骤重叠
+                        futures[index] = executor.submit(
+                            _process_step_result, api_result, api_base_url, _step_result_options(steps[index])
+                        )
+                finally:
+                    response.close()
+            except requests.exceptions.Timeout:
+                _cancel_remote_task(task_id, [api_base_url])
+                failure = "任务超时"
+            except BackendOverloaded:
+                failure = "后端繁忙，请稍后重试"
+            except requests.exceptions.RequestException as e:
+                # 读取结果流期间的超时以 ConnectionError 的形式抛出
+                if is_read_timeout(e):
+                    _cancel_remote_task(task_id, [api_base_url])
+                    failure = "任务超时"
+                else:
+                    failure = "API 请求失败"
+            except Exception:
+                failure = "任务执行失败"
+            except BaseException:
+                # KeyboardInterrupt 等中断：通知后端停止后重新抛出
+                _cancel_remote_task(task_id, [api_base_url])
+                raise
+    finally:
+        with _IN_FLIGHT_LOCK:
+            _IN_FLIGHT_TASKS.pop(task_id, None)
+
+    return [
+        future.result() if future else {"success": False, "error": failure or "步骤未执行"}
+        for future in futures
+    ]
+
+
+def _process_step_result(
+    api_result: Dict[str, Any],
+    api_base_url: str,
+    result_options: Dict[str, Any]
+) -> dict:
+    """处理任务计划中一个步骤的结果"""
+    try:
+        if api_result.get("status") == "success":
+            return _process_success_result(api_result, api_base_url=api_base_url, result_options=result_options)
+        return _process_error_result(api_result)
+    except Exception:
+        return {
+            "success": False,
+            "error": "结果处理失败",
+            "session_id": api_result.get("session_id")
+        }
+    finally:
+        discard_spooled(api_result)
+
+
+def _run_plan_sequential(
+    api_base_urls: list[str],
+    steps: list[dict],
+    session_id: Optional[str],
+    timeout: int,
+    task_id: str
+) -> list[dict]:
+    """
+    逐步调用任务接口执行任务计划，后续步骤使用第一步得到的会话
+
+    Returns:
+        按步骤顺序的结果列表，某一步失败后的步骤不再执行
+    """
+    results: list[dict] = []
+    for index, step in enumerate(steps):
+        if results and not results[-1].get("success"):
+            results.append({"success": False, "error": "前序步骤失败，未执行"})
+            continue
+
+        url_list = [step["url"]] if step["url"] else []
+        options = _step_result_options(step)
         if session_id:
-            request_data["session_id"] = session_id
+            result = _run_task(
+                api_base_urls, url_list, step["query"], session_id, timeout,
+                task_id=f"{task_id}-{index}", result_options=options
+            )
+        else:
+            # 第一步由后端新建会话，不使用会话池中的共享会话
+            result = _submit_task(
+                api_base_urls, url_list, step["query"], None, timeout,
+                task_id=f"{task_id}-{index}", result_options=options
+            )
+        session_id = session_id or result.get("session_id")
+        results.append(result)
+    return results
 
-        # 调用后端 API
-        api_url = f"{api_base_url.rstrip('/')}/agent/task"
-        response = requests.post(
-            api_url,
-            json=request_data,
-            timeout=timeout
+
+def _validate_task_args(urls: Any, query: Any) -> tuple[list[str], Optional[dict]]:
+    """
+    验证 URL 和任务描述
+
+    Args:
+        urls: 单个 URL 字符串或 URL 列表
+        query: 任务描述
+
+    Returns:
+        (URL 列表, 错误结果字典)，参数正确时错误结果为 None
+    """
+    if isinstance(urls, str):
+        # 单个 URL
+        url_list = [urls]
+    elif isinstance(urls, list):
+        # URL 列表
+        if not urls or not all(isinstance(u, str) for u in urls):
+            return [], {
+                "success": False,
+                "error": "URL 列表格式不正确"
+            }
+        url_list = urls
+    else:
+        return [], {
+            "success": False,
+            "error": "URL 格式不正确，应为字符串或字符串列表"
+        }
+
+    if not query or not isinstance(query, str):
+        return [], {
+            "success": False,
+            "error": "任务描述不能为空"
+        }
+    return url_list, None
+
+
+def _api_base_urls() -> list[str]:
+    """
+    读取配置的后端 API 地址列表
+
+    Returns:
+        后端地址列表（去除尾部斜杠，unix:// 地址转换为 http+unix:// 形式），未配置时为空列表
+    """
+    raw = os.environ.get('BROWSER_API_URL', '')
+    return [normalize_base_url(url) for url in raw.split(',') if url.strip()]
+
+
+def _backend_for_session(session_id: Optional[str], api_base_urls: list[str]) -> str:
+    """
+    返回会话所在的后端，未知会话使用主后端
+
+    Args:
+        session_id: 会话ID（可选）
+        api_base_urls: 配置的后端地址列表
+
+    Returns:
+        后端地址
+    """
+    if session_id:
+        with _SESSION_BACKENDS_LOCK:
+            backend = _SESSION_BACKENDS.get(session_id)
+        if backend is None:
+            # 会话可能由其他进程创建，读取本地状态目录中的记录
+            backend = _load_session_backend(session_id)
+            if backend in api_base_urls:
+                _remember_session_backend(session_id, backend, persist=False)
+        if backend in api_base_urls:
+            return backend
+    return api_base_urls[0]
+
+
+def _remember_session_backend(session_id: Optional[str], api_base_url: str, persist: bool = True) -> None:
+    """
+    记录会话所在的后端，超出上限时淘汰内存中最久未使用的记录
+
+    对应关系同时写入本地状态目录，其他进程（如队列工作进程）收到该会话的任务时也能发往同一后端。
+
+    Args:
+        session_id: 会话ID（可选），为空时不记录
+        api_base_url: 会话所在的后端地址
+        persist: 是否写入本地状态目录（对应关系有变化时才写入）
+    """
+    if not session_id:
+        return
+    with _SESSION_BACKENDS_LOCK:
+        changed = _SESSION_BACKENDS.get(session_id) != api_base_url
+        _SESSION_BACKENDS[session_id] = api_base_url
+        _SESSION_BACKENDS.move_to_end(session_id)
+        while len(_SESSION_BACKENDS) > SESSION_AFFINITY_LIMIT:
+            _SESSION_BACKENDS.popitem(last=False)
+    if persist and changed:
+        path = _session_backend_path(session_id)
+        entry = {"session_id": session_id, "backend": api_base_url, "recorded_at": time.time()}
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(path)
+        except OSError:
+            pass
+
+
+def _forget_session_backend(session_id: str) -> None:
+    """删除会话与后端的对应关系（会话关闭后调用）"""
+    with _SESSION_BACKENDS_LOCK:
+        _SESSION_BACKENDS.pop(session_id, None)
+    try:
+        _session_backend_path(session_id).unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _load_session_backend(session_id: str) -> Optional[str]:
+    """读取本地状态目录中会话所在的后端，没有记录或已过期时返回 None"""
+    try:
+        entry = json.loads(_session_backend_path(session_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if entry.get("session_id") != session_id or time.time() - entry.get("recorded_at", 0) > SESSION_AFFINITY_TTL:
+        return None
+    return entry.get("backend")
+
+
+def _session_backend_path(session_id: str) -> Path:
+    return DATA_STATE / "sessions" / f"{derive_key(session_id=session_id)}.json"
+
+
+def _create_backend_session() -> str:
+    """
+    预先创建一个浏览器会话（供会话池使用）
+
+    安装了健康探测器时在排名最前的后端上创建并占用其一个空闲槽位，
+    使池中的会话分散到健康的后端；否则在主后端创建。
+
+    Returns:
+        新会话ID
+    """
+    api_base_urls = _api_base_urls()
+    prober = get_health_prober()
+    if prober is not None:
+        api_base_urls = prober.rank(api_base_urls)
+        prober.claim(api_base_urls[0])
+    api_base_url = api_base_urls[0]
+    response = get_transport().request("POST", f"{api_base_url}/sessions", timeout=SESSION_CREATE_TIMEOUT)
+    response.raise_for_status()
+    session_id = response.json()["session_id"]
+    _remember_session_backend(session_id, api_base_url)
+    return session_id
+
+
+def _close_backend_session(session_id: str) -> None:
+    """
+    关闭会话所在后端上的浏览器上下文
+
+    Args:
+        session_id: 会话ID
+    """
+    api_base_url = _backend_for_session(session_id, _api_base_urls())
+    response = get_transport().request(
+        "DELETE", f"{api_base_url}/sessions/{session_id}", timeout=SESSION_CLOSE_TIMEOUT
+    )
+    _forget_session_backend(session_id)
+    response.raise_for_status()
+
+
+def _reset_backend_session(session_id: str) -> None:
+    """
+    清除会话的浏览器状态（Cookie、存储、登录态、已下载文件），供会话池复用前调用
+
+    Args:
+        session_id: 会话ID
+    """
+    api_base_url = _backend_for_session(session_id, _api_base_urls())
+    response = get_transport().request(
+        "POST", f"{api_base_url}/sessions/{session_id}/reset", timeout=SESSION_CLOSE_TIMEOUT
+    )
+    response.raise_for_status()
+
+
+def _build_full_query(url_list: list[str], query: str) -> str:
+    """
+    构建包含 URL 的完整查询
+
+    Args:
+        url_list: URL 列表
+        query: 任务描述
+
+    Returns:
+        发送给后端的完整自然语言查询
+    """
+    if not url_list:
+        # 在当前页面上继续操作
+        return query
+
+    if len(url_list) == 1:
+        # 单个 URL
+        return f"访问 {url_list[0]}，然后{query}"
+
+    # 多个 URL
+    urls_text = URL_SEPARATOR.join(url_list)
+    return f"访问以下网站：{urls_text}。然后{query}"
+
+
+def _post_task(
+    api_base_url: str,
+    request_data: Dict[str, Any],
+    timeout: float,
+    headers: Optional[Dict[str, str]] = None
+) -> tuple[str, Dict[str, Any]]:
+    """
+    调用后端任务接口
+
+    启用限制器组（src.limiter.install_limiter_group）时，请求先在该后端的
+    限制器中排队；后端返回 429/503 时按 Retry-After 暂停并重试，
+    最多 BACKPRESSURE_MAX_RETRIES 次。
+
+    Args:
+        api_base_url: 后端 API 地址
+        request_data: 请求数据
+        timeout: 请求超时时间（秒）
+        headers: 额外的请求头（如 Idempotency-Key）
+
+    Returns:
+        (处理该请求的后端地址, API 返回的原始结果)
+
+    Raises:
+        BackendOverloaded: 后端持续繁忙，或排队超过任务超时
+    """
+    api_url = f"{api_base_url.rstrip('/')}/agent/task"
+    group = get_limiter_group()
+    limiter = group.for_backend(api_base_url) if group else None
+    deadline = time.monotonic() + timeout
+
+    for attempt in range(BACKPRESSURE_MAX_RETRIES + 1):
+        # 启用限制器时超出并发上限的请求在此排队，排队时间计入任务超时
+        if limiter:
+            limiter.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        started = time.monotonic()
+        try:
+            response = get_transport().request(
+                "POST",
+                api_url,
+                json=request_data,
+                headers=headers or None,
+                timeout=timeout,
+                stream=True
+            )
+        except BaseException:
+            if limiter:
+                limiter.release()
+            raise
+
+        if response.status_code in OVERLOAD_STATUS_CODES:
+            # 后端繁忙，任务未被接受：按 Retry-After 暂停后重试
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            response.close()
+            if limiter:
+                limiter.release(rejected=True, retry_after=retry_after)
+            if not limiter or attempt == BACKPRESSURE_MAX_RETRIES:
+                raise BackendOverloaded(retry_after=retry_after)
+            continue
+
+        latency = None
+        try:
+            # 检查 HTTP 状态
+            response.raise_for_status()
+            # 流式解析，内联文件内容直接解码到暂存目录
+            api_result = parse_task_response(response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE), DATA_SPOOL)
+            latency = time.monotonic() - started
+        finally:
+            response.close()
+            if limiter:
+                limiter.release(latency=latency)
+        return api_base_url, api_result
+
+
+def _dispatch_task(
+    primary: str,
+    alternate: Optional[str],
+    request_data: Dict[str, Any],
+    timeout: float,
+    hedge_delay: Optional[float],
+    headers: Optional[Dict[str, str]] = None
+) -> tuple[str, Dict[str, Any]]:
+    """
+    发送任务请求，客户端放弃等待时通知后端取消
+
+    请求期间任务登记为执行中，cancel_browser_task 据此找到任务所在的后端。
+    客户端超时、KeyboardInterrupt、asyncio 取消等中断发生时，向已发出请求的
+    后端发送取消请求后再重新抛出；对冲中落败的一方也会被取消。
+
+    Args:
+        primary: 主后端地址
+        alternate: 对冲后端地址（可选）
+        request_data: 请求数据（包含 task_id）
+        timeout: 请求超时时间（秒）
+        hedge_delay: 发出对冲请求前的等待时间（秒）
+        headers: 额外的请求头，主请求和对冲请求相同
+
+    Returns:
+        (处理该请求的后端地址, API 返回的原始结果)
+    """
+    task_id = request_data["task_id"]
+    backends = [primary, alternate] if alternate else [primary]
+    with _IN_FLIGHT_LOCK:
+        _IN_FLIGHT_TASKS[task_id] = backends
+
+    try:
+        if not alternate:
+            return _post_task(primary, request_data, timeout, headers)
+
+        _, result = hedging.default_hedger.run(
+            lambda: _post_task(primary, request_data, timeout, headers),
+            lambda: _post_task(alternate, request_data, timeout, headers),
+            delay=hedge_delay,
+            on_lose=lambda loser: threading.Thread(
+                target=_cancel_remote_task, args=(task_id, [backends[loser]]), daemon=True
+            ).start(),
+            # 落败方的响应不会被处理，删除其内联文件的暂存内容
+            on_discard=lambda outcome: discard_spooled(outcome[1])
         )
+        return result
 
-        # 检查 HTTP 状态
-        response.raise_for_status()
-        api_result = response.json()
+    except BaseException as e:
+        # 连接失败等情况下后端没有在执行任务，无需取消
+        if isinstance(e, requests.exceptions.Timeout) or not isinstance(e, Exception):
+            _cancel_remote_task(task_id, backends)
+        raise
+
+    finally:
+        with _IN_FLIGHT_LOCK:
+            _IN_FLIGHT_TASKS.pop(task_id, None)
+
+
+def _cancel_remote_task(task_id: str, api_base_urls: list[str], timeout: float = CANCEL_TIMEOUT) -> list[int]:
+    """
+    尽力向后端发送取消请求，不抛出异常
+
+    Args:
+        task_id: 任务ID
+        api_base_urls: 需要通知的后端地址列表
+        timeout: 单个取消请求的超时时间（秒）
+
+    Returns:
+        各后端返回的 HTTP 状态码（请求失败的后端不计入）
+    """
+    status_codes = []
+    for api_base_url in api_base_urls:
+        try:
+            response = get_transport().request(
+                "POST", f"{api_base_url.rstrip('/')}/agent/task/{task_id}/cancel", timeout=timeout
+            )
+            status_codes.append(response.status_code)
+        except Exception:
+            continue
+    return status_codes
+
+
+def _run_task(
+    api_base_urls: list[str],
+    url_list: list[str],
+    query: str,
+    session_id: Optional[str],
+    timeout: int,
+    adaptive_timeout: bool = False,
+    hedge: bool = False,
+    task_id: Optional[str] = None,
+    result_options: Optional[Dict[str, Any]] = None
+) -> dict:
+    """
+    向后端提交单个任务并处理结果
+
+    每次任务的耗时都会按 (目标域名, 任务类型) 记录，供自适应超时和对冲使用。
+
+    Args:
+        api_base_urls: 配置的后端地址列表
+        url_list: 本次任务的 URL 列表
+        query: 任务描述
+        session_id: 会话ID（可选）
+        timeout: 任务超时时间（秒）
+        adaptive_timeout: 是否根据历史耗时缩短超时
+        hedge: 是否在主请求过慢时向另一个后端发出对冲请求
+        task_id: 客户端任务ID（可选），默认自动生成
+        result_options: 结果处理选项（如 spill_threshold），见 _process_success_result
+
+    Returns:
+        与 execute_browser_task 相同结构的结果字典
+    """
+    # 未指定会话时优先使用会话池中的热会话，任务结束后重置并归还。
+    # 池中的会话会交给其他任务，不在结果中返回其ID，调用方无法再使用或下载该会话的内容
+    pool = get_session_pool() if not session_id else None
+    pooled_session = pool.acquire() if pool else None
+    prober = get_health_prober()
+    if pooled_session and prober is not None and (
+            _backend_for_session(pooled_session, api_base_urls) not in prober.rank(api_base_urls)):
+        # 热会话所在的后端已不健康：关闭该会话，任务按探测结果另选后端
+        pool.release(pooled_session, discard=True)
+        pooled_session = None
+    if pooled_session:
+        if (result_options or {}).get("lazy_files"):
+            # 会话归还时的重置会清除后端的已下载文件，延迟下载的句柄届时将无法取回，因此直接下载
+            result_options = dict(result_options, lazy_files=False, prefetch_files=False)
+        try:
+            result = _submit_task(
+                api_base_urls, url_list, query, pooled_session, timeout, adaptive_timeout, hedge, task_id,
+                result_options
+            )
+        except BaseException:
+            pool.release(pooled_session, discard=True)
+            raise
+        pool.release(pooled_session, discard=not result.get("success"))
+        if result.get("session_id") == pooled_session:
+            del result["session_id"]
+        return result
+
+    # 会话管理器跟踪调用方持有的会话，执行期间的会话不会被当作空闲会话关闭
+    manager = _session_manager_for(session_id)
+    if manager and session_id:
+        manager.acquire(session_id)
+    try:
+        result = _submit_task(
+            api_base_urls, url_list, query, session_id, timeout, adaptive_timeout, hedge, task_id, result_options
+        )
+    finally:
+        if manager and session_id:
+            manager.release(session_id)
+
+    new_session = result.get("session_id")
+    if new_session and new_session != session_id:
+        manager = _session_manager_for(new_session)
+        if manager:
+            manager.touch(new_session)
+    return result
+
+
+def _session_manager_for(session_id: Optional[str]) -> Optional[SessionManager]:
+    """返回负责跟踪该会话的会话管理器，会话池中的会话由会话池自行管理"""
+    manager = get_session_manager()
+    pool = get_session_pool()
+    if manager is None or (session_id and pool is not None and pool.owns(session_id)):
+        return None
+    return manager
+
+
+def _submit_task(
+    api_base_urls: list[str],
+    url_list: list[str],
+    query: str,
+    session_id: Optional[str],
+    timeout: int,
+    adaptive_timeout: bool = False,
+    hedge: bool = False,
+    task_id: Optional[str] = None,
+    result_options: Optional[Dict[str, Any]] = None
+) -> dict:
+    """
+    向后端提交单个任务（参数与 _run_task 相同，不经过会话池和会话管理器）
+    """
+    domain = url_domain(url_list[0]) if url_list else ""
+    kind = "task" if len(url_list) <= 1 else "batch"
+    if adaptive_timeout:
+        timeout = _LATENCY.adaptive_timeout(
+            domain,
+            kind,
+            default=timeout,
+            percentile=ADAPTIVE_TIMEOUT_PERCENTILE,
+            multiplier=ADAPTIVE_TIMEOUT_MULTIPLIER,
+            floor=ADAPTIVE_TIMEOUT_FLOOR
+        )
+
+    # 会话固定在创建它的后端上，只有新会话的任务可以按健康探测结果选择后端、对冲到其他后端
+    prober = get_health_prober()
+    if prober is not None and not session_id:
+        api_base_urls = prober.rank(api_base_urls)
+        prober.claim(api_base_urls[0])
+    primary = _backend_for_session(session_id, api_base_urls)
+    alternates = [url for url in api_base_urls if url != primary]
+    alternate = alternates[0] if hedge and alternates and not session_id else None
+
+    started = time.monotonic()
+    api_result = None
+    try:
+        # 构建请求数据（timeout 告知后端客户端的时间预算，超出后结果不会再被等待）
+        request_data = {
+            "query": _build_full_query(url_list, query),
+            "task_id": task_id or uuid.uuid4().hex,
+            "timeout": timeout
+        }
+        if session_id:
+            request_data["session_id"] = session_id
+        if (result_options or {}).get("output_format"):
+            # 要求后端按行返回结构化记录
+            request_data["result_format"] = "records"
+        if (result_options or {}).get("profile"):
+            # 要求后端在 debug_trace 中返回步骤耗时
+            request_data["profile"] = True
+        if (result_options or {}).get("file_filter"):
+            # 告知后端只需要哪些文件
+            request_data["file_filter"] = result_options["file_filter"].to_request()
+        monitor = (result_options or {}).get("monitor")
+        if monitor and monitor.get("previous"):
+            # 后端可据此判断内容未变化，跳过 LLM 处理和文件传输
+            request_data["previous_fingerprint"] = monitor["previous"]
+        headers = {}
+        if (result_options or {}).get("idempotency_key"):
+            headers["Idempotency-Key"] = result_options["idempotency_key"]
+
+        # 调用后端 API
+        hedge_delay = _LATENCY.percentile(domain, kind, HEDGE_PERCENTILE) if alternate else None
+        served_by, api_result = _dispatch_task(primary, alternate, request_data, timeout, hedge_delay, headers)
+        elapsed = time.monotonic() - started
+        _LATENCY.record(domain, kind, elapsed)
+        metrics.default_recorder.record("task.backend", elapsed)
+        _remember_session_backend(api_result.get("session_id"), served_by)
+
+        # 监控任务的结果未变化时不做后续处理
+        if monitor is not None and api_result.get("status") in ("success", "unchanged"):
+            early_result = _check_monitored_result(api_result, served_by, hedge, monitor)
+            if early_result:
+                return early_result
 
         # 解析 API 返回结果
-        if api_result.get("status") == "success":
-            return _process_success_result(api_result)
-        else:
-            return _process_error_result(api_result)
+        with metrics.default_recorder.timer("task.results"):
+            if api_result.get("status") == "success":
+                result = _process_success_result(
+                    api_result, api_base_url=served_by, hedge=hedge, result_options=result_options
+                )
+                if monitor is not None and result.get("success"):
+                    result["changed"] = True
+                    result["fingerprint"] = monitor["fingerprint"]
+            else:
+                result = _process_error_result(api_result)
+
+            if request_data.get("profile"):
+                trace_file = _export_profile(api_result, request_data["task_id"], elapsed)
+                if trace_file:
+                    result["trace_file"] = trace_file
+        return result
 
     except requests.exceptions.Timeout:
+        # 超时样本只知道耗时不少于 timeout，按 timeout 记录
+        _LATENCY.record(domain, kind, timeout)
         return {
             "success": False,
             "error": "任务超时"
         }
+    except BackendOverloaded:
+        return {
+            "success": False,
+            "error": "后端繁忙，请稍后重试"
+        }
     except requests.exceptions.RequestException:
         return {
             "success": False,
@@ -212,14 +1319,285 @@ def execute_browser_task(
             "success": False,
             "error": "任务执行失败"
         }
+    finally:
+        # 内联文件保存后已移出暂存目录；结果未被使用或处理出错时在此删除
+        if api_result is not None:
+            discard_spooled(api_result)
+
+
+def _check_monitored_result(
+    api_result: Dict[str, Any],
+    api_base_url: str,
+    hedge: bool,
+    monitor: Dict[str, Any]
+) -> Optional[dict]:
+    """
+    计算监控任务结果的指纹，与上次相同时丢弃结果
+
+    没有后端给出的 sha256 的文件引用先下载到暂存目录计算哈希，结果改写为
+    指向暂存文件的内联文件，内容变化时由 _save_inline_file 移动到输出目录。
+
+    Args:
+        api_result: API 返回的原始结果（可能被改写）
+        api_base_url: 返回该结果的后端地址
+        hedge: 下载文件时是否启用对冲请求
+        monitor: 监控状态，读取 previous，写入本次的 fingerprint
+
+    Returns:
+        未变化或文件下载失败时直接返回的结果字典，内容变化时返回 None
+    """
+    previous = monitor.get("previous")
+    if api_result.get("status") == "unchanged":
+        fingerprint = api_result.get("fingerprint") or previous
+    else:
+        fingerprint = api_result.get("fingerprint")
+        result_data = api_result.get("result")
+        if not fingerprint and isinstance(result_data, dict) and result_data.get("type") == "file_reference" \
+                and result_data.get("file_id") and not result_data.get("sha256"):
+            DATA_SPOOL.mkdir(parents=True, exist_ok=True)
+            spool_path = DATA_SPOOL / f"{uuid.uuid4().hex}.download"
+            download_url = f"{api_base_url.rstrip('/')}/downloads/{result_data['file_id']}"
+            try:
+                with metrics.default_recorder.timer("download"):
+                    size_bytes = _fetch_file(download_url, spool_path, DOWNLOAD_READ_TIMEOUT, "download", hedge)
+            except Exception:
+                return {
+                    "success": False,
+                    "error": "文件下载失败",
+                    "session_id": api_result.get("session_id")
+                }
+            api_result["result"] = {
+                **result_data,
+                "type": "file_inline",
+                "content_path": str(spool_path),
+                "content_size": size_bytes
+            }
+        fingerprint = fingerprint or result_fingerprint(api_result)
+    monitor["fingerprint"] = fingerprint
+
+    if not previous or fingerprint != previous:
+        return None
+
+    # 丢弃暂存的文件内容
+    result_data = api_result.get("result")
+    if isinstance(result_data, dict) and result_data.get("content_path"):
+        Path(result_data["content_path"]).unlink(missing_ok=True)
+    return {
+        "success": True,
+        "changed": False,
+        "fingerprint": fingerprint,
+        "message": "内容未变化",
+        "session_id": api_result.get("session_id")
+    }
+
+
+def _export_profile(api_result: Dict[str, Any], task_id: str, elapsed: float) -> Optional[str]:
+    """
+    导出后端返回的步骤耗时
+
+    Args:
+        api_result: API 返回的原始结果
+        task_id: 任务ID
+        elapsed: 客户端观测到的任务耗时（秒）
+
+    Returns:
+        trace 文件名；后端未返回步骤耗时或写入失败时返回 None
+    """
+    debug_trace = api_result.get("debug_trace")
+    steps = debug_trace.get("steps") if isinstance(debug_trace, dict) else None
+    if not steps:
+        return None
+    try:
+        profiling.default_profile.record(steps)
+        trace = profiling.to_chrome_trace(steps, task_id, elapsed=elapsed)
+        return profiling.write_trace(trace, DATA_OUTPUTS, task_id)
+    except Exception:
+        return None
+
+
+def _execute_task(
+    api_base_urls: list[str],
+    url_list: list[str],
+    url_map: Dict[str, str],
+    query: str,
+    session_id: Optional[str],
+    timeout: int,
+    adaptive_timeout: bool,
+    hedge: bool,
+    task_id: str,
+    result_options: Dict[str, Any],
+    max_urls_per_task: int
+) -> dict:
+    """
+    执行任务（URL 过多时拆分为多个有界任务），并将结果映射回每个原始 URL
+
+    Args:
+        api_base_urls: 配置的后端地址列表
+        url_list: 规范化去重后的 URL 列表
+        url_map: 原始 URL -> 规范化后的 URL
+        query: 任务描述
+        session_id: 会话ID（可选）
+        timeout: 任务超时时间（秒）
+        adaptive_timeout: 是否根据历史耗时缩短超时
+        hedge: 是否启用对冲请求
+        task_id: 客户端任务ID
+        result_options: 结果处理选项，见 _process_success_result
+        max_urls_per_task: 单个后端任务的最大 URL 数
+
+    Returns:
+        与 execute_browser_task 相同结构的结果字典
+    """
+    # URL 过多时拆分为多个有界任务
+    shards = split_urls(url_list, max_urls=max_urls_per_task, max_chars=SHARD_MAX_QUERY_CHARS)
+    if len(shards) > 1:
+        result = _execute_sharded(
+            api_base_urls, shards, query, session_id, timeout, adaptive_timeout, hedge, task_id, result_options
+        )
+    else:
+        result = _run_task(
+            api_base_urls, url_list, query, session_id, timeout, adaptive_timeout, hedge, task_id, result_options
+        )
+
+    # 将结果映射回每个原始 URL
+    if any(original != canonical for original, canonical in url_map.items()):
+        result["url_map"] = url_map
+    return result
+
+
+def _execute_sharded(
+    api_base_urls: list[str],
+    shards: list[list[str]],
+    query: str,
+    session_id: Optional[str],
+    timeout: int,
+    adaptive_timeout: bool = False,
+    hedge: bool = False,
+    task_id: Optional[str] = None,
+    result_options: Optional[Dict[str, Any]] = None
+) -> dict:
+    """
+    分片执行任务并合并结果
+
+    未指定 session_id 时各分片并发执行；指定 session_id 时
+    分片在同一会话中依次执行。已成功的分片记录在检查点中，
+    有效期（SHARD_CHECKPOINT_TTL）内重跑时直接复用，全部成功后删除检查点。
+
+    Args:
+        api_base_urls: 配置的后端地址列表
+        shards: URL 分片列表
+        query: 任务描述
+        session_id: 会话ID（可选）
+        timeout: 单个分片的超时时间（秒）
+        adaptive_timeout: 是否根据历史耗时缩短超时
+        hedge: 是否对过慢的分片发出对冲请求
+        task_id: 整体任务ID，各分片使用 "{task_id}-{序号}"
+        result_options: 结果处理选项，传给每个分片
+
+    Returns:
+        合并后的结果字典，包含 shards 统计信息
+    """
+    key_options = _shard_key_options(session_id, result_options)
+    run_key = shard_key(query, [url for shard in shards for url in shard], key_options)
+    checkpoint = ShardCheckpoint(DATA_STATE / "shards" / f"{run_key}.json", ttl=SHARD_CHECKPOINT_TTL)
+
+    task_id = task_id or uuid.uuid4().hex
 
+    run_shard = partial(
+        _run_shard, checkpoint, key_options, api_base_urls, query, session_id, timeout, adaptive_timeout, hedge,
+        task_id, result_options
+    )
 
-def _process_success_result(api_result: Dict[str, Any]) -> dict:
+    if session_id:
+        results = [run_shard(index, shard) for index, shard in enumerate(shards)]
+    else:
+        with ThreadPoolExecutor(max_workers=SHARD_MAX_WORKERS) as executor:
+            results = list(executor.map(run_shard, range(len(shards)), shards))
+
+    merged = merge_shard_results(results)
+    if merged["success"]:
+        checkpoint.clear()
+    return merged
+
+
+def _run_shard(
+    checkpoint: ShardCheckpoint,
+    key_options: Dict[str, Any],
+    api_base_urls: list[str],
+    query: str,
+    session_id: Optional[str],
+    timeout: int,
+    adaptive_timeout: bool,
+    hedge: bool,
+    task_id: str,
+    result_options: Optional[Dict[str, Any]],
+    index: int,
+    shard: list[str]
+) -> dict:
+    """
+    执行单个分片，检查点中已有成功结果时直接复用
+
+    Args:
+        checkpoint: 本次分片执行的检查点
+        key_options: 计入检查点键的选项，见 _shard_key_options
+        index: 分片序号，分片任务ID为 "{task_id}-{index}"
+        shard: 分片的 URL 列表
+        其余参数同 _execute_sharded
+
+    Returns:
+        分片的结果字典
+    """
+    key = shard_key(query, shard, key_options)
+    cached = checkpoint.get(key)
+    if cached is not None:
+        return cached
+
+    shard_options = dict(result_options or {})
+    if shard_options.get("idempotency_key"):
+        shard_options["idempotency_key"] = f"{shard_options['idempotency_key']}-{index}"
+    result = _run_task(
+        api_base_urls, shard, query, session_id, timeout, adaptive_timeout, hedge, f"{task_id}-{index}", shard_options
+    )
+    if result.get("success"):
+        checkpoint.record(key, result)
+    return result
+
+
+def _shard_key_options(session_id: Optional[str], result_options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    提取影响分片结果的选项，计入检查点的键
+
+    幂等键只用于后端去重，不影响结果，不计入；文件筛选条件转换为可序列化的形式。
+    """
+    options = {
+        key: value for key, value in (result_options or {}).items()
+        if key != "idempotency_key" and value is not None
+    }
+    if options.get("file_filter"):
+        options["file_filter"] = options["file_filter"].to_request()
+    if session_id:
+        options["session_id"] = session_id
+    return options
+
+
+def _process_success_result(
+    api_result: Dict[str, Any],
+    api_base_url: Optional[str] = None,
+    hedge: bool = False,
+    result_options: Optional[Dict[str, Any]] = None
+) -> dict:
     """
     处理成功的 API 结果
 
     Args:
         api_result: API 返回的原始结果
+        api_base_url: 返回该结果的后端地址（可选），文件从该后端下载
+        hedge: 下载文件时是否启用对冲请求
+        result_options: 结果处理选项：
+            - spill_threshold: 文本结果写入文件的字节数阈值，None 表示不限制
+            - output_format: 结构化记录的输出格式（"ndjson" 或 "csv"）
+            - idempotency_key: 幂等键，作为 Idempotency-Key 请求头发给后端
+            - file_filter: 文件筛选条件（FileFilter），未通过的文件只返回元数据
+            - lazy_files / prefetch_files: 文件引用是否延迟下载、是否在后台预取
 
     Returns:
         处理后的结果字典，简化用户界面
@@ -234,13 +1612,26 @@ def _process_success_result(api_result: Dict[str, Any]) -> dict:
         "message": response_text,
         "session_id": session_id
     }
+    file_filter = (result_options or {}).get("file_filter")
 
     # 情况1: 返回文件引用
     if result_data and result_data.get("type") == "file_reference":
-        file_info = _download_file_from_api(api_result)
-        if file_info:
+        file_info = _download_file_from_api(
+            api_result,
+            api_base_url=api_base_url,
+            hedge=hedge,
+            file_filter=file_filter,
+            lazy=bool((result_options or {}).get("lazy_files")),
+            prefetch=bool((result_options or {}).get("prefetch_files"))
+        )
+        if file_info and file_info.get("reason"):
+            base_response["skipped_files"] = [file_info]
+            return base_response
+        elif file_info:
             # 简化文件信息，只返回文件名
             base_response["files"] = [file_info.get("filename")]
+            if isinstance(file_info, LazyFile):
+                base_response["file_handles"] = [file_info]
             return base_response
         else:
             return {
@@ -251,8 +1642,11 @@ def _process_success_result(api_result: Dict[str, Any]) -> dict:
 
     # 情况2: 返回内联文件
     elif result_data and result_data.get("type") == "file_inline":
-        file_info = _save_inline_file(result_data)
-        if file_info:
+        file_info = _save_inline_file(result_data, file_filter=file_filter)
+        if file_info and file_info.get("reason"):
+            base_response["skipped_files"] = [file_info]
+            return base_response
+        elif file_info:
             # 简化文件信息，只返回文件名
             base_response["files"] = [file_info.get("filename")]
             return base_response
@@ -263,14 +1657,54 @@ def _process_success_result(api_result: Dict[str, Any]) -> dict:
                 "session_id": session_id
             }
 
-    # 情况3: 返回文本数据
+    # 情况3: 返回结构化记录
+    elif result_data and result_data.get("type") == "records":
+        records_info = write_records(
+            result_data.get("records") or [],
+            DATA_OUTPUTS,
+            (result_options or {}).get("output_format") or "ndjson",
+            schema=result_data.get("schema")
+        )
+        base_response["records"] = records_info
+        base_response["files"] = [records_info["file"]]
+        return base_response
+
+    # 情况4: 返回文本数据
     elif result_data and result_data.get("type") == "text":
         # 文本内容直接放在 message 中，不需要额外的 result 字段
-        return base_response
+        return _spill_large_text(base_response, result_options)
 
-    # 情况4: 无具体结果，只有响应文本
+    # 情况5: 无具体结果，只有响应文本
     else:
-        return base_response
+        return _spill_large_text(base_response, result_options)
+
+
+def _spill_large_text(response: dict, result_options: Optional[Dict[str, Any]]) -> dict:
+    """
+    文本超过阈值时写入输出目录，message 替换为预览
+
+    Args:
+        response: 成功结果字典
+        result_options: 结果处理选项，读取其中的 spill_threshold
+
+    Returns:
+        处理后的结果字典
+    """
+    threshold = (result_options or {}).get("spill_threshold")
+    message = response.get("message")
+    # 先按字符数粗判：UTF-8 编码下每个字符最多 4 字节
+    if threshold is None or not isinstance(message, str) or len(message) * 4 <= threshold:
+        return response
+    if len(message.encode("utf-8")) <= threshold:
+        return response
+
+    filename, size = spill_text(message, DATA_OUTPUTS)
+    response["message"] = (
+        f"{text_preview(message, SPILL_PREVIEW_CHARS)}\n\n（完整内容共 {size} 字节，已保存到文件 {filename}）"
+    )
+    response["text_file"] = filename
+    response["files"] = [filename]
+    return response
 
 
 def _process_error_result(api_result: Dict[str, Any]) -> dict:
@@ -303,15 +1737,138 @@ def _process_error_result(api_result: Dict[str, Any]) -> dict:
     return result
 
 
-def _download_file_from_api(api_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+class _DownloadCancelled(Exception):
+    """对冲下载中落败的一方被取消"""
+
+
+def _stream_to_file(
+    url: str,
+    output_path: Path,
+    read_timeout: float,
+    cancel: Optional[threading.Event] = None,
+    max_bytes: Optional[int] = None
+) -> int:
+    """
+    流式下载文件
+
+    先写入同目录下的临时文件，完成后原子替换为目标文件，
+    因此中途失败或被取消时不会留下不完整的文件。超时按吞吐量判定：
+    单次读取停顿超过 read_timeout，或（Content-Length 已知且未收完时）
+    首字节后的宽限期过后平均速度低于 DOWNLOAD_MIN_BYTES_PER_SEC 时中止。
+
+    Args:
+        url: 下载地址
+        output_path: 目标文件路径
+        read_timeout: 单次读取的停顿超时（秒）
+        cancel: 取消事件（可选），置位后停止下载
+        max_bytes: 文件大小上限（字节，可选），超过时中止下载
+
+    Returns:
+        文件大小（字节）
+
+    Raises:
+        FileTooLarge: 文件超过 max_bytes
+    """
+    part_path = output_path.with_name(f".{output_path.name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        response = get_transport().request("GET", url, timeout=read_timeout, stream=True)
+        response.raise_for_status()
+        content_length = response.headers.get("Content-Length")
+        expected_bytes = int(content_length) if isinstance(content_length, str) and content_length.isdigit() else None
+        if max_bytes is not None and expected_bytes is not None and expected_bytes > max_bytes:
+            response.close()
+            raise FileTooLarge(expected_bytes)
+
+        size_bytes = 0
+        chunks = iter_with_throughput(
+            response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE),
+            min_bytes_per_sec=DOWNLOAD_MIN_BYTES_PER_SEC,
+            grace=DOWNLOAD_GRACE_PERIOD,
+            expected_bytes=expected_bytes
+        )
+        with open(part_path, "wb") as f:
+            for chunk in chunks:
+                if cancel is not None and cancel.is_set():
+                    raise _DownloadCancelled()
+                f.write(chunk)
+                size_bytes += len(chunk)
+                if max_bytes is not None and size_bytes > max_bytes:
+                    response.close()
+                    raise FileTooLarge(size_bytes)
+
+        part_path.replace(output_path)
+        return size_bytes
+    finally:
+        part_path.unlink(missing_ok=True)
+
+
+def _fetch_file(
+    url: str,
+    output_path: Path,
+    read_timeout: float,
+    kind: str,
+    hedge: bool = False,
+    max_bytes: Optional[int] = None
+) -> int:
+    """
+    下载文件到 output_path，可选对冲
+
+    对冲时两路下载写入各自的临时文件，先完成者替换目标文件，
+    落败的一方收到取消信号后停止读取并删除临时文件。
+
+    Args:
+        url: 下载地址
+        output_path: 目标文件路径
+        read_timeout: 单次读取的停顿超时（秒）
+        kind: 耗时统计中的任务类型（"download" 或 "bundle"）
+        hedge: 是否启用对冲请求
+        max_bytes: 文件大小上限（字节，可选），超过时中止下载并抛出 FileTooLarge
+
+    Returns:
+        文件大小（字节）
+    """
+    domain = url_domain(url)
+    started = time.monotonic()
+
+    if hedge:
+        cancels = [threading.Event(), threading.Event()]
+        _, size_bytes = hedging.default_hedger.run(
+            lambda: _stream_to_file(url, output_path, read_timeout, cancels[0], max_bytes),
+            lambda: _stream_to_file(url, output_path, read_timeout, cancels[1], max_bytes),
+            delay=_LATENCY.percentile(domain, kind, HEDGE_PERCENTILE),
+            on_lose=lambda loser: cancels[loser].set()
+        )
+    else:
+        size_bytes = _stream_to_file(url, output_path, read_timeout, max_bytes=max_bytes)
+
+    _LATENCY.record(domain, kind, time.monotonic() - started)
+    return size_bytes
+
+
+def _download_file_from_api(
+    api_result: Dict[str, Any],
+    api_base_url: Optional[str] = None,
+    hedge: bool = False,
+    file_filter: Optional[FileFilter] = None,
+    lazy: bool = False,
+    prefetch: bool = False
+) -> Optional[Dict[str, Any]]:
     """
     从 API 结果中下载文件到 data/outputs/
 
+    文件以流式写入磁盘，超时按吞吐量判定，大文件不会因固定的总时长而失败。
+
     Args:
         api_result: API 返回的原始结果
+        api_base_url: 文件所在的后端地址（可选），默认使用主后端
+        hedge: 是否启用对冲请求（发往同一后端的新连接）
+        file_filter: 文件筛选条件（可选）。未通过时不下载；后端未给出大小时，
+                     下载超过大小上限即中止
+        lazy: 是否延迟下载，为 True 时不下载，返回首次访问时才下载的 LazyFile
+        prefetch: 延迟下载时是否立即在后台开始下载
 
     Returns:
-        文件信息字典，失败返回 None
+        文件信息字典（延迟下载时为 LazyFile），未通过筛选时带有 reason（未下载），失败返回 None
     """
     try:
         result_data = api_result.get("result", {})
@@ -322,27 +1879,46 @@ def _download_file_from_api(api_result: Dict[str, Any]) -> Optional[Dict[str, An
         if not file_id:
             return None
 
+        if file_filter:
+            size_hint = result_data.get("size_bytes")
+            size_hint = size_hint if isinstance(size_hint, int) else None
+            reason = file_filter.reject_reason(filename, result_data.get("mime_type"), size_hint)
+            if reason:
+                return skipped_file(filename, result_data.get("mime_type"), size_hint, reason, file_id)
+
         # 构建下载 URL
-        api_base_url = os.environ.get('BROWSER_API_URL')
+        api_base_url = api_base_url or next(iter(_api_base_urls()), None)
         if not api_base_url:
             return None
 
         download_url = f"{api_base_url.rstrip('/')}/downloads/{file_id}"
+        max_bytes = file_filter.max_file_size if file_filter else None
+
+        fetch = partial(_download_to, download_url, hedge, max_bytes)
+
+        if lazy:
+            size_hint = result_data.get("size_bytes")
+            handle = LazyFile(
+                filename,
+                file_id,
+                result_data.get("mime_type"),
+                size_hint if isinstance(size_hint, int) else None,
+                fetch,
+                DATA_OUTPUTS / filename
+            )
+            if prefetch:
+                handle.prefetch()
+            return handle
 
         # 下载文件
-        response = requests.get(download_url, timeout=60)
-        response.raise_for_status()
-
-        # 确保输出目录存在
-        DATA_OUTPUTS.mkdir(parents=True, exist_ok=True)
-
-        # 保存文件
-        output_path = DATA_OUTPUTS / filename
-        output_path.write_bytes(response.content)
+        try:
+            size_bytes = fetch(DATA_OUTPUTS / filename)
+        except FileTooLarge as e:
+            return skipped_file(filename, result_data.get("mime_type"), e.size_bytes, "超过大小上限", file_id)
 
         return {
             "filename": filename,
-            "size_bytes": len(response.content),
+            "size_bytes": size_bytes,
             "mime_type": mime_type
         }
 
@@ -350,21 +1926,71 @@ def _download_file_from_api(api_result: Dict[str, Any]) -> Optional[Dict[str, An
         return None
 
 
-def _save_inline_file(result_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def _download_to(download_url: str, hedge: bool, max_bytes: Optional[int], output_path: Path) -> int:
+    """
+    将后端文件下载到指定路径，计入下载耗时
+
+    Args:
+        download_url: 下载地址
+        hedge: 是否启用对冲请求
+        max_bytes: 文件大小上限（字节，可选）
+        output_path: 目标文件路径
+
+    Returns:
+        文件大小（字节）
+    """
+    # 确保输出目录存在
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with metrics.default_recorder.timer("download"):
+        return _fetch_file(download_url, output_path, DOWNLOAD_READ_TIMEOUT, "download", hedge, max_bytes)
+
+
+def _save_inline_file(
+    result_data: Dict[str, Any],
+    file_filter: Optional[FileFilter] = None
+) -> Optional[Dict[str, Any]]:
     """
     保存内联文件（base64 编码）到 data/outputs/
 
+    流式解析响应时内容已解码到暂存文件（content_path），直接移动到输出目录。
+
     Args:
         result_data: 包含文件内容的结果数据
+        file_filter: 文件筛选条件（可选），未通过时丢弃内容，不写入输出目录
 
     Returns:
-        文件信息字典，失败返回 None
+        文件信息字典，未通过筛选时带有 reason（未保存），失败返回 None
     """
+    spool_path = result_data.get("content_path")
+    started = time.monotonic()
     try:
         import base64
 
         filename = result_data.get("filename", "downloaded_file")
         mime_type = result_data.get("mime_type", "application/octet-stream")
+
+        if file_filter:
+            if spool_path:
+                size_bytes = result_data.get("content_size", 0)
+            else:
+                # base64 每 4 个字符对应 3 字节，无需解码即可得到大小
+                content = result_data.get("content") or ""
+                size_bytes = len(content) * 3 // 4 - content[-2:].count("=")
+            reason = file_filter.reject_reason(filename, result_data.get("mime_type"), size_bytes)
+            if reason:
+                # 暂存文件在 finally 中删除
+                return skipped_file(filename, result_data.get("mime_type"), size_bytes, reason)
+
+        if spool_path:
+            DATA_OUTPUTS.mkdir(parents=True, exist_ok=True)
+            shutil.move(spool_path, DATA_OUTPUTS / filename)
+            spool_path = None
+            return {
+                "filename": filename,
+                "size_bytes": result_data.get("content_size", 0),
+                "mime_type": mime_type
+            }
+
         content_base64 = result_data.get("content")
 
         if not content_base64:
@@ -388,9 +2014,21 @@ def _save_inline_file(result_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
 
     except Exception:
         return None
-
-
-def download_bundle(session_id: str, timeout: int = 120) -> dict:
+    finally:
+        # 保存失败时清理暂存文件
+        if spool_path:
+            Path(spool_path).unlink(missing_ok=True)
+        metrics.default_recorder.record("inline_file", time.monotonic() - started)
+
+
+def download_bundle(
+    session_id: str,
+    timeout: int = 120,
+    hedge: bool = False,
+    file_types: Optional[list[str]] = None,
+    file_pattern: Optional[str] = None,
+    max_file_size: Optional[int] = None
+) -> dict:
     """
     下载会话中生成的所有文件（打包为 ZIP）
 
@@ -399,14 +2037,24 @@ def download_bundle(session_id: str, timeout: int = 120) -> dict:
 
     Args:
         session_id: 会话ID（从 execute_browser_task 返回结果中获取）
-        timeout: 下载超时时间（秒），默认 120（2分钟）
+        timeout: 下载停顿超时时间（秒），默认 120（2分钟）。
+                 超过该时间没有收到数据，或平均速度过低时视为超时
+        hedge: 是否启用对冲请求，默认 False。下载耗时超过历史 p95 时
+               通过新连接重复下载，先完成者胜出
+        file_types: 文件包中只保留这些 MIME 类型的文件（可选），如 ["application/pdf"]
+        file_pattern: 文件包中只保留文件名匹配该通配符的文件（可选），如 "*.pdf"
+        max_file_size: 文件包中单个文件的大小上限（字节，可选）
+               筛选条件作为查询参数发给后端；后端未筛选时，下载后从文件包中剔除
+               不符合条件的文件，在 skipped_files 中返回其元数据
 
     Returns:
         包含下载结果的字典：
         {
             "success": True/False,
             "message": "下载描述",
-            "files": ["bundle_xxx.zip"],  # 成功时的文件名
+            "files": ["bundle_xxx.zip"],  # 成功时的文件名，筛选后没有文件时为空列表
+            "skipped_files": [{"filename": "...", "mime_type": "...", "size_bytes": 1024,
+                               "reason": "类型不匹配"}],  # 仅当有文件被剔除时存在
             "error": "错误信息"  # 失败时存在
         }
 
@@ -431,34 +2079,50 @@ def download_bundle(session_id: str, timeout: int = 120) -> dict:
                 "error": "会话ID格式不正确"
             }
 
-        # 获取后端 API 地址
-        api_base_url = os.environ.get('BROWSER_API_URL')
-        if not api_base_url:
+        # 获取后端 API 地址（会话所在的后端）
+        api_base_urls = _api_base_urls()
+        if not api_base_urls:
             return {
                 "success": False,
                 "error": "未配置 API 地址"
             }
+        api_base_url = _backend_for_session(session_id, api_base_urls)
+
+        try:
+            file_filter = FileFilter.from_options(file_types, file_pattern, max_file_size)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
 
         # 构建下载 URL
         bundle_url = f"{api_base_url.rstrip('/')}/downloads/bundle/{session_id}"
-
-        # 下载文件包
-        response = requests.get(bundle_url, timeout=timeout)
-        response.raise_for_status()
+        if file_filter:
+            bundle_url = f"{bundle_url}?{file_filter.to_query()}"
 
         # 确保输出目录存在
         DATA_OUTPUTS.mkdir(parents=True, exist_ok=True)
 
-        # 保存 ZIP 文件
+        # 流式下载并保存 ZIP 文件
         filename = f"bundle_{session_id[:8]}.zip"
-        output_path = DATA_OUTPUTS / filename
-        output_path.write_bytes(response.content)
+        with metrics.default_recorder.timer("bundle"):
+            _fetch_file(bundle_url, DATA_OUTPUTS / filename, timeout, "bundle", hedge)
 
-        return {
+        result = {
             "success": True,
             "message": "成功下载文件包",
             "files": [filename]
         }
+        if file_filter:
+            kept, skipped = filter_bundle(DATA_OUTPUTS / filename, file_filter)
+            if skipped:
+                result["skipped_files"] = skipped
+            if not kept:
+                (DATA_OUTPUTS / filename).unlink()
+                result["message"] = "文件包中没有符合条件的文件"
+                result["files"] = []
+        return result
 
     except requests.exceptions.HTTPError as e:
         # 处理特定 HTTP 错误
@@ -474,7 +2138,7 @@ def download_bundle(session_id: str, timeout: int = 120) -> dict:
             "error": error_msg
         }
 
-    except requests.exceptions.Timeout:
+    except (requests.exceptions.Timeout, TimeoutError):
         return {
             "success": False,
             "error": "下载超时"
@@ -484,3 +2148,160 @@ def download_bundle(session_id: str, timeout: int = 120) -> dict:
             "success": False,
             "error": "下载失败"
         }
+
+
+def cancel_browser_task(task_id: str, timeout: int = 10) -> dict:
+    """
+    取消正在执行的浏览器自动化任务
+
+    通知后端停止任务对应的浏览器和 LLM 执行，释放后端资源。
+    task_id 为调用 execute_browser_task 时传入的任务ID；分片任务会一并
+    取消所有分片。任务仍在本进程中执行时只通知其所在的后端，
+    否则通知所有配置的后端。
+
+    Args:
+        task_id: 任务ID（调用 execute_browser_task 时传入的 task_id）
+        timeout: 取消请求超时时间（秒），默认 10
+
+    Returns:
+        包含取消结果的字典：
+        {
+            "success": True/False,
+            "message": "取消描述",  # 成功时存在
+            "error": "错误信息"  # 失败时存在
+        }
+
+    Examples:
+        >>> # 在其他线程中执行任务
+        >>> task_id = "my-task-001"
+        >>> threading.Thread(
+        ...     target=execute_browser_task,
+        ...     kwargs={"urls": "https://example.com", "query": "下载所有报表", "task_id": task_id}
+        ... ).start()
+
+        >>> # 调用方不再需要结果时取消
+        >>> result = cancel_browser_task(task_id)
+        >>> print(result['success'])  # True
+    """
+    try:
+        # 参数验证
+        if not task_id or not isinstance(task_id, str):
+            return {
+                "success": False,
+                "error": "任务ID格式不正确"
+            }
+
+        # 获取后端 API 地址
+        api_base_urls = _api_base_urls()
+        if not api_base_urls:
+            return {
+                "success": False,
+                "error": "未配置 API 地址"
+            }
+
+        # 找到执行中的任务（包括分片任务）及其所在后端
+        with _IN_FLIGHT_LOCK:
+            targets = {
+                tid: backends for tid, backends in _IN_FLIGHT_TASKS.items()
+                if tid == task_id or tid.startswith(f"{task_id}-")
+            }
+        if not targets:
+            targets = {task_id: api_base_urls}
+
+        status_codes = []
+        for tid, backends in targets.items():
+            status_codes += _cancel_remote_task(tid, backends, timeout=timeout)
+
+        if any(200 <= code < 300 for code in status_codes):
+            return {
+                "success": True,
+                "message": "已通知后端取消任务"
+            }
+        if status_codes and all(code == 404 for code in status_codes):
+            return {
+                "success": False,
+                "error": "未找到该任务"
+            }
+        return {
+            "success": False,
+            "error": "取消请求失败"
+        }
+
+    except Exception:
+        return {
+            "success": False,
+            "error": "取消请求失败"
+        }
+
+
+def close_session(session_id: str, timeout: int = 10) -> dict:
+    """
+    关闭浏览器会话
+
+    立即释放会话在后端占用的浏览器上下文。多步骤任务完成后应主动关闭会话，
+    而不是等待后端的空闲超时。
+
+    Args:
+        session_id: 会话ID（来自 execute_browser_task 的返回结果）
+        timeout: 关闭请求超时时间（秒），默认 10
+
+    Returns:
+        包含关闭结果的字典：
+        {
+            "success": True/False,
+            "message": "关闭描述",  # 成功时存在
+            "error": "错误信息"  # 失败时存在
+        }
+
+    Examples:
+        >>> result = execute_browser_task("https://example.com/login", "登录")
+        >>> execute_browser_task("https://example.com/report", "下载报表", session_id=result['session_id'])
+        >>> close_session(result['session_id'])
+        {'success': True, 'message': '会话已关闭'}
+    """
+    try:
+        # 参数验证
+        if not session_id or not isinstance(session_id, str):
+            return {
+                "success": False,
+                "error": "会话ID格式不正确"
+            }
+
+        # 获取后端 API 地址
+        api_base_urls = _api_base_urls()
+        if not api_base_urls:
+            return {
+                "success": False,
+                "error": "未配置 API 地址"
+            }
+
+        # 会话已显式关闭，不再由会话管理器跟踪
+        manager = get_session_manager()
+        if manager:
+            manager.forget(session_id)
+
+        api_base_url = _backend_for_session(session_id, api_base_urls)
+        response = get_transport().request("DELETE", f"{api_base_url}/sessions/{session_id}", timeout=timeout)
+        _forget_session_backend(session_id)
+
+        if response.status_code == 404:
+            return {
+                "success": False,
+                "error": "会话不存在或已过期"
+            }
+        response.raise_for_status()
+        return {
+            "success": True,
+            "message": "会话已关闭"
+        }
+
+    except requests.exceptions.Timeout:
+        return {
+            "success": False,
+            "error": "关闭请求超时"
+        }
+    except Exception:
+        return {
+            "success": False,
+            "error": "关闭会话失败"
+        }
@@ -0,0 +1,298 @@
+"""
+延迟直方图
+
+LatencyHistogram 按 HDR Histogram 的思路把耗时（微秒）映射到对数-线性分桶：
+小于 sub_bucket_count 的值各占一个桶，更大的值按 2 的幂分段，每段再均分为
+sub_bucket_count / 2 个桶，因此任意值的相对误差不超过 1 / (sub_bucket_count / 2)。
+计数保存在定长数组中，内存只取决于可记录范围和精度，与样本数无关；
+相同配置的直方图逐桶相加即可合并。
+
+LatencyRecorder 按名称维护多个直方图，默认的 default_recorder 记录：
+- task: execute_browser_task 的端到端耗时（参数校验之后）
+- task.backend: 后端任务请求的往返耗时
+- task.results: 结果处理耗时（文件下载、内联文件保存、文本/记录写入）
+- download: _download_file_from_api 下载文件引用的耗时
+- inline_file: _save_inline_file 保存内联文件的耗时
+- bundle: download_bundle 下载文件包的耗时
+
+Examples:
+    >>> from src.metrics import default_recorder
+    >>> default_recorder.percentiles("task")
+    {'count': 120, 'p50': 8.412, 'p90': 21.3, 'p95': 30.1, 'p99': 58.7, 'max': 61.2}
+    >>> window = default_recorder.reset()  # 取出当前窗口的快照并清零
+    >>> # 汇总多个工作进程的快照
+    >>> merged = LatencyRecorder.from_snapshot(window)
+    >>> merged.merge_snapshot(other_process_snapshot)
+"""
+
+import math
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# 默认查询的分位数
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+class LatencyHistogram:
+    """
+    对数-线性分桶的耗时直方图
+
+    Args:
+        highest: 可记录的最大耗时（秒），更大的值按该值计入（max 仍记录真实值）
+        significant_figures: 有效数字位数（1-4），决定分桶精度，默认 2（相对误差 < 1%）
+    """
+
+    def __init__(self, highest: float = 3600.0, significant_figures: int = 2):
+        if not 1 <= significant_figures <= 4:
+            raise ValueError("有效数字位数应为 1-4")
+        self.highest = highest
+        self.significant_figures = significant_figures
+
+        self._sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self._sub_bucket_count = 1 << self._sub_bucket_bits
+        self._sub_bucket_half = self._sub_bucket_count // 2
+        self._highest_micros = max(1, round(highest * 1e6))
+        self._counts = array("q", [0]) * (self._index(self._highest_micros) + 1)
+        self._lock = threading.Lock()
+        self._total = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = 0.0
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        """记录一次（或 count 次）耗时（秒），负值按 0 计"""
+        seconds = max(0.0, seconds)
+        index = self._index(min(round(seconds * 1e6), self._highest_micros))
+        with self._lock:
+            self._counts[index] += count
+            self._total += count
+            self._sum += seconds * count
+            self._min = min(self._min, seconds)
+            self._max = max(self._max, seconds)
+
+    @property
+    def count(self) -> int:
+        """样本数"""
+        return self._total
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        返回耗时分位数
+
+        Args:
+            p: 分位数（0-100）
+
+        Returns:
+            分位数所在桶的上界（秒，不超过记录到的最大值），没有样本时返回 None
+        """
+        with self._lock:
+            if not self._total:
+                return None
+            target = max(1, math.ceil(min(100.0, max(0.0, p)) / 100 * self._total))
+            seen = 0
+            for index, bucket_count in enumerate(self._counts):
+                seen += bucket_count
+                if seen >= target:
+                    if index == len(self._counts) - 1:
+                        # 最后一个桶包含超出范围的值，返回真实最大值
+                        return self._max
+                    upper = self._upper_bound(index) / 1e6
+                    return min(self._max, max(self._min, upper))
+            return self._max
+
+    def summary(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        """
+        返回样本数、均值、极值和分位数
+
+        Returns:
+            {"count", "mean", "min", "max", "p50", "p90", ...}，耗时单位为秒
+        """
+        with self._lock:
+            total, mean = self._total, (self._sum / self._total if self._total else None)
+            minimum, maximum = (self._min, self._max) if self._total else (None, None)
+        summary: Dict[str, Any] = {
+            "count": total,
+            "mean": _round(mean),
+            "min": _round(minimum),
+            "max": _round(maximum)
+        }
+        for p in percentiles:
+            summary[f"p{p:g}"] = _round(self.percentile(p))
+        return summary
+
+    def reset(self) -> None:
+        """清空所有样本"""
+        with self._lock:
+            for index in range(len(self._counts)):
+                self._counts[index] = 0
+            self._total = 0
+            self._sum = 0.0
+            self._min = math.inf
+            self._max = 0.0
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        合并另一个直方图的样本
+
+        Raises:
+            ValueError: 两个直方图的可记录范围或精度不同
+        """
+        self.merge_snapshot(other.snapshot())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        导出可 JSON 序列化的快照（只包含非零桶），用于跨进程传递
+
+        Returns:
+            {"highest", "significant_figures", "count", "sum", "min", "max", "buckets": {桶序号: 计数}}
+        """
+        with self._lock:
+            return {
+                "highest": self.highest,
+                "significant_figures": self.significant_figures,
+                "count": self._total,
+                "sum": self._sum,
+                "min": self._min if self._total else None,
+                "max": self._max if self._total else None,
+                "buckets": {str(index): n for index, n in enumerate(self._counts) if n}
+            }
+
+    def merge_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """
+        合并 snapshot() 导出的快照
+
+        Raises:
+            ValueError: 快照的可记录范围或精度与本直方图不同
+        """
+        if (snapshot["highest"], snapshot["significant_figures"]) != (self.highest, self.significant_figures):
+            raise ValueError("直方图配置不同，无法合并")
+        if not snapshot["count"]:
+            return
+        with self._lock:
+            for index, n in snapshot["buckets"].items():
+                self._counts[int(index)] += n
+            self._total += snapshot["count"]
+            self._sum += snapshot["sum"]
+            self._min = min(self._min, snapshot["min"])
+            self._max = max(self._max, snapshot["max"])
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "LatencyHistogram":
+        """根据快照重建直方图"""
+        histogram = cls(snapshot["highest"], snapshot["significant_figures"])
+        histogram.merge_snapshot(snapshot)
+        return histogram
+
+    def _index(self, micros: int) -> int:
+        if micros < self._sub_bucket_count:
+            return micros
+        shift = micros.bit_length() - self._sub_bucket_bits
+        sub = micros >> shift
+        return self._sub_bucket_count + (shift - 1) * self._sub_bucket_half + (sub - self._sub_bucket_half)
+
+    def _upper_bound(self, index: int) -> int:
+        if index < self._sub_bucket_count:
+            return index
+        shift = (index - self._sub_bucket_count) // self._sub_bucket_half + 1
+        sub = (index - self._sub_bucket_count) % self._sub_bucket_half + self._sub_bucket_half
+        return ((sub + 1) << shift) - 1
+
+
+class LatencyRecorder:
+    """
+    按名称记录耗时的直方图集合
+
+    Args:
+        highest: 各直方图可记录的最大耗时（秒）
+        significant_figures: 各直方图的有效数字位数
+    """
+
+    def __init__(self, highest: float = 3600.0, significant_figures: int = 2):
+        self.highest = highest
+        self.significant_figures = significant_figures
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        """返回指定名称的直方图，不存在时创建"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram(self.highest, self.significant_figures)
+            return histogram
+
+    def record(self, name: str, seconds: float) -> None:
+        """记录一次耗时（秒）"""
+        self.histogram(name).record(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """记录 with 代码块的耗时（包括抛出异常的情况）"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def percentiles(
+        self,
+        name: Optional[str] = None,
+        percentiles: Iterable[float] = DEFAULT_PERCENTILES
+    ) -> Dict[str, Any]:
+        """
+        查询分位数
+
+        Args:
+            name: 直方图名称（可选），不指定时返回所有直方图
+            percentiles: 需要的分位数（0-100）
+
+        Returns:
+            指定 name 时为该直方图的 summary()；否则为 {名称: summary()}
+        """
+        percentiles = tuple(percentiles)
+        if name is not None:
+            return self.histogram(name).summary(percentiles)
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {key: histogram.summary(percentiles) for key, histogram in sorted(histograms.items())}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """导出所有直方图的快照 {名称: 快照}，可 JSON 序列化"""
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+    def reset(self) -> Dict[str, Dict[str, Any]]:
+        """
+        结束当前统计窗口：清空所有直方图
+
+        Returns:
+            清空前的快照
+        """
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+        return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+    def merge_snapshot(self, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        """合并另一个 LatencyRecorder（如其他工作进程）导出的快照"""
+        for name, histogram_snapshot in snapshot.items():
+            self.histogram(name).merge_snapshot(histogram_snapshot)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Dict[str, Any]]) -> "LatencyRecorder":
+        """根据快照重建，配置取自快照中的第一个直方图"""
+        first = next(iter(snapshot.values()), None)
+        recorder = cls(first["highest"], first["significant_figures"]) if first else cls()
+        recorder.merge_snapshot(snapshot)
+        return recorder
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 6) if value is not None else None
+
+
+# 进程内共享的耗时直方图
+default_recorder = LatencyRecorder()
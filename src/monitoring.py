@@ -0,0 +1,99 @@
+"""
+定期监控任务的变化检测
+
+对同一组页面反复执行相同的提取任务时，每次结果计算一个指纹（响应文本、结果数据
+和文件内容的 SHA-256），按监控键（规范化后的 URL + 任务描述）保存在本地：
+- 指纹与上次相同：结果为 changed: False，不写入输出文件，不做后续处理
+- 上次的指纹随任务请求发给后端（previous_fingerprint），后端可在提取到的内容未变化时
+  直接返回 {"status": "unchanged"}，跳过 LLM 处理和文件传输；后端也可以在响应中给出
+  fingerprint，此时以后端的指纹为准，客户端不再计算
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .idempotency import derive_key
+
+# 每次执行都会变化、不属于内容的字段
+VOLATILE_FIELDS = ("file_id", "content", "content_path", "content_size", "content_error")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str | Path) -> str:
+    """返回文件内容的 SHA-256 十六进制摘要"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def result_fingerprint(api_result: Dict[str, Any]) -> str:
+    """
+    计算任务结果的指纹
+
+    Args:
+        api_result: API 返回的原始结果。内联文件按解码后的内容（content_path）或
+                    base64 文本计算；文件引用需要带有后端给出的 sha256，否则只按元数据计算
+
+    Returns:
+        SHA-256 十六进制摘要
+    """
+    result_data = api_result.get("result")
+    result_data = dict(result_data) if isinstance(result_data, dict) else result_data
+    if isinstance(result_data, dict):
+        if result_data.get("content_path"):
+            result_data["sha256"] = hash_file(result_data["content_path"])
+        elif isinstance(result_data.get("content"), str):
+            result_data["sha256"] = hashlib.sha256(result_data["content"].encode("ascii", "replace")).hexdigest()
+        for field in VOLATILE_FIELDS:
+            result_data.pop(field, None)
+
+    data = json.dumps(
+        {"response": api_result.get("response"), "result": result_data},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """
+    监控指纹存储（每个监控键一个 JSON 文件）
+
+    Args:
+        directory: 存储目录
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        返回上次记录的指纹
+
+        Returns:
+            {"key", "fingerprint", "changed_at"}，没有记录时返回 None
+        """
+        try:
+            entry = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("key") == key else None
+
+    def record(self, key: str, fingerprint: str) -> None:
+        """记录新的指纹（先写临时文件再原子替换）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        entry = {"key": key, "fingerprint": fingerprint, "changed_at": time.time()}
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{derive_key(key=key)}.json"
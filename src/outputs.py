@@ -0,0 +1,222 @@
+"""
+输出文件
+
+超过阈值的文本结果写入输出目录，结果中只保留预览和文件名；
+调用方可通过 iter_text() 分块读取完整内容，不必一次载入内存。
+
+结构化结果（表格行）逐行写入 NDJSON 或 CSV 文件，
+iter_records() 按行惰性读取。
+"""
+
+import csv
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# 支持的结构化输出格式及对应的文件扩展名
+RECORD_FORMATS = {"ndjson": ".ndjson", "csv": ".csv"}
+
+
+def spill_text(text: str, output_dir: Path, prefix: str = "result") -> tuple[str, int]:
+    """
+    将文本写入输出目录
+
+    先写入临时文件再原子替换，读取方不会看到写了一半的文件。
+
+    Args:
+        text: 文本内容
+        output_dir: 输出目录
+        prefix: 文件名前缀
+
+    Returns:
+        (文件名, 字节数)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    filename = f"{prefix}_{uuid.uuid4().hex[:12]}.txt"
+    data = text.encode("utf-8")
+    tmp_path = output_dir / f".{filename}.part"
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, output_dir / filename)
+    return filename, len(data)
+
+
+def text_preview(text: str, max_chars: int) -> str:
+    """截取文本开头作为预览，超出部分以省略号表示"""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "…"
+
+
+def iter_text(
+    filename: str | Path,
+    chunk_size: int = 64 * 1024,
+    output_dir: Optional[Path] = None
+) -> Iterator[str]:
+    """
+    分块读取输出文件中的文本
+
+    Args:
+        filename: 结果中返回的文件名，或文件的完整路径
+        chunk_size: 每块的字符数
+        output_dir: 输出目录，默认为 data/outputs
+
+    Yields:
+        文本块
+
+    Examples:
+        >>> result = execute_browser_task(url, "提取全部公告正文")
+        >>> for chunk in iter_text(result["files"][0]):
+        ...     handle(chunk)
+    """
+    path = _resolve_output_path(filename, output_dir)
+    with path.open("r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def infer_schema(records: Iterable[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    从记录推断字段列表
+
+    字段按首次出现的顺序排列；同一字段出现多种类型时记为 "string"。
+
+    Args:
+        records: 记录列表
+
+    Returns:
+        [{"name": 字段名, "type": "string"/"integer"/"number"/"boolean"/"object"}]
+    """
+    types: Dict[str, str] = {}
+    for record in records:
+        for name, value in record.items():
+            if value is None:
+                types.setdefault(name, "")
+                continue
+            kind = _value_type(value)
+            if types.get(name) in ("", None):
+                types[name] = kind
+            elif types[name] != kind:
+                types[name] = "string"
+    return [{"name": name, "type": kind or "string"} for name, kind in types.items()]
+
+
+def write_records(
+    records: Iterable[Dict[str, Any]],
+    output_dir: Path,
+    fmt: str,
+    schema: Optional[List[Dict[str, str]]] = None,
+    prefix: str = "records"
+) -> Dict[str, Any]:
+    """
+    将记录逐行写入 NDJSON 或 CSV 文件
+
+    Args:
+        records: 记录（字典）序列
+        output_dir: 输出目录
+        fmt: "ndjson" 或 "csv"
+        schema: 字段列表（可选），缺省时从记录推断；CSV 按该顺序输出列
+        prefix: 文件名前缀
+
+    Returns:
+        {"file", "format", "schema", "row_count"}
+
+    Raises:
+        ValueError: 不支持的格式
+    """
+    if fmt not in RECORD_FORMATS:
+        raise ValueError(f"不支持的输出格式: {fmt}")
+
+    if schema is None:
+        records = list(records)
+        schema = infer_schema(records)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    filename = f"{prefix}_{uuid.uuid4().hex[:12]}{RECORD_FORMATS[fmt]}"
+    tmp_path = output_dir / f".{filename}.part"
+    row_count = 0
+    try:
+        with tmp_path.open("w", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                writer = csv.DictWriter(f, fieldnames=[field["name"] for field in schema], extrasaction="ignore")
+                writer.writeheader()
+                for record in records:
+                    writer.writerow({k: _csv_value(v) for k, v in record.items()})
+                    row_count += 1
+            else:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    f.write("\n")
+                    row_count += 1
+        os.replace(tmp_path, output_dir / filename)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    return {
+        "file": filename,
+        "format": fmt,
+        "schema": schema,
+        "row_count": row_count
+    }
+
+
+def iter_records(filename: str | Path, output_dir: Optional[Path] = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐行读取 NDJSON 或 CSV 记录文件（按扩展名判断格式）
+
+    CSV 的值均为字符串。
+
+    Args:
+        filename: 结果中返回的文件名，或文件的完整路径
+        output_dir: 输出目录，默认为 data/outputs
+
+    Yields:
+        记录字典
+
+    Examples:
+        >>> result = execute_browser_task(url, "提取逾期承兑人名单表格", output_format="csv")
+        >>> for row in iter_records(result["records"]["file"]):
+        ...     print(row["承兑人名称"])
+    """
+    path = _resolve_output_path(filename, output_dir)
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if path.suffix == RECORD_FORMATS["csv"]:
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _resolve_output_path(filename: str | Path, output_dir: Optional[Path]) -> Path:
+    """裸文件名相对于输出目录解析，其他路径原样返回"""
+    path = Path(filename)
+    if path.is_absolute() or len(path.parts) > 1:
+        return path
+    if output_dir is None:
+        from .main import DATA_OUTPUTS
+        output_dir = DATA_OUTPUTS
+    return output_dir / path
+
+
+def _value_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "object"
+
+
+def _csv_value(value: Any) -> Any:
+    """嵌套值以 JSON 文本写入 CSV 单元格"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
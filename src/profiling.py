@@ -0,0 +1,136 @@
+"""
+任务步骤耗时分析
+
+启用 profile 时后端在 debug_trace.steps 中返回每个代理步骤的耗时：
+    {"name": "打开页面", "tool": "navigate", "start": 0.0, "duration": 1.2, "steps": [...]}
+start 为相对任务开始的秒数，steps 为可选的子步骤。
+
+to_chrome_trace() 将其转换为 Chrome trace-event JSON，可在 chrome://tracing
+或 Perfetto 中以火焰图查看；ToolProfile 按工具汇总多个任务的自身耗时
+（扣除子步骤后的时间）。
+"""
+
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def _iter_steps(steps: List[Dict[str, Any]], depth: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    for step in steps or []:
+        if isinstance(step, dict):
+            yield step, depth
+            yield from _iter_steps(step.get("steps"), depth + 1)
+
+
+def _self_time(step: Dict[str, Any]) -> float:
+    """步骤自身耗时：总耗时减去直接子步骤的耗时"""
+    children = sum(float(child.get("duration", 0)) for child in step.get("steps") or [] if isinstance(child, dict))
+    return max(0.0, float(step.get("duration", 0)) - children)
+
+
+def to_chrome_trace(
+    steps: List[Dict[str, Any]],
+    task_id: str,
+    elapsed: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    将步骤耗时转换为 Chrome trace-event 格式
+
+    Args:
+        steps: 后端返回的步骤列表
+        task_id: 任务ID，作为进程名显示
+        elapsed: 客户端观测到的总耗时（秒，可选），作为最外层的 task 事件
+
+    Returns:
+        {"traceEvents": [...], "displayTimeUnit": "ms"}
+    """
+    events: List[Dict[str, Any]] = [
+        {"name": "process_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": f"task {task_id}"}}
+    ]
+    if elapsed is not None:
+        events.append(
+            {"name": "task", "cat": "task", "ph": "X", "ts": 0, "dur": round(elapsed * 1e6), "pid": 1, "tid": 1}
+        )
+
+    for step, depth in _iter_steps(steps):
+        tool = step.get("tool") or "other"
+        events.append({
+            "name": step.get("name") or tool,
+            "cat": tool,
+            "ph": "X",
+            "ts": round(float(step.get("start", 0)) * 1e6),
+            "dur": round(float(step.get("duration", 0)) * 1e6),
+            "pid": 1,
+            "tid": 1,
+            "args": {"depth": depth, **(step.get("args") or {})}
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_trace(trace: Dict[str, Any], output_dir: Path, task_id: str) -> str:
+    """
+    将 trace 写入输出目录
+
+    Returns:
+        文件名（trace_{task_id}.json）
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    filename = f"trace_{re.sub(r'[^A-Za-z0-9_.-]', '_', task_id)}.json"
+    tmp_path = output_dir / f".{filename}.part"
+    tmp_path.write_text(json.dumps(trace, ensure_ascii=False), encoding="utf-8")
+    tmp_path.replace(output_dir / filename)
+    return filename
+
+
+class ToolProfile:
+    """按工具汇总多个任务的步骤自身耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict[str, float]] = {}
+        self._tasks = 0
+
+    def record(self, steps: List[Dict[str, Any]]) -> None:
+        """记录一个任务的步骤耗时"""
+        with self._lock:
+            self._tasks += 1
+            for step, _ in _iter_steps(steps):
+                seconds = _self_time(step)
+                entry = self._tools.setdefault(step.get("tool") or "other", {"count": 0, "total": 0.0, "max": 0.0})
+                entry["count"] += 1
+                entry["total"] += seconds
+                entry["max"] = max(entry["max"], seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        返回按总耗时降序排列的汇总
+
+        Returns:
+            {"tasks": 任务数, "tools": {工具: {"count", "total_seconds", "avg_seconds",
+             "max_seconds", "share"}}}，share 为该工具占全部步骤耗时的比例
+        """
+        with self._lock:
+            grand_total = sum(entry["total"] for entry in self._tools.values())
+            tools = {
+                tool: {
+                    "count": int(entry["count"]),
+                    "total_seconds": round(entry["total"], 3),
+                    "avg_seconds": round(entry["total"] / entry["count"], 3),
+                    "max_seconds": round(entry["max"], 3),
+                    "share": round(entry["total"] / grand_total, 4) if grand_total else 0.0
+                }
+                for tool, entry in sorted(self._tools.items(), key=lambda item: -item[1]["total"])
+            }
+            return {"tasks": self._tasks, "tools": tools}
+
+    def reset(self) -> None:
+        """清空汇总"""
+        with self._lock:
+            self._tools.clear()
+            self._tasks = 0
+
+
+# 进程内共享的工具耗时汇总，启用 profile 的任务都会记录到这里
+default_profile = ToolProfile()
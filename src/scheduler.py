@@ -0,0 +1,330 @@
+"""
+批量任务调度器
+
+在 execute_browser_task 之前为批量任务提供按域名的礼貌性控制：
+每个域名独立的并发上限和令牌桶速率限制。某个域名受限时，
+其他域名的任务不会被阻塞，工作线程会继续处理它们。
+
+任务按优先级和截止时间排序：高优先级、截止时间更早的任务先执行；
+已过截止时间的任务直接丢弃，剩余时间预算作为超时传给后端请求。
+"""
+
+import bisect
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from .urls import url_domain
+
+# 剩余时间预算低于该值（秒）的任务视为已过期
+MIN_TASK_BUDGET = 1.0
+
+
+class TokenBucket:
+    """
+    令牌桶限速器
+
+    Args:
+        rate: 每秒补充的令牌数
+        burst: 桶容量（允许的突发请求数）
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """返回获取一个令牌还需等待的秒数，0 表示可立即获取"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        """消耗一个令牌（调用前应确认 wait_time 为 0）"""
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _DomainState:
+    """单个域名的限流状态与统计"""
+
+    def __init__(self, max_concurrency: int, rate: Optional[float], burst: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.in_flight = 0
+        self.dispatched = 0
+        self.completed = 0
+        self.expired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class _ScheduledTask:
+    """等待调度的任务"""
+
+    def __init__(
+        self,
+        domains: List[str],
+        args: tuple,
+        kwargs: Dict[str, Any],
+        priority: int,
+        deadline: Optional[float],
+        seq: int
+    ):
+        self.domains = domains
+        self.args = args
+        self.kwargs = kwargs
+        self.deadline = deadline
+        self.future: Future = Future()
+        self.submitted = time.monotonic()
+        # 优先级高者先执行；同优先级按截止时间先后，再按提交顺序
+        self.sort_key = (-priority, deadline if deadline is not None else float("inf"), seq)
+
+
+def task_domains(urls: str | list[str]) -> List[str]:
+    """
+    提取任务涉及的域名（去重、排序）
+
+    Args:
+        urls: 单个 URL 或 URL 列表
+
+    Returns:
+        域名列表，无法解析主机名的 URL 归入空字符串域名
+    """
+    url_list = [urls] if isinstance(urls, str) else list(urls)
+    return sorted({url_domain(url) for url in url_list})
+
+
+class TaskScheduler:
+    """
+    按域名限流的批量任务调度器
+
+    Args:
+        max_workers: 全局并发执行的任务数
+        max_per_domain: 每个域名同时执行的任务上限
+        rate_per_domain: 每个域名每秒最多启动的任务数（None 表示不限速）
+        burst: 令牌桶容量
+        domain_limits: 按域名覆盖的限制，例如
+            {"example.com": {"max_concurrency": 1, "rate": 0.2, "burst": 1}}
+        task_fn: 实际执行任务的函数，默认 execute_browser_task
+
+    Examples:
+        >>> with TaskScheduler(max_workers=8, max_per_domain=2, rate_per_domain=0.5) as scheduler:
+        ...     futures = [scheduler.submit(url, "提取标题") for url in urls]
+        ...     # 交互式请求：高优先级，30 秒后调用方不再等待
+        ...     urgent = scheduler.submit(url, "截图", priority=10, deadline=time.time() + 30)
+        ...     results = [f.result() for f in futures]
+        ...     print(scheduler.stats())
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_per_domain: int = 2,
+        rate_per_domain: Optional[float] = 1.0,
+        burst: int = 1,
+        domain_limits: Optional[Dict[str, Dict[str, Any]]] = None,
+        task_fn: Optional[Callable[..., dict]] = None
+    ):
+        if task_fn is None:
+            from .main import execute_browser_task
+            task_fn = execute_browser_task
+
+        self._task_fn = task_fn
+        self._max_per_domain = max_per_domain
+        self._rate_per_domain = rate_per_domain
+        self._burst = burst
+        self._domain_limits = domain_limits or {}
+        self._domains: Dict[str, _DomainState] = {}
+        self._pending: List[_ScheduledTask] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._seq = 0
+
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"task-scheduler-{i}", daemon=True)
+            for i in range(max(1, max_workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self) -> "TaskScheduler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown(wait=True)
+
+    def submit(
+        self,
+        urls: str | list[str],
+        query: str,
+        priority: int = 0,
+        deadline: Optional[float] = None,
+        **kwargs: Any
+    ) -> Future:
+        """
+        提交任务
+
+        Args:
+            urls: 目标 URL（与 execute_browser_task 相同）
+            query: 任务描述
+            priority: 优先级，数值越大越先执行，默认 0
+            deadline: 绝对截止时间（time.time() 时间戳，可选）。
+                      到期仍未开始的任务会被丢弃；开始执行时剩余时间
+                      作为 timeout 传给 execute_browser_task
+            **kwargs: 透传给 execute_browser_task 的其他参数
+
+        Returns:
+            Future，结果为 execute_browser_task 的返回字典；
+            过期任务的结果为 {"success": False, "error": "任务已过期"}
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("调度器已关闭")
+            self._seq += 1
+            task = _ScheduledTask(task_domains(urls), (urls, query), kwargs, priority, deadline, self._seq)
+            for domain in task.domains:
+                self._domain(domain)
+            bisect.insort(self._pending, task, key=lambda t: t.sort_key)
+            self._cond.notify()
+        return task.future
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        返回各域名的队列深度、执行中任务数和等待时间统计
+
+        Returns:
+            {domain: {"queued", "in_flight", "completed", "expired", "avg_wait", "max_wait"}}
+        """
+        with self._cond:
+            queued: Dict[str, int] = {}
+            for task in self._pending:
+                for domain in task.domains:
+                    queued[domain] = queued.get(domain, 0) + 1
+
+            return {
+                domain: {
+                    "queued": queued.get(domain, 0),
+                    "in_flight": state.in_flight,
+                    "completed": state.completed,
+                    "expired": state.expired,
+                    "avg_wait": state.total_wait / state.dispatched if state.dispatched else 0.0,
+                    "max_wait": state.max_wait
+                }
+                for domain, state in self._domains.items()
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """停止接收新任务；已提交的任务会继续执行完毕"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _domain(self, domain: str) -> _DomainState:
+        state = self._domains.get(domain)
+        if state is None:
+            limits = self._domain_limits.get(domain, {})
+            state = _DomainState(
+                max_concurrency=limits.get("max_concurrency", self._max_per_domain),
+                rate=limits.get("rate", self._rate_per_domain),
+                burst=limits.get("burst", self._burst)
+            )
+            self._domains[domain] = state
+        return state
+
+    def _next_ready(self, now: float) -> tuple[Optional[_ScheduledTask], Optional[float]]:
+        """
+        选出下一个可执行的任务
+
+        Returns:
+            (任务, None) 或 (None, 最短需要等待的秒数；None 表示只能等待任务完成)
+        """
+        self._drop_expired()
+
+        min_wait: Optional[float] = None
+        wall_now = time.time()
+        for task in self._pending:
+            if task.deadline is not None:
+                # 到期时需要醒来丢弃该任务
+                expire_in = task.deadline - MIN_TASK_BUDGET - wall_now
+                min_wait = expire_in if min_wait is None else min(min_wait, expire_in)
+
+            states = [self._domains[d] for d in task.domains]
+            if any(s.in_flight >= s.max_concurrency for s in states):
+                continue
+
+            wait = max((s.bucket.wait_time(now) for s in states if s.bucket), default=0.0)
+            if wait > 0:
+                min_wait = wait if min_wait is None else min(min_wait, wait)
+                continue
+
+            return task, None
+        return None, min_wait
+
+    def _drop_expired(self) -> None:
+        """丢弃剩余时间预算不足的任务"""
+        wall_now = time.time()
+        expired = [
+            task for task in self._pending
+            if task.deadline is not None and task.deadline - wall_now < MIN_TASK_BUDGET
+        ]
+        for task in expired:
+            self._pending.remove(task)
+            for domain in task.domains:
+                self._domains[domain].expired += 1
+            if task.future.set_running_or_notify_cancel():
+                task.future.set_result({"success": False, "error": "任务已过期"})
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not self._pending:
+                        return
+                    now = time.monotonic()
+                    task, wait = self._next_ready(now)
+                    if task is not None:
+                        break
+                    self._cond.wait(timeout=wait)
+
+                self._pending.remove(task)
+                waited = now - task.submitted
+                for domain in task.domains:
+                    state = self._domains[domain]
+                    state.in_flight += 1
+                    state.dispatched += 1
+                    state.total_wait += waited
+                    state.max_wait = max(state.max_wait, waited)
+                    if state.bucket:
+                        state.bucket.consume(now)
+
+            kwargs = task.kwargs
+            if task.deadline is not None:
+                # 将剩余时间预算作为超时传给后端请求
+                remaining = task.deadline - time.time()
+                kwargs = {**kwargs, "timeout": min(kwargs.get("timeout", remaining), remaining)}
+
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        task.future.set_result(self._task_fn(*task.args, **kwargs))
+                    except Exception as e:
+                        task.future.set_exception(e)
+            finally:
+                with self._cond:
+                    for domain in task.domains:
+                        state = self._domains[domain]
+                        state.in_flight -= 1
+                        state.completed += 1
+                    self._cond.notify_all()
@@ -0,0 +1,519 @@
+"""
+浏览器会话管理
+
+SessionPool 预先在后端创建若干个热会话，新任务直接使用已就绪的浏览器上下文，
+省去每个任务创建浏览器的启动耗时。会话归还时先重置浏览器状态（Cookie、登录态、
+下载文件等），重置失败的会话直接关闭，不会交给下一个任务；使用达到次数上限或
+空闲超时的会话同样回收，后台线程负责补充。
+
+SessionManager 跟踪任务返回的会话及其最近使用时间（LRU），
+主动关闭空闲会话并限制同时打开的会话总数，避免后端浏览器上下文堆积。
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+
+class _PooledSession:
+    """池中的单个会话"""
+
+    def __init__(self, session_id: str, warmup: float):
+        self.session_id = session_id
+        self.warmup = warmup
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+
+class SessionPool:
+    """
+    热会话池
+
+    Args:
+        size: 保持就绪的空闲会话数
+        max_uses: 单个会话最多执行的任务数，达到后关闭并补充新会话
+        idle_ttl: 空闲会话的存活时间（秒），超时后关闭
+        refill_interval: 后台检查与补充的间隔（秒）
+        create_fn: 创建会话的函数，返回 session_id，默认在健康探测排名最前的后端创建
+        close_fn: 关闭会话的函数，默认调用后端关闭接口
+        reset_fn: 重置会话浏览器状态的函数，默认调用后端重置接口；抛出异常时关闭该会话
+
+    Examples:
+        >>> pool = SessionPool(size=4, max_uses=20, idle_ttl=300)
+        >>> install_session_pool(pool)  # 未指定 session_id 的任务将使用热会话
+        >>> result = execute_browser_task("https://example.com", "提取标题")
+        >>> print(pool.stats()["hit_rate"])
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_uses: int = 20,
+        idle_ttl: float = 300.0,
+        refill_interval: float = 1.0,
+        create_fn: Optional[Callable[[], str]] = None,
+        close_fn: Optional[Callable[[str], Any]] = None,
+        reset_fn: Optional[Callable[[str], Any]] = None
+    ):
+        if create_fn is None or close_fn is None or reset_fn is None:
+            from .main import _close_backend_session, _create_backend_session, _reset_backend_session
+            create_fn = create_fn or _create_backend_session
+            close_fn = close_fn or _close_backend_session
+            reset_fn = reset_fn or _reset_backend_session
+
+        self.size = size
+        self.max_uses = max_uses
+        self.idle_ttl = idle_ttl
+        self.refill_interval = refill_interval
+        self._create_fn = create_fn
+        self._close_fn = close_fn
+        self._reset_fn = reset_fn
+
+        self._idle: Deque[_PooledSession] = deque()
+        self._leased: Dict[str, _PooledSession] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._hits = 0
+        self._misses = 0
+        self._created = 0
+        self._recycled = 0
+        self._reset_failures = 0
+        self._create_failures = 0
+        self._total_warmup = 0.0
+
+        self._thread = threading.Thread(target=self._refill_loop, name="session-pool", daemon=True)
+        self._thread.start()
+
+    def acquire(self) -> Optional[str]:
+        """
+        取出一个热会话
+
+        Returns:
+            session_id；池中暂无就绪会话时返回 None（由后端为任务新建会话）
+        """
+        with self._cond:
+            if self._closed or not self._idle:
+                self._misses += 1
+                self._cond.notify()
+                return None
+
+            session = self._idle.popleft()
+            self._leased[session.session_id] = session
+            self._hits += 1
+            self._cond.notify()
+            return session.session_id
+
+    def release(self, session_id: str, discard: bool = False) -> None:
+        """
+        归还会话
+
+        放回池中之前先重置浏览器状态，重置完成前会话仍计为使用中。
+
+        Args:
+            session_id: acquire() 返回的会话ID
+            discard: 是否直接关闭该会话（如任务失败、会话状态不可信时）
+        """
+        with self._cond:
+            session = self._leased.get(session_id)
+            if session is None:
+                return
+            session.uses += 1
+            recycle = discard or self._closed or session.uses >= self.max_uses
+
+        reset_failed = False
+        if not recycle:
+            try:
+                self._reset_fn(session_id)
+            except Exception:
+                reset_failed = recycle = True
+
+        with self._cond:
+            self._leased.pop(session_id, None)
+            session.last_used = time.monotonic()
+            recycle = recycle or self._closed
+            if reset_failed:
+                self._reset_failures += 1
+            if recycle:
+                self._recycled += 1
+            else:
+                self._idle.append(session)
+            self._cond.notify()
+
+        if recycle:
+            self._close_quietly(session_id)
+
+    def owns(self, session_id: str) -> bool:
+        """判断会话是否由会话池管理"""
+        with self._cond:
+            return session_id in self._leased or any(s.session_id == session_id for s in self._idle)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回会话池统计
+
+        Returns:
+            {"idle", "in_use", "hits", "misses", "hit_rate", "created",
+             "recycled", "reset_failures", "create_failures", "avg_warmup"}
+        """
+        with self._cond:
+            requests = self._hits + self._misses
+            return {
+                "idle": len(self._idle),
+                "in_use": len(self._leased),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / requests if requests else 0.0,
+                "created": self._created,
+                "recycled": self._recycled,
+                "reset_failures": self._reset_failures,
+                "create_failures": self._create_failures,
+                "avg_warmup": self._total_warmup / self._created if self._created else 0.0
+            }
+
+    def close(self) -> None:
+        """停止补充并关闭所有空闲会话；使用中的会话在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        self._thread.join()
+        for session in idle:
+            self._close_quietly(session.session_id)
+
+    def __enter__(self) -> "SessionPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _close_quietly(self, session_id: str) -> None:
+        try:
+            self._close_fn(session_id)
+        except Exception:
+            pass
+
+    def _refill_loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+
+                # 淘汰空闲超时的会话
+                now = time.monotonic()
+                expired = [s for s in self._idle if now - s.last_used > self.idle_ttl]
+                for session in expired:
+                    self._idle.remove(session)
+                self._recycled += len(expired)
+                need_more = len(self._idle) < self.size
+
+            for session in expired:
+                self._close_quietly(session.session_id)
+
+            if need_more:
+                started = time.monotonic()
+                try:
+                    session_id = self._create_fn()
+                except Exception:
+                    session_id = None
+                warmup = time.monotonic() - started
+
+                with self._cond:
+                    if session_id is None:
+                        self._create_failures += 1
+                    elif self._closed:
+                        need_more = False
+                    else:
+                        self._created += 1
+                        self._total_warmup += warmup
+                        self._idle.append(_PooledSession(session_id, warmup))
+                        continue
+
+                if session_id is not None:
+                    self._close_quietly(session_id)
+
+            with self._cond:
+                if not self._closed:
+                    self._cond.wait(timeout=self.refill_interval)
+
+
+class _TrackedSession:
+    """被管理的会话状态"""
+
+    def __init__(self):
+        self.last_used = time.monotonic()
+        self.active = 0
+
+
+class SessionManager:
+    """
+    会话生命周期管理器
+
+    按最近使用时间（LRU）跟踪会话：空闲超过 idle_ttl 的会话被关闭；
+    打开的会话数超过 max_sessions 时关闭最久未使用的空闲会话。
+    正在执行任务的会话不会被关闭。
+
+    Args:
+        max_sessions: 同时打开的会话数上限
+        idle_ttl: 空闲会话的存活时间（秒）
+        reap_interval: 后台清理间隔（秒），None 表示不启动后台线程，
+            由调用方自行调用 close_idle()
+        close_fn: 关闭会话的函数，默认调用后端关闭接口
+
+    Examples:
+        >>> manager = SessionManager(max_sessions=8, idle_ttl=300)
+        >>> install_session_manager(manager)  # 自动跟踪任务返回的会话
+        >>> with manager.session() as session:
+        ...     session.run("https://example.com/login", "登录")
+        ...     session.run("https://example.com/report", "下载报表")
+        >>> # 退出时立即关闭后端浏览器
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 16,
+        idle_ttl: float = 300.0,
+        reap_interval: Optional[float] = 30.0,
+        close_fn: Optional[Callable[[str], Any]] = None
+    ):
+        if close_fn is None:
+            from .main import _close_backend_session
+            close_fn = _close_backend_session
+
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._close_fn = close_fn
+        self._sessions: "OrderedDict[str, _TrackedSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._closed_count = 0
+
+        self._thread = None
+        if reap_interval:
+            self._thread = threading.Thread(
+                target=self._reap_loop, args=(reap_interval,), name="session-reaper", daemon=True
+            )
+            self._thread.start()
+
+    def touch(self, session_id: str) -> None:
+        """登记会话或更新其最近使用时间，超出上限时关闭最久未使用的空闲会话；会话池中的会话不登记"""
+        if _owned_by_pool(session_id):
+            return
+        with self._lock:
+            tracked = self._sessions.get(session_id) or _TrackedSession()
+            tracked.last_used = time.monotonic()
+            self._sessions[session_id] = tracked
+            self._sessions.move_to_end(session_id)
+            evicted = self._pop_overflow()
+        self._close_all(evicted)
+
+    def acquire(self, session_id: str) -> None:
+        """标记会话开始执行任务，执行期间不会被关闭"""
+        with self._lock:
+            tracked = self._sessions.setdefault(session_id, _TrackedSession())
+            tracked.active += 1
+            self._sessions.move_to_end(session_id)
+
+    def release(self, session_id: str) -> None:
+        """标记会话的任务结束"""
+        with self._lock:
+            tracked = self._sessions.get(session_id)
+            if tracked is not None:
+                tracked.active = max(0, tracked.active - 1)
+        self.touch(session_id)
+
+    def close(self, session_id: str) -> bool:
+        """
+        立即关闭会话（会话池中的会话由会话池回收，不在此关闭）
+
+        Returns:
+            后端是否成功关闭
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if _owned_by_pool(session_id):
+            return False
+        return self._close_all([session_id]) == 1
+
+    def forget(self, session_id: str) -> None:
+        """停止跟踪会话（会话已通过其他途径关闭）"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def close_idle(self) -> int:
+        """
+        关闭所有空闲超时的会话
+
+        Returns:
+            关闭的会话数
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                sid for sid, tracked in self._sessions.items()
+                if not tracked.active and now - tracked.last_used > self.idle_ttl
+            ]
+            for sid in expired:
+                del self._sessions[sid]
+        self._close_all(expired)
+        return len(expired)
+
+    def close_all(self) -> None:
+        """停止后台清理并关闭所有跟踪的会话"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            session_ids = list(self._sessions)
+            self._sessions.clear()
+        self._close_all(session_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回会话统计
+
+        Returns:
+            {"open", "active", "closed"}
+        """
+        with self._lock:
+            return {
+                "open": len(self._sessions),
+                "active": sum(1 for t in self._sessions.values() if t.active),
+                "closed": self._closed_count
+            }
+
+    @contextmanager
+    def session(self, session_id: Optional[str] = None) -> Iterator["ManagedSession"]:
+        """
+        多步骤工作流的会话上下文，退出时立即关闭后端会话
+
+        Args:
+            session_id: 已有的会话ID（可选），默认由第一个任务创建
+
+        Yields:
+            ManagedSession，其 run() 方法自动沿用同一会话
+        """
+        managed = ManagedSession(self, session_id)
+        try:
+            yield managed
+        finally:
+            if managed.session_id:
+                self.close(managed.session_id)
+
+    def _pop_overflow(self) -> list[str]:
+        """取出超出上限的最久未使用空闲会话（调用方持有锁）"""
+        evicted = []
+        for sid in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if not self._sessions[sid].active:
+                del self._sessions[sid]
+                evicted.append(sid)
+        return evicted
+
+    def _close_all(self, session_ids: list[str]) -> int:
+        closed = 0
+        for sid in session_ids:
+            try:
+                self._close_fn(sid)
+                closed += 1
+            except Exception:
+                continue
+        with self._lock:
+            self._closed_count += closed
+        return closed
+
+    def _reap_loop(self, interval: float) -> None:
+        while not self._stopped.wait(timeout=interval):
+            self.close_idle()
+
+
+class ManagedSession:
+    """
+    SessionManager.session() 提供的会话句柄
+
+    Attributes:
+        session_id: 当前会话ID，第一个任务完成前可能为 None
+    """
+
+    def __init__(self, manager: SessionManager, session_id: Optional[str] = None):
+        self._manager = manager
+        self.session_id = session_id
+
+    def run(self, urls: str | list[str], query: str, **kwargs: Any) -> dict:
+        """
+        在该会话中执行 execute_browser_task，参数与返回值相同
+
+        会话池中的会话在任务之间会被重置并交给其他任务，因此启用会话池时，
+        第一个任务前先在后端创建工作流专用的会话，不使用池中的会话。
+        """
+        from .main import _create_backend_session, execute_browser_task
+
+        if self.session_id is None and get_session_pool() is not None:
+            try:
+                self.session_id = _create_backend_session()
+            except Exception:
+                return {"success": False, "error": "会话创建失败"}
+            self._manager.touch(self.session_id)
+
+        result = execute_browser_task(urls, query, session_id=self.session_id, **kwargs)
+        if result.get("session_id"):
+            self.session_id = result["session_id"]
+            self._manager.touch(self.session_id)
+        return result
+
+
+# 进程内默认会话池，由 execute_browser_task 在未指定 session_id 时使用
+_default_pool: Optional[SessionPool] = None
+
+# 进程内默认会话管理器，跟踪 execute_browser_task 返回的会话
+_default_manager: Optional[SessionManager] = None
+
+
+def install_session_pool(pool: Optional[SessionPool]) -> Optional[SessionPool]:
+    """
+    设置默认会话池
+
+    Args:
+        pool: 会话池，传入 None 表示停用
+
+    Returns:
+        之前的默认会话池
+    """
+    global _default_pool
+    previous, _default_pool = _default_pool, pool
+    return previous
+
+
+def get_session_pool() -> Optional[SessionPool]:
+    """返回当前的默认会话池"""
+    return _default_pool
+
+
+def _owned_by_pool(session_id: str) -> bool:
+    """会话是否由默认会话池管理"""
+    pool = _default_pool
+    return pool is not None and pool.owns(session_id)
+
+
+def install_session_manager(manager: Optional[SessionManager]) -> Optional[SessionManager]:
+    """
+    设置默认会话管理器
+
+    Args:
+        manager: 会话管理器，传入 None 表示停用
+
+    Returns:
+        之前的默认会话管理器
+    """
+    global _default_manager
+    previous, _default_manager = _default_manager, manager
+    return previous
+
+
+def get_session_manager() -> Optional[SessionManager]:
+    """返回当前的默认会话管理器"""
+    return _default_manager
@@ -0,0 +1,174 @@
+"""
+URL 分片与断点续跑
+
+将超大的 URL 列表拆分为多个有界的后端任务，并记录已完成分片，
+以便重跑时跳过已成功的分片。
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 多个 URL 在查询中的分隔符（与 main.py 构建查询时保持一致）
+URL_SEPARATOR = "、"
+
+
+def split_urls(urls: List[str], max_urls: int, max_chars: int) -> List[List[str]]:
+    """
+    按数量和字符预算将 URL 列表拆分为分片
+
+    单个 URL 超过字符预算时独占一个分片，不会被丢弃。
+
+    Args:
+        urls: URL 列表
+        max_urls: 每个分片最多包含的 URL 数量
+        max_chars: 每个分片拼接后的 URL 文本最大字符数
+
+    Returns:
+        分片列表，每个分片是一个 URL 列表
+    """
+    max_urls = max(1, max_urls)
+    shards: List[List[str]] = []
+    current: List[str] = []
+    current_chars = 0
+
+    for url in urls:
+        added_chars = len(url) + (len(URL_SEPARATOR) if current else 0)
+        if current and (len(current) >= max_urls or current_chars + added_chars > max_chars):
+            shards.append(current)
+            current = []
+            current_chars = 0
+            added_chars = len(url)
+        current.append(url)
+        current_chars += added_chars
+
+    if current:
+        shards.append(current)
+    return shards
+
+
+def shard_key(query: str, urls: List[str], options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    计算分片（或整次运行）的稳定标识
+
+    Args:
+        query: 任务描述
+        urls: 分片中的 URL 列表
+        options: 影响结果的其他选项（会话、输出格式、文件筛选等，可选），
+                 选项不同的运行不会复用彼此的检查点
+
+    Returns:
+        十六进制摘要字符串
+    """
+    payload = json.dumps({"query": query, "urls": urls, "options": options or {}}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class ShardCheckpoint:
+    """
+    分片检查点
+
+    以 JSON 文件记录已成功分片的结果，写入采用临时文件 + 替换，
+    进程中途退出也不会留下损坏的检查点。
+
+    Args:
+        path: 检查点文件路径
+        ttl: 分片结果的有效期（秒，可选），超过后视为未完成、重新执行；None 表示不过期
+    """
+
+    def __init__(self, path: Path, ttl: Optional[float] = None):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._completed: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        now = time.time()
+        return {
+            key: entry for key, entry in data.items()
+            if isinstance(entry, dict) and "result" in entry
+            and (self.ttl is None or now - entry.get("recorded_at", 0) <= self.ttl)
+        }
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """返回有效期内已完成分片的结果，未完成或已过期返回 None"""
+        with self._lock:
+            entry = self._completed.get(key)
+        if entry is None or (self.ttl is not None and time.time() - entry.get("recorded_at", 0) > self.ttl):
+            return None
+        return entry["result"]
+
+    def record(self, key: str, result: Dict[str, Any]) -> None:
+        """记录一个成功分片的结果并落盘"""
+        with self._lock:
+            self._completed[key] = {"recorded_at": time.time(), "result": result}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self._completed, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(self.path)
+
+    def clear(self) -> None:
+        """所有分片完成后删除检查点"""
+        with self._lock:
+            self._completed = {}
+            self.path.unlink(missing_ok=True)
+
+
+def merge_shard_results(results: List[Dict[str, Any]]) -> dict:
+    """
+    合并各分片的执行结果
+
+    Args:
+        results: 按分片顺序排列的结果字典列表
+
+    Returns:
+        与 execute_browser_task 返回结构一致的合并结果，
+        额外包含 shards 统计字段
+    """
+    succeeded = [r for r in results if r.get("success")]
+    failed = len(results) - len(succeeded)
+
+    merged: Dict[str, Any] = {
+        "success": failed == 0,
+        "message": "\n\n".join(r.get("message", "") for r in succeeded if r.get("message")),
+        "session_id": next((r.get("session_id") for r in succeeded if r.get("session_id")), None),
+        "shards": {
+            "total": len(results),
+            "succeeded": len(succeeded),
+            "failed": failed
+        }
+    }
+
+    files = [f for r in succeeded for f in r.get("files", [])]
+    if files:
+        merged["files"] = files
+
+    file_handles = [f for r in succeeded for f in r.get("file_handles", [])]
+    if file_handles:
+        merged["file_handles"] = file_handles
+
+    skipped_files = [f for r in succeeded for f in r.get("skipped_files", [])]
+    if skipped_files:
+        merged["skipped_files"] = skipped_files
+
+    records = [r["records"] for r in succeeded if r.get("records")]
+    if records:
+        merged["records"] = records
+
+    traces = [r["trace_file"] for r in results if r.get("trace_file")]
+    if traces:
+        merged["trace_file"] = traces
+
+    if failed:
+        merged["error"] = "部分分片执行失败"
+
+    return merged
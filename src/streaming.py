@@ -0,0 +1,391 @@
+"""
+流式解析任务响应
+
+/agent/task 的响应中 result.content 可能是数兆字节的 base64 内联文件。
+parse_task_response() 先缓冲响应：不超过 BUFFERED_PARSE_LIMIT 字节的响应，以及
+不含内联文件的响应（大段文本、结构化记录等），整体交给 json.loads 解析；只有
+超过该大小且含内联文件（result.type 为 file_inline）的响应才改为边读边解析，
+content 直接经流式 base64 解码写入暂存文件，整个响应不会完整驻留内存。两种方式
+的解析结果中内联文件的 content 都被替换为 content_path（暂存文件路径）和
+content_size（字节数）。
+
+流式解析时后端需在 content 之前输出 type 字段；否则 content 按普通字符串解析。
+暂存文件由结果处理移动到输出目录；结果未被使用时（对冲落败、监控结果未变化、
+处理出错等）调用 discard_spooled() 删除。
+
+iter_ndjson() 逐行解析 NDJSON 响应（如 /agent/plan 的逐步骤结果），每行同样
+流式解析，读到一行即返回该行的结果。
+"""
+
+import base64
+import binascii
+import codecs
+import itertools
+import json
+import re
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 需要流式解码的字段路径
+INLINE_CONTENT_PATH = ("result", "content")
+
+# 不超过该字节数的响应整体缓冲后用 json.loads 解析（远快于逐字符的流式解析）
+BUFFERED_PARSE_LIMIT = 1024 * 1024
+
+# 含内联文件的响应中 type 字段的字节模式，只有匹配时才改为流式解析
+_INLINE_TYPE_PATTERN = re.compile(rb'"type"\s*:\s*"file_inline"')
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_LITERAL_CHARS = frozenset("+-0123456789.eEtruefalsn")
+
+
+class _CharStream:
+    """将字节块解码为字符，并提供按需读取"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        while not self._eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                text = self._decoder.decode(b"", final=True)
+            else:
+                text = self._decoder.decode(chunk)
+            if text:
+                self._buf = self._buf[self._pos:] + text
+                self._pos = 0
+                return True
+        return False
+
+    def peek(self) -> str:
+        while self._pos >= len(self._buf):
+            if not self._fill():
+                raise ValueError("响应 JSON 不完整")
+        return self._buf[self._pos]
+
+    def next(self) -> str:
+        char = self.peek()
+        self._pos += 1
+        return char
+
+    def skip_ws(self) -> str:
+        """跳过空白，返回下一个非空白字符（不消费）"""
+        while True:
+            char = self.peek()
+            if char not in " \t\r\n":
+                return char
+            self._pos += 1
+
+    def expect(self, char: str) -> None:
+        if self.skip_ws() != char:
+            raise ValueError(f"响应 JSON 格式错误: 期望 {char!r}")
+        self._pos += 1
+
+    def at_end(self) -> bool:
+        while True:
+            while self._pos < len(self._buf):
+                if self._buf[self._pos] not in " \t\r\n":
+                    return False
+                self._pos += 1
+            if not self._fill():
+                return True
+
+    def read_string(self, write: Callable[[str], None]) -> None:
+        """读取一个 JSON 字符串（含两侧引号），按片段交给 write"""
+        self.expect('"')
+        while True:
+            if self._pos >= len(self._buf) and not self._fill():
+                raise ValueError("响应 JSON 不完整")
+            buf, start = self._buf, self._pos
+            quote = buf.find('"', start)
+            backslash = buf.find("\\", start, quote if quote >= 0 else len(buf))
+            if backslash >= 0:
+                if backslash > start:
+                    write(buf[start:backslash])
+                self._pos = backslash + 1
+                write(self._read_escape())
+            elif quote >= 0:
+                if quote > start:
+                    write(buf[start:quote])
+                self._pos = quote + 1
+                return
+            else:
+                write(buf[start:])
+                self._pos = len(buf)
+
+    def _read_escape(self) -> str:
+        char = self.next()
+        if char != "u":
+            if char not in _ESCAPES:
+                raise ValueError("响应 JSON 格式错误: 无效的转义")
+            return _ESCAPES[char]
+        code = int("".join(self.next() for _ in range(4)), 16)
+        if 0xD800 <= code < 0xDC00 and self.peek() == "\\":
+            self._pos += 1
+            if self.next() != "u":
+                raise ValueError("响应 JSON 格式错误: 无效的代理对")
+            low = int("".join(self.next() for _ in range(4)), 16)
+            code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+        return chr(code)
+
+    def read_literal(self) -> Any:
+        chars = []
+        while True:
+            if self._pos >= len(self._buf) and not self._fill():
+                break
+            char = self._buf[self._pos]
+            if char not in _LITERAL_CHARS:
+                break
+            chars.append(char)
+            self._pos += 1
+        return json.loads("".join(chars))
+
+
+class _Base64Sink:
+    """流式 base64 解码，按 4 字符对齐分段写入文件"""
+
+    def __init__(self, file: BinaryIO):
+        self._file = file
+        self._pending = ""
+        self.size = 0
+        self.error: Optional[str] = None
+
+    def write(self, text: str) -> None:
+        if self.error:
+            return
+        self._pending += "".join(text.split())
+        aligned = len(self._pending) // 4 * 4
+        if aligned:
+            self._decode(self._pending[:aligned])
+            self._pending = self._pending[aligned:]
+
+    def close(self) -> None:
+        if self._pending and not self.error:
+            self._decode(self._pending)
+            self._pending = ""
+
+    def _decode(self, text: str) -> None:
+        try:
+            data = base64.b64decode(text, validate=True)
+        except (binascii.Error, ValueError):
+            self.error = "内联文件内容不是有效的 base64"
+            return
+        self._file.write(data)
+        self.size += len(data)
+
+
+def parse_task_response(chunks: Iterable[bytes], spool_dir: Path) -> Dict[str, Any]:
+    """
+    解析任务响应，大型内联文件流式解码到暂存目录
+
+    Args:
+        chunks: 响应体的字节块（如 response.iter_content()）
+        spool_dir: 内联文件内容的暂存目录
+
+    Returns:
+        解析后的响应字典。若包含内联文件的 result.content，该字段被替换为：
+        - content_path: 解码后内容的暂存文件路径
+        - content_size: 解码后的字节数
+        - content_error: 内容不是有效 base64 时的错误信息（此时不含 content_path）
+
+    Raises:
+        ValueError: 响应不是完整、合法的 JSON
+    """
+    chunks = iter(chunks)
+    buffered = bytearray()
+    searched = 0
+    for chunk in chunks:
+        buffered += chunk
+        if len(buffered) > BUFFERED_PARSE_LIMIT:
+            # 模式可能跨越两个块，从上次检查位置之前一点开始查找
+            if _INLINE_TYPE_PATTERN.search(buffered, max(0, searched - 64)):
+                return _parse_streaming(itertools.chain([bytes(buffered)], chunks), spool_dir)
+            searched = len(buffered)
+    return _parse_buffered(bytes(buffered), spool_dir)
+
+
+def discard_spooled(api_result: Any) -> None:
+    """
+    删除解析结果中未被取走的内联文件暂存内容
+
+    Args:
+        api_result: parse_task_response 的解析结果；暂存文件已被移走时不做任何事
+    """
+    result_data = api_result.get("result") if isinstance(api_result, dict) else None
+    if isinstance(result_data, dict) and result_data.get("content_path"):
+        Path(result_data["content_path"]).unlink(missing_ok=True)
+
+
+def _parse_buffered(data: bytes, spool_dir: Path) -> Dict[str, Any]:
+    """用 json.loads 解析已缓冲的响应，内联文件内容解码到暂存文件"""
+    value = json.loads(data)
+    result_data = value.get("result") if isinstance(value, dict) else None
+    spooled: List[Tuple[Dict[str, Any], Path, _Base64Sink]] = []
+    if isinstance(result_data, dict) and result_data.get("type") == "file_inline" \
+            and isinstance(result_data.get("content"), str):
+        content = result_data.pop("content")
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        spool_path = spool_dir / f"inline_{uuid.uuid4().hex}.part"
+        with spool_path.open("wb") as f:
+            sink = _Base64Sink(f)
+            spooled.append((result_data, spool_path, sink))
+            sink.write(content)
+            sink.close()
+    _finish_spooled(spooled)
+    return value
+
+
+def _parse_streaming(chunks: Iterable[bytes], spool_dir: Path) -> Dict[str, Any]:
+    """逐字符流式解析响应，内联文件内容边读边解码"""
+    stream = _CharStream(chunks)
+    spooled: List[Tuple[Dict[str, Any], Path, _Base64Sink]] = []
+    try:
+        value = _parse_value(stream, (), spool_dir, spooled)
+        if not stream.at_end():
+            raise ValueError("响应 JSON 格式错误: 多余的内容")
+    except BaseException:
+        for _, path, _ in spooled:
+            path.unlink(missing_ok=True)
+        raise
+
+    _finish_spooled(spooled)
+    return value
+
+
+def _finish_spooled(spooled: List[Tuple[Dict[str, Any], Path, _Base64Sink]]) -> None:
+    """将暂存结果写回所在对象，base64 无效时删除暂存文件并记录错误"""
+    for container, path, sink in spooled:
+        if sink.error:
+            path.unlink(missing_ok=True)
+            container["content_error"] = sink.error
+        else:
+            container["content_path"] = str(path)
+            container["content_size"] = sink.size
+
+
+class _LineReader:
+    """将字节块按换行符切分为逐行的字节块流，行内容不整体缓存"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def next_line(self) -> Optional[Iterator[bytes]]:
+        """返回下一个非空行的字节块迭代器，没有更多行时返回 None"""
+        while True:
+            stripped = self._pending.lstrip()
+            if stripped:
+                self._pending = stripped
+                return self._line()
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return None
+            self._pending = chunk
+
+    def _line(self) -> Iterator[bytes]:
+        while True:
+            index = self._pending.find(b"\n")
+            if index >= 0:
+                line, self._pending = self._pending[:index], self._pending[index + 1:]
+                yield line
+                return
+            chunk, self._pending = self._pending, b""
+            if chunk:
+                yield chunk
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return
+            self._pending = chunk
+
+
+def iter_ndjson(chunks: Iterable[bytes], spool_dir: Path) -> Iterator[Dict[str, Any]]:
+    """
+    逐行流式解析 NDJSON 响应
+
+    Args:
+        chunks: 响应体的字节块
+        spool_dir: 内联文件内容的暂存目录
+
+    Yields:
+        每行解析后的字典，内联文件的处理同 parse_task_response
+
+    Raises:
+        ValueError: 某一行不是完整、合法的 JSON
+    """
+    lines = _LineReader(chunks)
+    while (line := lines.next_line()) is not None:
+        yield parse_task_response(line, spool_dir)
+
+
+def _parse_value(
+    stream: _CharStream,
+    path: Tuple[str, ...],
+    spool_dir: Path,
+    spooled: List[Tuple[Dict[str, Any], Path, _Base64Sink]]
+) -> Any:
+    char = stream.skip_ws()
+    if char == "{":
+        return _parse_object(stream, path, spool_dir, spooled)
+    if char == "[":
+        stream.next()
+        items = []
+        if stream.skip_ws() == "]":
+            stream.next()
+            return items
+        while True:
+            items.append(_parse_value(stream, path + ("[]",), spool_dir, spooled))
+            char = stream.skip_ws()
+            stream.next()
+            if char == "]":
+                return items
+            if char != ",":
+                raise ValueError("响应 JSON 格式错误: 数组")
+    if char == '"':
+        parts: List[str] = []
+        stream.read_string(parts.append)
+        return "".join(parts)
+    return stream.read_literal()
+
+
+def _parse_object(
+    stream: _CharStream,
+    path: Tuple[str, ...],
+    spool_dir: Path,
+    spooled: List[Tuple[Dict[str, Any], Path, _Base64Sink]]
+) -> Dict[str, Any]:
+    stream.next()
+    obj: Dict[str, Any] = {}
+    if stream.skip_ws() == "}":
+        stream.next()
+        return obj
+    while True:
+        key_parts: List[str] = []
+        stream.read_string(key_parts.append)
+        key = "".join(key_parts)
+        stream.expect(":")
+
+        child_path = path + (key,)
+        if child_path == INLINE_CONTENT_PATH and obj.get("type") == "file_inline" and stream.skip_ws() == '"':
+            spool_dir.mkdir(parents=True, exist_ok=True)
+            spool_path = spool_dir / f"inline_{uuid.uuid4().hex}.part"
+            with spool_path.open("wb") as f:
+                sink = _Base64Sink(f)
+                spooled.append((obj, spool_path, sink))
+                stream.read_string(sink.write)
+                sink.close()
+        else:
+            obj[key] = _parse_value(stream, child_path, spool_dir, spooled)
+
+        char = stream.skip_ws()
+        stream.next()
+        if char == "}":
+            return obj
+        if char != ",":
+            raise ValueError("响应 JSON 格式错误: 对象")
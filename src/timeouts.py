@@ -0,0 +1,123 @@
+"""
+自适应超时
+
+按 (目标域名, 任务类型) 维护最近的任务耗时窗口，用滚动分位数推算超时；
+文件下载则按最低吞吐量（字节/秒）判定超时，而不是固定的总时长。
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+
+class LatencyTracker:
+    """
+    滚动耗时统计
+
+    Args:
+        window: 每个 (域名, 任务类型) 保留的最近样本数
+        min_samples: 样本数达到该值后才启用自适应超时
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, domain: str, kind: str, seconds: float) -> None:
+        """记录一次耗时（秒）"""
+        with self._lock:
+            samples = self._samples.get((domain, kind))
+            if samples is None:
+                samples = self._samples[(domain, kind)] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, domain: str, kind: str, p: float) -> Optional[float]:
+        """
+        返回耗时分位数
+
+        Args:
+            domain: 目标域名
+            kind: 任务类型（如 "task"、"batch"、"download"）
+            p: 分位数（0-100）
+
+        Returns:
+            分位数耗时（秒），样本不足 min_samples 时返回 None
+        """
+        with self._lock:
+            samples = sorted(self._samples.get((domain, kind), ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(p / 100 * len(samples)) - 1))
+        return samples[index]
+
+    def adaptive_timeout(
+        self,
+        domain: str,
+        kind: str,
+        default: float,
+        percentile: float = 99,
+        multiplier: float = 2.0,
+        floor: float = 30.0
+    ) -> float:
+        """
+        根据历史耗时推算超时时间
+
+        超时取分位数耗时乘以系数，并限制在 [floor, default] 之间；
+        样本不足时直接返回 default。
+
+        Args:
+            domain: 目标域名
+            kind: 任务类型
+            default: 调用方给出的超时时间，同时作为上限
+            percentile: 参考的耗时分位数，默认 p99
+            multiplier: 安全系数，默认 2 倍
+            floor: 超时下限（秒）
+
+        Returns:
+            超时时间（秒）
+        """
+        observed = self.percentile(domain, kind, percentile)
+        if observed is None:
+            return default
+        return min(default, max(floor, observed * multiplier))
+
+
+def iter_with_throughput(
+    chunks: Iterable[bytes],
+    min_bytes_per_sec: float,
+    grace: float,
+    expected_bytes: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    包装分块迭代器，平均速度低于最低吞吐量时中止
+
+    从收到第一个数据块开始计时（首字节前的等待不计入），grace 秒的
+    宽限期之后，若已知总大小且仍有数据未到、累计平均速度又低于
+    min_bytes_per_sec，抛出 TimeoutError。总大小未知时不做速度判定，
+    连接停顿交给单次读取超时处理。
+
+    Args:
+        chunks: 数据块迭代器（如 response.iter_content()）
+        min_bytes_per_sec: 可接受的最低平均下载速度
+        grace: 宽限期（秒）
+        expected_bytes: 预期总字节数（如 Content-Length，可选）
+
+    Yields:
+        原始数据块
+    """
+    started = None
+    received = 0
+    for chunk in chunks:
+        now = time.monotonic()
+        if started is None:
+            started = now
+        received += len(chunk)
+        elapsed = now - started
+        remaining = expected_bytes is not None and received < expected_bytes
+        if remaining and elapsed > grace and received / elapsed < min_bytes_per_sec:
+            raise TimeoutError(f"下载速度过低: {received / elapsed:.0f} B/s")
+        yield chunk
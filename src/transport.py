@@ -0,0 +1,416 @@
+"""
+HTTP 传输层
+
+所有发往后端的请求都经过 get_transport() 返回的传输实现：
+- RequestsTransport（默认）：直接调用 requests.post/get/delete
+- HttpxTransport：基于 httpx 的连接池，启用 HTTP/2 时多个并发任务和下载
+  复用少量连接（需要安装 httpx[http2]，见 pyproject.toml 的 http2 可选依赖）
+
+传输实现返回的响应对象与 requests.Response 的用法一致（status_code、
+raise_for_status()、json()、iter_content()、close()），异常也统一为
+requests.exceptions 中的类型，调用方的错误处理不需要区分传输方式。
+
+通过环境变量 BROWSER_API_TRANSPORT 选择默认传输（requests 或 http2），
+未安装 httpx 时回退到 requests；也可以用 install_transport() 显式设置。
+
+与后端部署在同一主机时，BROWSER_API_URL 可以写为 unix:///path/to/backend.sock，
+请求经 Unix 域套接字发送。normalize_base_url() 将其转换为
+http+unix://%2Fpath%2Fto%2Fbackend.sock 形式，接口路径照常拼接在后面；
+两种传输都为每个套接字维护连接池，流式读取方式不变。
+"""
+
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ReadTimeoutError
+
+# Unix 域套接字地址的 URL 前缀
+UNIX_SCHEME = "http+unix://"
+
+# 每个 Unix 域套接字的连接池大小
+UNIX_POOL_SIZE = 32
+
+
+def normalize_base_url(url: str) -> str:
+    """
+    规范化后端地址：去除尾部斜杠，unix:// 地址转换为 http+unix:// 形式
+
+    Args:
+        url: 配置的后端地址，如 http://host:52101 或 unix:///run/browser-api.sock
+
+    Returns:
+        可直接拼接接口路径的地址
+    """
+    url = url.strip().rstrip("/")
+    if url.startswith("unix:"):
+        return UNIX_SCHEME + quote("/" + url[len("unix:"):].lstrip("/"), safe="")
+    return url
+
+
+def is_read_timeout(error: BaseException) -> bool:
+    """
+    判断异常是否由读取超时引起
+
+    requests 在 iter_content() 读取响应体期间遇到读取超时时抛出的是
+    ConnectionError（包装 urllib3 的 ReadTimeoutError），而不是 Timeout；
+    流式读取的调用方据此将其与连接失败区分开。
+
+    Args:
+        error: 捕获的异常
+
+    Returns:
+        是否为读取超时
+    """
+    seen: Optional[BaseException] = error
+    while seen is not None:
+        if isinstance(seen, (requests.exceptions.Timeout, ReadTimeoutError, socket.timeout)):
+            return True
+        if any(isinstance(arg, ReadTimeoutError) for arg in seen.args):
+            return True
+        seen = seen.__cause__ or seen.__context__
+    return False
+
+
+def split_unix_url(url: str) -> Tuple[str, str]:
+    """
+    拆分 http+unix:// 地址
+
+    Returns:
+        (套接字路径, 请求路径和查询字符串)
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    return unquote(parts.netloc), f"{path}?{parts.query}" if parts.query else path
+
+
+class Transport:
+    """传输实现的接口"""
+
+    name = "base"
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False
+    ) -> Any:
+        """
+        发送请求
+
+        Args:
+            method: HTTP 方法（GET、POST、DELETE）
+            url: 请求地址
+            json: JSON 请求体（可选）
+            headers: 额外的请求头（可选）
+            timeout: 连接和单次读取的超时时间（秒）
+            stream: 是否流式读取响应体
+
+        Returns:
+            与 requests.Response 用法一致的响应对象
+
+        Raises:
+            requests.exceptions.RequestException: 连接失败、超时等
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """释放连接"""
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    """连接到 Unix 域套接字的 HTTP 连接"""
+
+    def __init__(self, socket_path: str, **kwargs: Any):
+        super().__init__("localhost", **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except socket.timeout as e:
+            sock.close()
+            raise ConnectTimeoutError(self, f"连接 {self.socket_path} 超时") from e
+        except OSError as e:
+            sock.close()
+            raise NewConnectionError(self, f"无法连接 {self.socket_path}: {e}") from e
+        return sock
+
+
+class _UnixHTTPConnectionPool(HTTPConnectionPool):
+    """单个 Unix 域套接字的连接池"""
+
+    def __init__(self, socket_path: str, **kwargs: Any):
+        super().__init__("localhost", **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> _UnixHTTPConnection:
+        self.num_connections += 1
+        return _UnixHTTPConnection(self.socket_path, timeout=self.timeout.connect_timeout, **self.conn_kw)
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """
+    requests 适配器：将 http+unix:// 地址的请求发往 Unix 域套接字
+
+    Args:
+        pool_maxsize: 每个套接字保持的最大连接数
+    """
+
+    def __init__(self, pool_maxsize: int = UNIX_POOL_SIZE):
+        self._unix_pool_maxsize = pool_maxsize
+        self._unix_pools: Dict[str, _UnixHTTPConnectionPool] = {}
+        self._unix_lock = threading.Lock()
+        super().__init__(pool_maxsize=pool_maxsize)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._pool_for(request.url)
+
+    def get_connection(self, url, proxies=None):
+        return self._pool_for(url)
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+    def close(self) -> None:
+        with self._unix_lock:
+            pools, self._unix_pools = self._unix_pools, {}
+        for pool in pools.values():
+            pool.close()
+        super().close()
+
+    def _pool_for(self, url: str) -> _UnixHTTPConnectionPool:
+        socket_path, _ = split_unix_url(url)
+        with self._unix_lock:
+            pool = self._unix_pools.get(socket_path)
+            if pool is None:
+                pool = self._unix_pools[socket_path] = _UnixHTTPConnectionPool(
+                    socket_path, maxsize=self._unix_pool_maxsize, block=False
+                )
+            return pool
+
+
+class RequestsTransport(Transport):
+    """基于 requests 的默认传输，http+unix:// 地址经 UnixSocketAdapter 发送"""
+
+    name = "requests"
+
+    def __init__(self):
+        self._unix_session: Optional[requests.Session] = None
+        self._unix_lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False
+    ) -> requests.Response:
+        kwargs: Dict[str, Any] = {"timeout": timeout}
+        if json is not None:
+            kwargs["json"] = json
+        if headers:
+            kwargs["headers"] = headers
+        if stream:
+            kwargs["stream"] = True
+        if url.startswith(UNIX_SCHEME):
+            return self._session_for_unix().request(method, url, **kwargs)
+        return getattr(requests, method.lower())(url, **kwargs)
+
+    def close(self) -> None:
+        with self._unix_lock:
+            session, self._unix_session = self._unix_session, None
+        if session is not None:
+            session.close()
+
+    def _session_for_unix(self) -> requests.Session:
+        with self._unix_lock:
+            if self._unix_session is None:
+                self._unix_session = requests.Session()
+                self._unix_session.mount(UNIX_SCHEME, UnixSocketAdapter())
+            return self._unix_session
+
+
+class HttpxTransport(Transport):
+    """
+    基于 httpx 的连接池传输
+
+    Args:
+        http2: 是否启用 HTTP/2，默认 True。https 后端通过 ALPN 协商，
+               不支持 HTTP/2 的后端自动使用 HTTP/1.1
+        max_connections: 连接池的最大连接数。HTTP/2 下同一后端的并发请求复用一个连接，
+               该上限只在协商为 HTTP/1.1 时限制并发，应不小于并发请求数
+        prior_knowledge: 明文 http:// 后端是否直接使用 HTTP/2（h2c），
+               仅在确认后端支持时启用
+
+    Raises:
+        ImportError: 未安装 httpx（启用 HTTP/2 时还需要 h2）
+    """
+
+    name = "http2"
+
+    def __init__(self, http2: bool = True, max_connections: int = 64, prior_knowledge: bool = False):
+        try:
+            import httpx
+            if http2:
+                import h2  # noqa: F401
+        except ImportError as e:
+            raise ImportError("HTTP/2 传输需要安装 httpx[http2]") from e
+
+        self._httpx = httpx
+        self._http1 = not (http2 and prior_knowledge)
+        self._http2 = http2
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = httpx.Client(http1=self._http1, http2=http2, limits=self._limits)
+        # Unix 域套接字路径 -> 专用客户端
+        self._unix_clients: Dict[str, Any] = {}
+        self._unix_lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False
+    ) -> "_HttpxResponse":
+        client = self._client
+        if url.startswith(UNIX_SCHEME):
+            socket_path, path = split_unix_url(url)
+            client, url = self._client_for_unix(socket_path), f"http://localhost{path}"
+        request = client.build_request(method, url, json=json, headers=headers, timeout=timeout)
+        with _map_httpx_errors(self._httpx):
+            response = client.send(request, stream=stream)
+        return _HttpxResponse(response, self._httpx)
+
+    def close(self) -> None:
+        self._client.close()
+        with self._unix_lock:
+            clients, self._unix_clients = self._unix_clients, {}
+        for client in clients.values():
+            client.close()
+
+    def _client_for_unix(self, socket_path: str) -> Any:
+        with self._unix_lock:
+            client = self._unix_clients.get(socket_path)
+            if client is None:
+                client = self._unix_clients[socket_path] = self._httpx.Client(
+                    transport=self._httpx.HTTPTransport(
+                        uds=socket_path, http1=self._http1, http2=self._http2, limits=self._limits
+                    )
+                )
+            return client
+
+
+@contextmanager
+def _map_httpx_errors(httpx: Any) -> Iterator[None]:
+    """将 httpx 异常转换为对应的 requests 异常"""
+    try:
+        yield
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(str(e)) from e
+    except httpx.HTTPError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+
+
+class _HttpxResponse:
+    """以 requests.Response 的方式访问 httpx 响应"""
+
+    def __init__(self, response: Any, httpx: Any):
+        self._response = response
+        self._httpx = httpx
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.http_version = response.http_version
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}", response=self)
+
+    def json(self) -> Any:
+        with _map_httpx_errors(self._httpx):
+            self._response.read()
+        return self._response.json()
+
+    @property
+    def content(self) -> bytes:
+        with _map_httpx_errors(self._httpx):
+            return self._response.read()
+
+    def iter_content(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        with _map_httpx_errors(self._httpx):
+            yield from self._response.iter_bytes(chunk_size=chunk_size)
+
+    def close(self) -> None:
+        self._response.close()
+
+
+_default_transport: Optional[Transport] = None
+_default_lock = threading.Lock()
+
+
+def create_transport(name: str, **options: Any) -> Transport:
+    """
+    按名称创建传输实现
+
+    Args:
+        name: "requests" 或 "http2"
+        options: 传给传输实现的参数（如 max_connections）
+
+    Returns:
+        传输实现
+
+    Raises:
+        ValueError: 不支持的传输方式
+        ImportError: http2 传输缺少依赖
+    """
+    if name == "requests":
+        return RequestsTransport()
+    if name == "http2":
+        return HttpxTransport(**options)
+    raise ValueError(f"不支持的传输方式: {name}")
+
+
+def install_transport(transport: Optional[Transport]) -> Optional[Transport]:
+    """
+    设置默认传输
+
+    Args:
+        transport: 传输实现，传入 None 表示恢复为按环境变量选择
+
+    Returns:
+        之前的默认传输（不会被关闭）
+    """
+    global _default_transport
+    with _default_lock:
+        previous, _default_transport = _default_transport, transport
+    return previous
+
+
+def get_transport() -> Transport:
+    """返回默认传输，首次调用时按 BROWSER_API_TRANSPORT 创建"""
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            name = os.environ.get("BROWSER_API_TRANSPORT", "requests").strip().lower() or "requests"
+            try:
+                _default_transport = create_transport(name)
+            except (ImportError, ValueError):
+                _default_transport = RequestsTransport()
+        return _default_transport
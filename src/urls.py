@@ -0,0 +1,146 @@
+"""
+URL 规范化与去重
+
+在构建查询之前合并等价 URL（尾部斜杠、默认端口、跟踪参数、片段差异等），
+避免后端浏览器重复访问同一页面。
+"""
+
+from fnmatch import fnmatch
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+# 默认规范化规则，可通过 execute_browser_task 的 url_rules 参数逐项覆盖
+DEFAULT_URL_RULES: Dict[str, Any] = {
+    "lowercase_host": True,
+    "drop_default_port": True,
+    "drop_fragment": True,
+    "strip_trailing_slash": True,
+    "strip_tracking_params": True,
+    "tracking_params": ["utm_*", "gclid", "fbclid", "msclkid", "spm"],
+}
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# 单页应用的哈希路由前缀，这类片段决定访问的页面，drop_fragment 时也保留
+_HASH_ROUTE_PREFIXES = ("/", "!")
+
+
+def resolve_url_rules(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    合并用户规则与默认规则
+
+    Args:
+        overrides: 需要覆盖的规则项（可选），未知键会被忽略
+
+    Returns:
+        完整的规则字典
+    """
+    rules = dict(DEFAULT_URL_RULES)
+    if overrides:
+        rules.update({k: v for k, v in overrides.items() if k in DEFAULT_URL_RULES})
+    return rules
+
+
+def canonicalize_url(url: str, rules: Optional[Dict[str, Any]] = None) -> str:
+    """
+    按规则规范化单个 URL
+
+    无法解析的 URL（缺少协议或主机、端口非法等）仅去除首尾空白后原样返回。
+    drop_fragment 只去除页内锚点，#/reports、#!/list 等哈希路由会保留。
+
+    Args:
+        url: 原始 URL
+        rules: 规范化规则（可选），默认使用 DEFAULT_URL_RULES
+
+    Returns:
+        规范化后的 URL
+    """
+    rules = rules or DEFAULT_URL_RULES
+    url = url.strip()
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    if not parts.scheme or not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+
+    userinfo, _, hostport = parts.netloc.rpartition("@")
+    host = parts.hostname
+    if not rules["lowercase_host"]:
+        # urlsplit 已将 hostname 转为小写，这里从原始 netloc 中取回原始大小写
+        start = hostport.lower().find(host)
+        host = hostport[start:start + len(host)]
+    if ":" in host:
+        # IPv6 地址需要重新加上方括号
+        host = f"[{host}]"
+    if port is not None and not (rules["drop_default_port"] and _DEFAULT_PORTS.get(scheme) == port):
+        host = f"{host}:{port}"
+    netloc = f"{userinfo}@{host}" if userinfo else host
+
+    path = parts.path
+    if rules["strip_trailing_slash"]:
+        path = path.rstrip("/")
+
+    query = parts.query
+    if rules["strip_tracking_params"] and query:
+        # 按原始的 & 分段过滤，保留各参数原有的编码（?flag、%20、值中的 / 等）
+        patterns = [p.lower() for p in rules["tracking_params"]]
+        pairs = query.split("&")
+        kept = [
+            pair for pair in pairs
+            if not any(fnmatch(unquote_plus(pair.split("=", 1)[0]).lower(), pattern) for pattern in patterns)
+        ]
+        if len(kept) < len(pairs):
+            query = "&".join(pair for pair in kept if pair)
+
+    fragment = parts.fragment
+    if rules["drop_fragment"] and not fragment.startswith(_HASH_ROUTE_PREFIXES):
+        fragment = ""
+
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def dedupe_urls(
+    urls: List[str],
+    rules: Optional[Dict[str, Any]] = None
+) -> Tuple[List[str], Dict[str, str]]:
+    """
+    规范化并去重 URL 列表
+
+    Args:
+        urls: 原始 URL 列表
+        rules: 规范化规则（可选）
+
+    Returns:
+        (去重后的规范 URL 列表（保持首次出现顺序）, 原始 URL -> 规范 URL 的映射)
+    """
+    unique: List[str] = []
+    url_map: Dict[str, str] = {}
+    seen = set()
+
+    for url in urls:
+        canonical = canonicalize_url(url, rules)
+        url_map[url] = canonical
+        if canonical not in seen:
+            seen.add(canonical)
+            unique.append(canonical)
+
+    return unique, url_map
+
+
+def url_domain(url: str) -> str:
+    """
+    提取 URL 的规范化主机名
+
+    Args:
+        url: 原始 URL
+
+    Returns:
+        小写主机名，无法解析时返回空字符串
+    """
+    return urlsplit(canonicalize_url(url)).hostname or ""
@@ -0,0 +1,325 @@
+"""
+队列工作进程
+
+从持久化队列（DurableQueue）领取任务并调用 execute_browser_task 执行，
+结果写回队列。超时、后端繁忙、请求失败等可重试的失败结果重新排队，
+达到最大尝试次数后标记为失败。进程崩溃时未确认的任务在租约到期后由其他工作进程重新领取；
+以固定的 --worker-id 重启时会立即收回自己之前持有的租约。
+
+--processes 大于 1 时启动多个子进程分摊 JSON 解析、base64 解码等 CPU 开销。
+子进程共享同一个队列数据库和输出目录，结果直接写入队列，
+只有少量统计数据（含各进程的耗时直方图快照）回传父进程汇总。收到 SIGTERM 后停止领取新任务，
+等待执行中的任务完成再退出。
+
+用法:
+    python -m src.worker --db data/state/queue.db --concurrency 4
+    python -m src.worker --drain  # 队列清空后退出
+    python -m src.worker --processes 4 --concurrency 8
+"""
+
+import argparse
+import multiprocessing
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Empty
+from typing import Any, Callable, Dict, List, Optional
+
+from .durable_queue import DurableQueue
+from .metrics import LatencyRecorder, default_recorder
+
+# 默认队列数据库路径（位于本地状态目录，不会被 Gateway 上传）
+DEFAULT_QUEUE_PATH = Path("data/state/queue.db")
+
+# execute_browser_task 中可重试的失败（超时、后端繁忙、连接或 HTTP 错误），重新排队而不是确认完成
+RETRIABLE_ERRORS = ("任务超时", "后端繁忙，请稍后重试", "API 请求失败")
+
+
+class Worker:
+    """
+    队列工作者
+
+    Args:
+        queue: 持久化队列
+        concurrency: 同时执行的任务数
+        worker_id: 工作进程标识，默认随机生成
+        poll_interval: 队列为空时的轮询间隔（秒）
+        task_fn: 执行任务的函数，默认为 execute_browser_task
+    """
+
+    def __init__(
+        self,
+        queue: DurableQueue,
+        concurrency: int = 4,
+        worker_id: Optional[str] = None,
+        poll_interval: float = 1.0,
+        task_fn: Optional[Callable[..., Dict[str, Any]]] = None
+    ):
+        if task_fn is None:
+            from .main import execute_browser_task
+            task_fn = execute_browser_task
+
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.worker_id = worker_id or f"worker-{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        self._task_fn = task_fn
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._stopping = False
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def run(self, drain: bool = False) -> int:
+        """
+        持续领取并执行任务，直到调用 stop() 或（drain 时）队列清空
+
+        Args:
+            drain: 队列中没有可领取的任务且没有执行中的任务时退出
+
+        Returns:
+            本次处理的任务数
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="queue-worker") as executor:
+            while True:
+                with self._cond:
+                    if self._stopping:
+                        break
+                    free = self.concurrency - self._in_flight
+
+                leased = self.queue.lease(self.worker_id, limit=free) if free > 0 else []
+                with self._cond:
+                    self._in_flight += len(leased)
+                for task_id, payload in leased:
+                    executor.submit(self._execute, task_id, payload)
+
+                with self._cond:
+                    if drain and not leased and self._in_flight == 0:
+                        break
+                    if not leased or self._in_flight >= self.concurrency:
+                        self._cond.wait(timeout=self.poll_interval)
+        return self.processed
+
+    def stop(self) -> None:
+        """停止领取新任务；执行中的任务完成后 run() 返回"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        返回统计数据
+
+        Returns:
+            {"worker_id", "processed", "succeeded", "failed", "busy_seconds", "latency"}，
+            latency 为本进程 src.metrics.default_recorder 的快照
+        """
+        with self._cond:
+            return {
+                "worker_id": self.worker_id,
+                "processed": self.processed,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "latency": default_recorder.snapshot()
+            }
+
+    def _execute(self, task_id: int, payload: Dict[str, Any]) -> None:
+        started = time.monotonic()
+        succeeded = False
+        try:
+            # 队列的幂等键传给任务：崩溃后重新领取的任务可复用已记录的结果，并由后端按该键去重
+            entry = self.queue.get(task_id)
+            if entry and entry["idempotency_key"] and "idempotency_key" not in payload:
+                payload = {**payload, "idempotency_key": entry["idempotency_key"]}
+            result = self._task_fn(**payload)
+        except Exception as e:
+            self.queue.fail(task_id, str(e) or type(e).__name__, owner=self.worker_id)
+        else:
+            if not result.get("success") and result.get("error") in RETRIABLE_ERRORS:
+                self.queue.fail(task_id, result["error"], owner=self.worker_id)
+            else:
+                self.queue.ack(task_id, result, owner=self.worker_id)
+                succeeded = bool(result.get("success"))
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self.processed += 1
+                self.succeeded += succeeded
+                self.failed += not succeeded
+                self.busy_seconds += time.monotonic() - started
+                self._cond.notify_all()
+
+
+def aggregate_metrics(metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    汇总各进程的统计数据
+
+    Args:
+        metrics: 各进程 Worker.metrics() 的结果
+
+    Returns:
+        {"processes", "processed", "succeeded", "failed", "busy_seconds", "latency", "per_process"}，
+        latency 为合并各进程直方图后的分位数 {名称: 统计}，per_process 不含直方图快照
+    """
+    latency = LatencyRecorder()
+    for m in metrics:
+        latency.merge_snapshot(m.get("latency") or {})
+    return {
+        "processes": len(metrics),
+        "processed": sum(m["processed"] for m in metrics),
+        "succeeded": sum(m["succeeded"] for m in metrics),
+        "failed": sum(m["failed"] for m in metrics),
+        "busy_seconds": round(sum(m["busy_seconds"] for m in metrics), 3),
+        "latency": latency.percentiles(),
+        "per_process": sorted(
+            ({key: value for key, value in m.items() if key != "latency"} for m in metrics),
+            key=lambda m: m["worker_id"]
+        )
+    }
+
+
+def _process_main(
+    db: str,
+    worker_id: str,
+    concurrency: int,
+    poll_interval: float,
+    visibility_timeout: float,
+    drain: bool,
+    stop_event: Any,
+    results: Any
+) -> None:
+    """子进程入口：运行一个 Worker，结束后把统计数据发回父进程"""
+    # 中断由父进程统一协调，子进程收到 SIGTERM 时同样只停止领取
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    with DurableQueue(db, visibility_timeout=visibility_timeout) as queue:
+        worker = Worker(queue, concurrency=concurrency, worker_id=worker_id, poll_interval=poll_interval)
+        threading.Thread(target=lambda: (stop_event.wait(), worker.stop()), daemon=True).start()
+        worker.run(drain=drain)
+        results.put(worker.metrics())
+
+
+def run_processes(
+    db: str | Path,
+    processes: int,
+    concurrency: int = 4,
+    worker_id: Optional[str] = None,
+    poll_interval: float = 1.0,
+    visibility_timeout: float = 900.0,
+    drain: bool = False,
+    stop_event: Any = None
+) -> Dict[str, Any]:
+    """
+    以多个子进程执行队列任务
+
+    Args:
+        db: 队列数据库路径
+        processes: 子进程数
+        concurrency: 每个子进程同时执行的任务数
+        worker_id: 工作进程标识前缀，子进程为 "{worker_id}-{序号}"；指定时启动前收回之前的租约
+        poll_interval: 队列为空时的轮询间隔（秒）
+        visibility_timeout: 租约时长（秒）
+        drain: 队列清空后退出
+        stop_event: 停止信号（multiprocessing Event，可选），设置后各子进程完成执行中的任务后退出
+
+    Returns:
+        aggregate_metrics() 汇总的统计数据
+    """
+    ctx = multiprocessing.get_context("spawn")
+    stop_event = stop_event or ctx.Event()
+    results = ctx.Queue()
+    prefix = worker_id or f"worker-{uuid.uuid4().hex[:8]}"
+    worker_ids = [f"{prefix}-{index}" for index in range(processes)]
+
+    if worker_id:
+        with DurableQueue(db, visibility_timeout=visibility_timeout) as queue:
+            released = sum(queue.release_leases(wid) for wid in worker_ids)
+        if released:
+            print(f"🔄 收回 {released} 个未完成的租约")
+
+    children = [
+        ctx.Process(
+            target=_process_main,
+            args=(str(db), wid, concurrency, poll_interval, visibility_timeout, drain, stop_event, results),
+            name=wid
+        )
+        for wid in worker_ids
+    ]
+    for child in children:
+        child.start()
+
+    metrics = []
+    while len(metrics) < len(children):
+        try:
+            metrics.append(results.get(timeout=poll_interval))
+        except Empty:
+            # 子进程异常退出时不再等待它的统计数据
+            if not any(child.is_alive() for child in children) and results.empty():
+                break
+    for child in children:
+        child.join()
+    return aggregate_metrics(metrics)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="从持久化队列领取并执行浏览器自动化任务")
+    parser.add_argument("--db", default=str(DEFAULT_QUEUE_PATH), help="队列数据库路径")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时执行的任务数")
+    parser.add_argument("--worker-id", help="工作进程标识；重启时使用相同标识可立即收回之前的租约")
+    parser.add_argument("--visibility-timeout", type=float, default=900.0, help="租约时长（秒）")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="队列为空时的轮询间隔（秒）")
+    parser.add_argument("--drain", action="store_true", help="队列清空后退出")
+    parser.add_argument("--processes", type=int, default=1, help="子进程数，大于 1 时启用多进程模式")
+    args = parser.parse_args(argv)
+
+    if args.processes > 1:
+        stop_event = multiprocessing.get_context("spawn").Event()
+        # SIGTERM/SIGINT：停止领取新任务，等待执行中的任务完成
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop_event.set())
+        print(f"🚀 启动 {args.processes} 个工作进程，每个并发 {args.concurrency}")
+        summary = run_processes(
+            args.db,
+            args.processes,
+            concurrency=args.concurrency,
+            worker_id=args.worker_id,
+            poll_interval=args.poll_interval,
+            visibility_timeout=args.visibility_timeout,
+            drain=args.drain,
+            stop_event=stop_event
+        )
+        print(f"✅ 已处理 {summary['processed']} 个任务（成功 {summary['succeeded']}，失败 {summary['failed']}）")
+        for metrics in summary["per_process"]:
+            print(f"   {metrics['worker_id']}: {metrics['processed']} 个任务，执行耗时 {metrics['busy_seconds']}s")
+        task_latency = summary["latency"].get("task")
+        if task_latency:
+            print(f"   任务耗时 p50 {task_latency['p50']}s，p95 {task_latency['p95']}s，p99 {task_latency['p99']}s")
+        return
+
+    with DurableQueue(args.db, visibility_timeout=args.visibility_timeout) as queue:
+        worker = Worker(queue, concurrency=args.concurrency, worker_id=args.worker_id, poll_interval=args.poll_interval)
+        if args.worker_id:
+            released = queue.release_leases(args.worker_id)
+            if released:
+                print(f"🔄 收回 {released} 个未完成的租约")
+
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        print(f"🚀 工作进程 {worker.worker_id} 启动，并发 {worker.concurrency}")
+        try:
+            worker.run(drain=args.drain)
+        except KeyboardInterrupt:
+            # 执行中的任务已完成并确认，未领取的任务留在队列中
+            print("⏹️  已中断")
+        print(f"✅ 已处理 {worker.processed} 个任务，队列状态: {queue.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,8 @@ import os
 import sys
 from pathlib import Path
 
-sys.path.insert(0, str(Path(__file__).parent / "src"))
-from main import execute_browser_task, download_bundle
+sys.path.insert(0, str(Path(__file__).parent))
+from src.main import execute_browser_task, download_bundle
 
 os.environ['BROWSER_API_URL'] = 'http://192.168.1.218:52100'
 
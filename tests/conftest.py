@@ -0,0 +1,33 @@
+"""
+测试公共夹具
+"""
+
+import pytest
+
+from tests.fake_backend import FakeBackend
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path_factory, monkeypatch):
+    """将本地状态目录指向临时目录，测试之间不共享会话与后端的对应关系等状态"""
+    state = tmp_path_factory.mktemp("state")
+    monkeypatch.setattr("src.main.DATA_STATE", state)
+    return state
+
+
+@pytest.fixture
+def outputs(tmp_path, monkeypatch):
+    """将输出目录指向临时目录"""
+    outputs = tmp_path / "outputs"
+    outputs.mkdir()
+    monkeypatch.setattr("src.main.DATA_OUTPUTS", outputs)
+    return outputs
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """启动本地后端替身，并将 BROWSER_API_URL 指向它"""
+    backend = FakeBackend().start()
+    monkeypatch.setenv("BROWSER_API_URL", backend.url)
+    yield backend
+    backend.stop()
@@ -0,0 +1,335 @@
+"""
+本地后端替身
+
+json_response() 构造模拟的 requests 响应，供 patch requests.post/get 的测试使用。
+
+FakeBackend 在本机端口（或 Unix 域套接字）上实现浏览器自动化后端的接口子集，供需要真实 HTTP 往返的测试使用：
+- POST /agent/task：按配置的延迟和结果返回，延迟期间可被取消；执行中的任务达到
+  capacity 时返回 429
+- POST /agent/task/{task_id}/cancel：取消执行中的任务
+- GET /downloads/{file_id}、GET /downloads/bundle/{session_id}：返回预置的文件内容
+- POST /sessions、DELETE /sessions/{session_id}：创建和关闭浏览器会话
+- POST /sessions/{session_id}/reset：清除会话的浏览器状态
+- GET /health：返回健康状态和空闲槽位数（healthy 为 False 时返回 503）
+- POST /agent/plan：在一个会话中依次执行各步骤，每完成一步输出一行 NDJSON 结果
+"""
+
+import json
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import Mock
+
+
+def json_response(payload: Dict[str, Any], status_code: int = 200) -> Mock:
+    """构造模拟的 requests 响应，同时支持 json() 和流式读取 iter_content()"""
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    response.iter_content.return_value = [json.dumps(payload, ensure_ascii=False).encode("utf-8")]
+    return response
+
+
+class FakeBackend:
+    """
+    浏览器自动化后端替身
+
+    Attributes:
+        task_delay: /agent/task 的处理耗时（秒）
+        task_result: /agent/task 的返回结果，或接收请求体并返回结果的函数
+        files: file_id -> 文件内容
+        bundles: session_id -> ZIP 内容
+        requests: 收到的任务请求体列表
+        idempotency_keys: 任务请求的 Idempotency-Key 请求头列表
+        cancelled: 收到取消请求的任务ID列表
+        sessions: 当前打开的会话ID
+        closed_sessions: 已关闭的会话ID列表
+        reset_sessions: 收到重置请求的会话ID列表
+        connections: 每个客户端连接的地址（用于统计连接复用）
+        capacity: 同时执行的任务上限（None 表示不限），超出时返回 429
+        retry_after: 429 响应的 Retry-After 值（秒，None 表示不返回该响应头）
+        rejected: 被 429 拒绝的任务请求数
+        max_running: 同时执行的任务数的峰值
+        healthy: /health 是否报告健康
+        health_checks: 收到的 /health 请求数
+        bundle_queries: 文件包下载请求的查询参数列表
+        downloads: 收到下载请求的 file_id 列表
+        plans: 收到的 /agent/plan 请求体列表
+        plans_supported: 是否提供 /agent/plan（False 时返回 404）
+        events: 步骤结果输出和文件下载的先后顺序（"step 0"、"download f1"）
+    """
+
+    def __init__(self):
+        self.task_delay = 0.0
+        self.task_result: Dict[str, Any] | Callable[[Dict[str, Any]], Dict[str, Any]] = {
+            "status": "success",
+            "response": "任务执行成功",
+            "session_id": "fake-session"
+        }
+        self.files: Dict[str, bytes] = {}
+        self.bundles: Dict[str, bytes] = {}
+        self.requests: List[Dict[str, Any]] = []
+        self.idempotency_keys: List[Optional[str]] = []
+        self.cancelled: List[str] = []
+        self.sessions: set[str] = set()
+        self.closed_sessions: List[str] = []
+        self.reset_sessions: List[str] = []
+        self.connections: List[Any] = []
+        self.capacity: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.rejected = 0
+        self.max_running = 0
+        self.healthy = True
+        self.health_checks = 0
+        self.bundle_queries: List[str] = []
+        self.downloads: List[str] = []
+        self.plans: List[Dict[str, Any]] = []
+        self.plans_supported = True
+        self.events: List[str] = []
+        self._running: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        if isinstance(self._server.server_address, str):
+            return f"unix://{self._server.server_address}"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, unix_socket: Optional[str] = None) -> "FakeBackend":
+        """启动后端，指定 unix_socket 时监听该 Unix 域套接字，否则监听本机随机端口"""
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # 保持连接，客户端可以复用
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with backend._lock:
+                    backend.connections.append(self.client_address)
+
+            def do_POST(self):
+                backend._handle_post(self)
+
+            def do_GET(self):
+                backend._handle_get(self)
+
+            def do_DELETE(self):
+                backend._handle_delete(self)
+
+        if unix_socket:
+            self._server = socketserver.ThreadingUnixStreamServer(unix_socket, Handler)
+        else:
+            self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        with self._lock:
+            for event in self._running.values():
+                event.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def wait_cancelled(self, task_id: str, timeout: float = 5.0) -> bool:
+        """等待后端收到某个任务的取消请求"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if task_id in self.cancelled:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _handle_post(self, handler: BaseHTTPRequestHandler) -> None:
+        path = handler.path
+        if path == "/agent/task":
+            length = int(handler.headers.get("Content-Length", 0))
+            body = json.loads(handler.rfile.read(length) or b"{}")
+            with self._lock:
+                self.idempotency_keys.append(handler.headers.get("Idempotency-Key"))
+            self._run_task(handler, body)
+        elif path == "/agent/plan" and self.plans_supported:
+            length = int(handler.headers.get("Content-Length", 0))
+            self._run_plan(handler, json.loads(handler.rfile.read(length) or b"{}"))
+        elif path == "/sessions":
+            session_id = f"warm-{uuid.uuid4().hex[:8]}"
+            with self._lock:
+                self.sessions.add(session_id)
+            self._send_json(handler, 200, {"session_id": session_id})
+        elif path.startswith("/sessions/") and path.endswith("/reset"):
+            session_id = path[len("/sessions/"):-len("/reset")]
+            with self._lock:
+                found = session_id in self.sessions
+                if found:
+                    self.reset_sessions.append(session_id)
+            if found:
+                self._send_json(handler, 200, {"status": "reset", "session_id": session_id})
+            else:
+                self._send_json(handler, 404, {"status": "error", "error": "会话不存在"})
+        elif path.startswith("/agent/task/") and path.endswith("/cancel"):
+            task_id = path[len("/agent/task/"):-len("/cancel")]
+            with self._lock:
+                self.cancelled.append(task_id)
+                event = self._running.get(task_id)
+            if event is None:
+                self._send_json(handler, 404, {"status": "error", "error": "任务不存在"})
+            else:
+                event.set()
+                self._send_json(handler, 200, {"status": "cancelled", "task_id": task_id})
+        else:
+            self._send_json(handler, 404, {"status": "error", "error": "接口不存在"})
+
+    def _run_task(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any]) -> None:
+        task_id = body.get("task_id", "")
+        cancelled = threading.Event()
+        with self._lock:
+            if self.capacity is not None and len(self._running) >= self.capacity:
+                self.rejected += 1
+                busy = True
+            else:
+                busy = False
+                self.requests.append(body)
+                self._running[task_id] = cancelled
+                self.max_running = max(self.max_running, len(self._running))
+        if busy:
+            headers = {"Retry-After": f"{self.retry_after:g}"} if self.retry_after is not None else {}
+            self._send_json(handler, 429, {"status": "error", "error": "浏览器槽位已满"}, headers)
+            return
+
+        try:
+            if cancelled.wait(timeout=self.task_delay):
+                result = {"status": "error", "error": {"code": "CANCELLED", "message": "任务已取消"}}
+            elif callable(self.task_result):
+                result = self.task_result(body)
+            else:
+                result = self.task_result
+            if body.get("session_id") and result.get("status") == "success":
+                # 在已有会话中执行的任务返回该会话
+                result = {**result, "session_id": body["session_id"]}
+            if result.get("session_id"):
+                with self._lock:
+                    self.sessions.add(result["session_id"])
+        finally:
+            with self._lock:
+                self._running.pop(task_id, None)
+
+        try:
+            self._send_json(handler, 200, result)
+        except OSError:
+            # 客户端已断开
+            pass
+
+    def _run_plan(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any]) -> None:
+        task_id = body.get("task_id", "")
+        cancelled = threading.Event()
+        with self._lock:
+            self.plans.append(body)
+            self._running[task_id] = cancelled
+
+        # 逐行输出，每行一个 HTTP 分块
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        session_id = body.get("session_id")
+        try:
+            for index, step in enumerate(body.get("steps", [])):
+                if cancelled.wait(timeout=self.task_delay):
+                    break
+                result = self.task_result(step) if callable(self.task_result) else self.task_result
+                session_id = session_id or result.get("session_id") or f"plan-{uuid.uuid4().hex[:8]}"
+                line = json.dumps({**result, "step": index, "session_id": session_id}, ensure_ascii=False)
+                self._write_chunk(handler, line.encode("utf-8") + b"\n")
+                with self._lock:
+                    self.events.append(f"step {index}")
+                if result.get("status") != "success":
+                    break
+            self._write_chunk(handler, b"")
+        except OSError:
+            # 客户端已断开
+            pass
+        finally:
+            with self._lock:
+                self._running.pop(task_id, None)
+
+    def _handle_delete(self, handler: BaseHTTPRequestHandler) -> None:
+        session_id = handler.path[len("/sessions/"):]
+        with self._lock:
+            found = handler.path.startswith("/sessions/") and session_id in self.sessions
+            if found:
+                self.sessions.discard(session_id)
+                self.closed_sessions.append(session_id)
+        if found:
+            self._send_json(handler, 200, {"status": "closed", "session_id": session_id})
+        else:
+            self._send_json(handler, 404, {"status": "error", "error": "会话不存在"})
+
+    def _handle_get(self, handler: BaseHTTPRequestHandler) -> None:
+        path = handler.path
+        if path == "/health":
+            self._handle_health(handler)
+            return
+        if path.startswith("/downloads/bundle/"):
+            path, _, query = path.partition("?")
+            self.bundle_queries.append(query)
+            content = self.bundles.get(path[len("/downloads/bundle/"):])
+        elif path.startswith("/downloads/"):
+            with self._lock:
+                self.downloads.append(path[len("/downloads/"):])
+                self.events.append(f"download {path[len('/downloads/'):]}")
+            content = self.files.get(path[len("/downloads/"):])
+        else:
+            content = None
+
+        if content is None:
+            self._send_json(handler, 404, {"status": "error", "error": "文件不存在"})
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/octet-stream")
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def _handle_health(self, handler: BaseHTTPRequestHandler) -> None:
+        with self._lock:
+            self.health_checks += 1
+            running = len(self._running)
+        if not self.healthy:
+            self._send_json(handler, 503, {"status": "unavailable"})
+            return
+        payload: Dict[str, Any] = {"status": "ok", "running": running}
+        if self.capacity is not None:
+            payload["total_slots"] = self.capacity
+            payload["free_slots"] = max(0, self.capacity - running)
+        self._send_json(handler, 200, payload)
+
+    @staticmethod
+    def _write_chunk(handler: BaseHTTPRequestHandler, data: bytes) -> None:
+        handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        handler.wfile.flush()
+
+    @staticmethod
+    def _send_json(
+        handler: BaseHTTPRequestHandler,
+        status: int,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
@@ -0,0 +1,63 @@
+"""
+测试任务取消
+"""
+
+import asyncio
+import threading
+import time
+
+from src.aio import execute_browser_task_async
+from src.main import cancel_browser_task, execute_browser_task
+
+
+class TestCancellation:
+    """测试客户端取消与后端联动"""
+
+    def test_timeout_cancels_backend_task(self, fake_backend):
+        """测试客户端超时后自动通知后端取消"""
+        fake_backend.task_delay = 5
+
+        result = execute_browser_task(
+            urls="https://example.com", query="提取标题", timeout=0.3, task_id="t-timeout"
+        )
+
+        assert result == {"success": False, "error": "任务超时"}
+        assert fake_backend.wait_cancelled("t-timeout")
+
+    def test_explicit_cancel(self, fake_backend):
+        """测试在其他线程中显式取消执行中的任务"""
+        fake_backend.task_delay = 5
+        results = []
+        worker = threading.Thread(
+            target=lambda: results.append(
+                execute_browser_task(urls="https://example.com", query="下载报表", task_id="t-explicit")
+            )
+        )
+        worker.start()
+        while not fake_backend.requests:
+            time.sleep(0.01)
+
+        assert cancel_browser_task("t-explicit")["success"] is True
+        worker.join(timeout=5)
+        assert results[0] == {"success": False, "error": "任务已取消"}
+
+    def test_cancel_unknown_task(self, fake_backend):
+        """测试取消不存在的任务"""
+        assert cancel_browser_task("missing") == {"success": False, "error": "未找到该任务"}
+
+    def test_asyncio_cancellation(self, fake_backend):
+        """测试协程被取消时通知后端"""
+        fake_backend.task_delay = 5
+
+        async def run():
+            try:
+                await asyncio.wait_for(
+                    execute_browser_task_async("https://example.com", "提取标题", task_id="t-async"),
+                    timeout=0.3
+                )
+            except asyncio.TimeoutError:
+                return True
+            return False
+
+        assert asyncio.run(run()) is True
+        assert fake_backend.wait_cancelled("t-async")
@@ -0,0 +1,215 @@
+"""
+测试持久化任务队列与工作进程
+"""
+
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src.durable_queue import DurableQueue
+from src.worker import Worker, aggregate_metrics, main, run_processes
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestDurableQueue:
+    """测试队列的入队、领取与确认"""
+
+    def test_idempotent_enqueue(self, tmp_path):
+        """测试相同幂等键只入队一次"""
+        with DurableQueue(tmp_path / "queue.db") as queue:
+            first = queue.enqueue({"urls": "https://a.com", "query": "q"}, idempotency_key="k1")
+            second = queue.enqueue({"urls": "https://a.com", "query": "q"}, idempotency_key="k1")
+            assert first == second
+            assert queue.stats()["queued"] == 1
+
+    def test_lease_and_ack(self, tmp_path):
+        """测试领取后确认结果"""
+        with DurableQueue(tmp_path / "queue.db") as queue:
+            task_id = queue.enqueue({"query": "q"})
+            assert queue.lease("w1") == [(task_id, {"query": "q"})]
+            assert queue.lease("w2") == []
+            assert queue.ack(task_id, {"success": True}, owner="w1")
+
+            task = queue.get(task_id)
+            assert task["status"] == "done"
+            assert task["result"] == {"success": True}
+
+    def test_expired_lease_released(self, tmp_path):
+        """测试租约到期后任务可被重新领取，原持有者无法再确认"""
+        with DurableQueue(tmp_path / "queue.db", visibility_timeout=0.05) as queue:
+            task_id = queue.enqueue({"query": "q"})
+            queue.lease("w1")
+            time.sleep(0.1)
+            assert [tid for tid, _ in queue.lease("w2")] == [task_id]
+            assert not queue.ack(task_id, {"success": True}, owner="w1")
+            assert queue.get(task_id)["attempts"] == 2
+
+    def test_fail_until_max_attempts(self, tmp_path):
+        """测试执行异常时重新排队，达到最大尝试次数后标记失败"""
+        with DurableQueue(tmp_path / "queue.db", max_attempts=2) as queue:
+            task_id = queue.enqueue({"query": "q"})
+            for _ in range(2):
+                queue.lease("w1")
+                queue.fail(task_id, "连接失败", owner="w1")
+
+            task = queue.get(task_id)
+            assert task["status"] == "failed"
+            assert task["result"] == {"success": False, "error": "连接失败"}
+            assert queue.lease("w1") == []
+
+    def test_survives_restart(self, tmp_path):
+        """测试进程重启后队列内容仍在，并可收回之前的租约"""
+        path = tmp_path / "queue.db"
+        with DurableQueue(path) as queue:
+            queue.enqueue({"query": "a"}, idempotency_key="a")
+            queue.enqueue({"query": "b"})
+            queue.lease("w1", limit=2)
+
+        with DurableQueue(path) as queue:
+            assert queue.stats()["leased"] == 2
+            assert queue.release_leases("w1") == 2
+            assert len(queue.lease("w2", limit=5)) == 2
+            assert queue.get_by_key("a")["payload"] == {"query": "a"}
+
+
+class TestWorker:
+    """测试工作进程"""
+
+    def test_drain(self, tmp_path):
+        """测试并发执行队列中的全部任务后退出"""
+        def task_fn(urls, query):
+            if query == "boom":
+                raise RuntimeError("浏览器崩溃")
+            return {"success": True, "message": query}
+
+        with DurableQueue(tmp_path / "queue.db", max_attempts=1) as queue:
+            ids = [queue.enqueue({"urls": "https://a.com", "query": f"q{i}"}) for i in range(5)]
+            bad = queue.enqueue({"urls": "https://a.com", "query": "boom"})
+
+            worker = Worker(queue, concurrency=3, poll_interval=0.01, task_fn=task_fn)
+            assert worker.run(drain=True) == 6
+
+            assert [queue.get(tid)["result"]["message"] for tid in ids] == [f"q{i}" for i in range(5)]
+            assert queue.get(bad)["status"] == "failed"
+            assert queue.stats() == {"queued": 0, "leased": 0, "done": 5, "failed": 1}
+
+            metrics = worker.metrics()
+            assert (metrics["processed"], metrics["succeeded"], metrics["failed"]) == (6, 5, 1)
+
+    def test_retriable_failure_requeued(self, tmp_path):
+        """测试超时等可重试的失败结果重新排队，其他失败结果确认完成"""
+        outcomes = {"q": [{"success": False, "error": "任务超时"}, {"success": True, "message": "ok"}]}
+
+        def task_fn(urls, query):
+            if query == "bad-url":
+                return {"success": False, "error": "URL 格式不正确"}
+            if query == "busy":
+                return {"success": False, "error": "后端繁忙，请稍后重试"}
+            return outcomes[query].pop(0)
+
+        with DurableQueue(tmp_path / "queue.db", max_attempts=2) as queue:
+            retried = queue.enqueue({"urls": "https://a.com", "query": "q"})
+            invalid = queue.enqueue({"urls": "https://a.com", "query": "bad-url"})
+            busy = queue.enqueue({"urls": "https://a.com", "query": "busy"})
+            Worker(queue, concurrency=1, poll_interval=0.01, task_fn=task_fn).run(drain=True)
+
+            assert queue.get(retried)["status"] == "done"
+            assert queue.get(retried)["attempts"] == 2
+            assert queue.get(invalid)["status"] == "done"
+            assert queue.get(invalid)["attempts"] == 1
+            assert queue.get(busy)["status"] == "failed"
+            assert queue.get(busy)["result"] == {"success": False, "error": "后端繁忙，请稍后重试"}
+
+    def test_queue_key_passed_to_task(self, tmp_path):
+        """测试队列的幂等键作为 idempotency_key 传给任务，payload 中已指定时不覆盖"""
+        calls = []
+
+        def task_fn(urls, query, idempotency_key=None):
+            calls.append((query, idempotency_key))
+            return {"success": True}
+
+        with DurableQueue(tmp_path / "queue.db") as queue:
+            queue.enqueue({"urls": "https://a.com", "query": "keyed"}, idempotency_key="daily-001")
+            queue.enqueue({"urls": "https://a.com", "query": "own", "idempotency_key": "own-key"}, idempotency_key="k2")
+            queue.enqueue({"urls": "https://a.com", "query": "plain"})
+            Worker(queue, concurrency=1, poll_interval=0.01, task_fn=task_fn).run(drain=True)
+
+        assert calls == [("keyed", "daily-001"), ("own", "own-key"), ("plain", None)]
+
+    def test_aggregate_metrics(self):
+        """测试汇总各进程统计"""
+        summary = aggregate_metrics([
+            {"worker_id": "w-1", "processed": 3, "succeeded": 2, "failed": 1, "busy_seconds": 1.5},
+            {"worker_id": "w-0", "processed": 4, "succeeded": 4, "failed": 0, "busy_seconds": 2.0},
+        ])
+        assert summary["processed"] == 7
+        assert summary["failed"] == 1
+        assert summary["busy_seconds"] == 3.5
+        assert [m["worker_id"] for m in summary["per_process"]] == ["w-0", "w-1"]
+
+    def test_cli_executes_tasks(self, fake_backend, tmp_path):
+        """测试命令行入口调用后端执行任务并保存结果"""
+        path = tmp_path / "queue.db"
+        with DurableQueue(path) as queue:
+            task_id = queue.enqueue({"urls": "https://example.com", "query": "提取标题"})
+
+        main(["--db", str(path), "--drain", "--worker-id", "w1", "--poll-interval", "0.01"])
+
+        with DurableQueue(path) as queue:
+            assert queue.get(task_id)["result"]["success"] is True
+        assert len(fake_backend.requests) == 1
+
+
+class TestMultiProcessWorker:
+    """测试多进程工作模式"""
+
+    def test_processes_drain(self, fake_backend, tmp_path):
+        """测试多个子进程共同清空队列，并汇总各进程统计"""
+        path = tmp_path / "queue.db"
+        with DurableQueue(path) as queue:
+            ids = [queue.enqueue({"urls": f"https://example.com/{i}", "query": "提取标题"}) for i in range(6)]
+
+        summary = run_processes(path, processes=2, concurrency=2, poll_interval=0.05, drain=True)
+
+        assert summary["processes"] == 2
+        assert summary["processed"] == summary["succeeded"] == 6
+        assert len(summary["per_process"]) == 2
+        with DurableQueue(path) as queue:
+            assert all(queue.get(tid)["status"] == "done" for tid in ids)
+
+    def test_sigterm_drains_in_flight(self, fake_backend, tmp_path):
+        """测试 SIGTERM 后完成执行中的任务再退出，未领取的任务留在队列中"""
+        fake_backend.task_delay = 1.0
+        path = tmp_path / "queue.db"
+        with DurableQueue(path) as queue:
+            for i in range(10):
+                queue.enqueue({"urls": f"https://example.com/{i}", "query": "提取标题"})
+
+        process = subprocess.Popen(
+            [sys.executable, "-m", "src.worker", "--db", str(path), "--processes", "2",
+             "--concurrency", "1", "--poll-interval", "0.05"],
+            cwd=Path(__file__).parent.parent,
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        try:
+            assert _wait_for(lambda: len(fake_backend.requests) >= 2, timeout=20)
+            process.send_signal(signal.SIGTERM)
+            output, _ = process.communicate(timeout=20)
+        finally:
+            process.kill()
+
+        assert process.returncode == 0
+        assert "已处理 2 个任务" in output
+        with DurableQueue(path) as queue:
+            assert queue.stats() == {"queued": 8, "leased": 0, "done": 2, "failed": 0}
@@ -0,0 +1,196 @@
+"""
+测试结果文件的筛选与延迟下载
+"""
+
+import base64
+import io
+import json
+import threading
+import time
+import zipfile
+from urllib.parse import parse_qs
+
+import pytest
+
+from src.files import FileDownloadError, FileFilter
+from src.main import download_bundle, execute_browser_task
+from src.sessions import SessionPool, install_session_pool
+
+
+def _zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        for name, content in entries.items():
+            bundle.writestr(name, content)
+    return buffer.getvalue()
+
+
+class TestFileFilter:
+    """测试筛选条件"""
+
+    def test_reject_reason(self):
+        """测试 MIME 通配、文件名通配（不区分大小写）和大小上限"""
+        file_filter = FileFilter(file_types=["application/pdf", "image/*"], file_pattern="report*", max_file_size=100)
+        assert file_filter.reject_reason("Report.PDF", None, 10) is None
+        assert file_filter.reject_reason("report.png", "image/png", None) is None
+        assert file_filter.reject_reason("report.csv", "text/csv", 10) == "类型不匹配"
+        assert file_filter.reject_reason("summary.pdf", None, 10) == "文件名不匹配"
+        assert file_filter.reject_reason("report.pdf", None, 101) == "超过大小上限"
+
+    def test_from_options(self):
+        """测试未指定条件时不筛选，参数格式错误时报错"""
+        assert FileFilter.from_options() is None
+        assert FileFilter.from_options("application/pdf, image/*").file_types == ["application/pdf", "image/*"]
+        with pytest.raises(ValueError):
+            FileFilter.from_options(max_file_size=-1)
+
+
+class TestTaskFiles:
+    """测试任务结果中的文件筛选"""
+
+    def test_filtered_reference_not_downloaded(self, fake_backend, outputs):
+        """测试未通过筛选的文件引用不下载，只返回元数据，筛选条件发给后端"""
+        fake_backend.files["f1"] = b"\x89PNG" * 100
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "已截图",
+            "session_id": "fake-session",
+            "result": {"type": "file_reference", "file_id": "f1", "filename": "shot.png", "mime_type": "image/png"}
+        }
+        result = execute_browser_task(urls="https://example.com", query="截图", file_types=["application/pdf"])
+
+        assert result["success"] is True
+        assert "files" not in result
+        assert result["skipped_files"] == [{
+            "filename": "shot.png", "mime_type": "image/png", "size_bytes": None, "reason": "类型不匹配", "file_id": "f1"
+        }]
+        assert not list(outputs.iterdir())
+        assert fake_backend.requests[0]["file_filter"] == {"mime_types": ["application/pdf"]}
+
+    def test_oversized_download_aborted(self, fake_backend, outputs):
+        """测试后端未给出大小时，按响应长度中止超过上限的下载"""
+        fake_backend.files["f1"] = b"%PDF" * 1000
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "完成",
+            "result": {"type": "file_reference", "file_id": "f1", "filename": "a.pdf"}
+        }
+        result = execute_browser_task(urls="https://example.com", query="下载", max_file_size=1000)
+        assert result["skipped_files"][0]["reason"] == "超过大小上限"
+        assert result["skipped_files"][0]["size_bytes"] == 4000
+        assert not list(outputs.iterdir())
+
+        result = execute_browser_task(urls="https://example.com", query="下载", max_file_size=4000)
+        assert result["files"] == ["a.pdf"]
+
+    def test_inline_file_discarded(self, fake_backend, outputs):
+        """测试未通过筛选的内联文件不写入输出目录，暂存文件被清理"""
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "完成",
+            "result": {
+                "type": "file_inline",
+                "filename": "notes.txt",
+                "mime_type": "text/plain",
+                "content": base64.b64encode(b"hello").decode()
+            }
+        }
+        result = execute_browser_task(urls="https://example.com", query="下载", file_pattern="*.pdf")
+        assert result["skipped_files"][0]["size_bytes"] == 5
+        assert result["skipped_files"][0]["reason"] == "文件名不匹配"
+        assert not list(outputs.glob("notes.txt"))
+
+
+class TestBundleFiles:
+    """测试文件包的筛选"""
+
+    def test_bundle_entries_filtered(self, fake_backend, outputs):
+        """测试后端未筛选时剔除文件包中不符合条件的条目"""
+        fake_backend.bundles["fake-session"] = _zip({"a.pdf": b"%PDF", "b.png": b"\x89PNG", "big.pdf": b"x" * 500})
+        result = download_bundle("fake-session", file_types=["application/pdf"], max_file_size=100)
+
+        assert result["files"] == ["bundle_fake-ses.zip"]
+        assert {f["filename"]: f["reason"] for f in result["skipped_files"]} == {
+            "b.png": "类型不匹配", "big.pdf": "超过大小上限"
+        }
+        with zipfile.ZipFile(outputs / "bundle_fake-ses.zip") as bundle:
+            assert bundle.namelist() == ["a.pdf"]
+            assert bundle.read("a.pdf") == b"%PDF"
+        assert parse_qs(fake_backend.bundle_queries[0]) == {"mime_types": ["application/pdf"], "max_size": ["100"]}
+
+    def test_nothing_matches(self, fake_backend, outputs):
+        """测试没有符合条件的文件时不保留文件包"""
+        fake_backend.bundles["fake-session"] = _zip({"b.png": b"\x89PNG"})
+        result = download_bundle("fake-session", file_pattern="*.pdf")
+        assert result["success"] is True
+        assert result["files"] == []
+        assert not list(outputs.iterdir())
+
+
+class TestLazyFiles:
+    """测试延迟下载的文件句柄"""
+
+    @pytest.fixture
+    def file_task(self, fake_backend, outputs):
+        fake_backend.files["f1"] = b"%PDF-1.7"
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "完成",
+            "session_id": "fake-session",
+            "result": {"type": "file_reference", "file_id": "f1", "filename": "a.pdf", "size_bytes": 8}
+        }
+        return fake_backend
+
+    def test_download_on_first_access(self, file_task, outputs):
+        """测试任务返回时不下载，首次读取时下载一次"""
+        result = execute_browser_task(urls="https://example.com", query="下载", lazy_files=True)
+        handle = result["file_handles"][0]
+        assert result["files"] == ["a.pdf"]
+        assert handle == {"filename": "a.pdf", "file_id": "f1", "mime_type": "application/pdf", "size_bytes": 8}
+        assert not file_task.downloads
+        assert not handle.downloaded
+
+        threads = [threading.Thread(target=handle.read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert file_task.downloads == ["f1"]
+        with handle.open() as f:
+            assert f.read() == b"%PDF-1.7"
+        assert handle.path == outputs / "a.pdf"
+
+    def test_prefetch(self, file_task, outputs):
+        """测试后台预取"""
+        result = execute_browser_task(urls="https://example.com", query="下载", lazy_files=True, prefetch_files=True)
+        handle = result["file_handles"][0]
+        assert handle.prefetch().result(timeout=5) == outputs / "a.pdf"
+        assert handle.downloaded
+
+    def test_pooled_session_downloads_eagerly(self, file_task, outputs):
+        """测试使用热会话时不延迟下载，文件在会话归还重置之前取回"""
+        pool = SessionPool(size=1)
+        previous = install_session_pool(pool)
+        try:
+            deadline = time.monotonic() + 5
+            while pool.stats()["idle"] < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            result = execute_browser_task(urls="https://example.com", query="下载", lazy_files=True)
+        finally:
+            install_session_pool(previous)
+            pool.close()
+
+        assert pool.stats()["hits"] == 1
+        assert file_task.reset_sessions == [file_task.requests[-1]["session_id"]]
+        assert result["files"] == ["a.pdf"]
+        assert "file_handles" not in result
+        assert file_task.downloads == ["f1"]
+        assert (outputs / "a.pdf").read_bytes() == b"%PDF-1.7"
+
+    def test_expired_file(self, file_task):
+        """测试后端文件已不存在时访问抛出 FileDownloadError，结果可序列化"""
+        result = execute_browser_task(urls="https://example.com", query="下载", lazy_files=True)
+        file_task.files.clear()
+        with pytest.raises(FileDownloadError):
+            result["file_handles"][0].read()
+        assert json.loads(json.dumps(result))["file_handles"][0]["file_id"] == "f1"
@@ -0,0 +1,141 @@
+"""
+测试后端健康与容量探测
+"""
+
+import time
+
+import pytest
+
+from src import main
+from src.health import HealthProber, install_health_prober
+from src.main import close_session, execute_browser_task
+from tests.fake_backend import FakeBackend
+
+
+def _stub(results):
+    """按后端返回预置结果的探测函数"""
+    def probe(backend, timeout):
+        result = results[backend]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return probe
+
+
+class TestRanking:
+    """测试按探测结果排列后端"""
+
+    def test_rank_prefers_free_capacity(self):
+        """测试空闲多的优先，未知其次，已满再次，不健康的跳过"""
+        results = {
+            "a": {"healthy": True, "free_slots": 0, "total_slots": 4},
+            "b": {"healthy": True, "free_slots": 1, "total_slots": 4},
+            "c": {"healthy": False},
+            "d": {"healthy": True, "free_slots": 3, "total_slots": 4},
+            "e": {"healthy": True},
+        }
+        prober = HealthProber(backends=list(results), probe_fn=_stub(results))
+        prober.probe_all()
+        assert prober.rank(["a", "b", "c", "d", "e", "f"]) == ["d", "b", "e", "f", "a"]
+
+    def test_all_unhealthy_and_stale(self):
+        """测试全部不健康时按原顺序，结果过期后视为未知"""
+        results = {"a": ConnectionError("refused"), "b": {"healthy": False}}
+        prober = HealthProber(backends=["a", "b"], max_staleness=0.05, probe_fn=_stub(results))
+        prober.probe_all()
+        assert prober.rank(["a", "b"]) == ["a", "b"]
+        assert prober.stats()["backends"]["a"]["error"] == "ConnectionError"
+        assert prober.stats()["failures"] == 2
+
+        results["b"] = {"healthy": True, "free_slots": 2}
+        prober.probe("b")
+        time.sleep(0.1)
+        assert prober.status("b") is None
+
+    def test_claim_spreads_dispatch(self):
+        """测试两次探测之间分派的任务占用缓存中的空闲槽位"""
+        results = {"a": {"healthy": True, "free_slots": 2}, "b": {"healthy": True, "free_slots": 1}}
+        prober = HealthProber(backends=["a", "b"], probe_fn=_stub(results))
+        prober.probe_all()
+        chosen = []
+        for _ in range(3):
+            backend = prober.rank(["a", "b"])[0]
+            prober.claim(backend)
+            chosen.append(backend)
+        assert sorted(chosen) == ["a", "a", "b"]
+        assert prober.stats()["backends"]["b"]["free_slots"] == 0
+
+    def test_background_probing(self):
+        """测试后台线程按间隔探测"""
+        results = {"a": {"healthy": True, "free_slots": 1}}
+        prober = HealthProber(interval=0.02, backends=lambda: ["a"], probe_fn=_stub(results)).start()
+        try:
+            time.sleep(0.15)
+        finally:
+            prober.stop()
+        assert prober.stats()["probes"] >= 3
+
+
+class TestDispatch:
+    """测试任务按探测结果选择后端"""
+
+    @pytest.fixture
+    def backends(self, monkeypatch):
+        first, second = FakeBackend().start(), FakeBackend().start()
+        first.capacity = second.capacity = 4
+        first.task_result = {"status": "success", "response": "first", "session_id": "health-first"}
+        second.task_result = {"status": "success", "response": "second", "session_id": "health-second"}
+        monkeypatch.setenv("BROWSER_API_URL", f"{first.url},{second.url}")
+        prober = HealthProber(max_staleness=60)
+        previous = install_health_prober(prober)
+        yield first, second, prober
+        install_health_prober(previous)
+        first.stop()
+        second.stop()
+
+    def test_unhealthy_backend_skipped(self, backends):
+        """测试主后端不健康时新任务发往健康的后端，探测经 GET /health 完成"""
+        first, second, prober = backends
+        first.healthy = False
+        prober.probe_all()
+        assert first.health_checks == second.health_checks == 1
+
+        result = execute_browser_task(urls="https://example.com", query="提取")
+        assert result["message"] == "second"
+        assert not first.requests
+
+    def test_session_stays_pinned(self, backends):
+        """测试已有会话的任务仍发往会话所在的后端"""
+        first, second, prober = backends
+        first.healthy = False
+        prober.probe_all()
+        assert execute_browser_task(urls="https://example.com", query="登录")["session_id"] == "health-second"
+
+        first.healthy = True
+        second.capacity = 1
+        prober.probe_all()
+        assert prober.rank([first.url, second.url])[0] == first.url
+        result = execute_browser_task(urls="https://example.com", query="继续", session_id="health-second")
+        assert result["message"] == "second"
+        assert not first.requests
+
+    def test_pin_shared_across_processes(self, backends, state_dir):
+        """测试会话与后端的对应关系记录在本地状态目录，其他进程也发往同一后端，关闭后删除"""
+        first, second, prober = backends
+        first.healthy = False
+        prober.probe_all()
+        execute_browser_task(urls="https://example.com", query="登录")
+
+        # 模拟另一个进程：内存中没有该会话的记录
+        main._SESSION_BACKENDS.clear()
+        first.healthy = True
+        prober.probe_all()
+        result = execute_browser_task(urls="https://example.com", query="继续", session_id="health-second")
+        assert result["message"] == "second"
+        assert not first.requests
+
+        main._SESSION_BACKENDS.clear()
+        second.sessions.add("health-second")
+        assert close_session("health-second")["success"] is True
+        assert second.closed_sessions == ["health-second"]
+        assert not list((state_dir / "sessions").iterdir())
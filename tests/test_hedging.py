@@ -0,0 +1,109 @@
+"""
+测试对冲请求
+"""
+
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.hedging import Hedger
+from src.main import execute_browser_task
+from src.timeouts import LatencyTracker
+from tests.fake_backend import json_response
+
+
+def _slow(seconds, value):
+    def call():
+        time.sleep(seconds)
+        return value
+    return call
+
+
+class TestHedger:
+    """测试对冲执行器"""
+
+    def test_fast_primary_no_hedge(self):
+        """测试主请求在延迟内完成时不发出对冲"""
+        hedger = Hedger()
+        hedge = Mock()
+        assert hedger.run(lambda: "primary", hedge, delay=1.0) == (0, "primary")
+        hedge.assert_not_called()
+        assert hedger.stats()["hedges_fired"] == 0
+
+    def test_hedge_wins_and_loser_cancelled(self):
+        """测试对冲请求先返回时胜出，主请求收到取消"""
+        hedger = Hedger()
+        cancelled = []
+        winner, value = hedger.run(
+            _slow(0.5, "primary"), lambda: "hedge", delay=0.05, on_lose=cancelled.append
+        )
+        assert (winner, value) == (1, "hedge")
+        assert cancelled == [0]
+        assert hedger.stats()["hedges_won"] == 1
+
+    def test_loser_result_discarded(self):
+        """测试落败方随后返回的结果交给清理回调"""
+        discarded = []
+        winner, value = Hedger().run(
+            _slow(0.2, "primary"), lambda: "hedge", delay=0.05, on_discard=discarded.append
+        )
+        assert (winner, value) == (1, "hedge")
+        deadline = time.monotonic() + 5
+        while not discarded and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert discarded == ["primary"]
+
+    def test_hedge_failure_falls_back_to_primary(self):
+        """测试对冲请求失败时等待主请求"""
+        def broken():
+            raise RuntimeError("hedge failed")
+
+        assert Hedger().run(_slow(0.1, "primary"), broken, delay=0.01) == (0, "primary")
+
+    def test_primary_error_raised_without_hedge(self):
+        """测试未对冲时主请求的异常直接抛出"""
+        def broken():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            Hedger().run(broken, None, delay=None)
+
+    def test_budget_caps_hedges(self):
+        """测试对冲预算限制额外请求数"""
+        hedger = Hedger(budget_ratio=0.0, budget_burst=1)
+        hedger.run(_slow(0.05, "a"), lambda: "b", delay=0.01)
+        hedger.run(_slow(0.05, "a"), lambda: "b", delay=0.01)
+        stats = hedger.stats()
+        assert stats["hedges_fired"] == 1
+        assert stats["budget_denied"] == 1
+
+
+class TestHedgedTask:
+    """测试任务执行中的对冲"""
+
+    @patch.dict(os.environ, {'BROWSER_API_URL': 'http://node-a:52101, http://node-b:52101'})
+    @patch('src.main.requests.post')
+    def test_slow_backend_hedged(self, mock_post):
+        """测试主后端过慢时由另一个后端返回结果，后续会话请求固定到该后端"""
+        release = threading.Event()
+
+        def fake_post(url, json, timeout, **kwargs):
+            if url.startswith("http://node-a"):
+                release.wait(timeout=5)
+                return json_response({"status": "success", "response": "慢", "session_id": "sa"})
+            return json_response({"status": "success", "response": "快", "session_id": "sb"})
+
+        mock_post.side_effect = fake_post
+        tracker = LatencyTracker(min_samples=1)
+        tracker.record("example.com", "task", 0.05)
+
+        with patch('src.main._LATENCY', tracker), patch('src.hedging.default_hedger', Hedger()):
+            result = execute_browser_task(urls="https://example.com", query="提取", hedge=True)
+            release.set()
+            assert result["message"] == "快"
+
+            execute_browser_task(urls="https://example.com", query="继续", session_id="sb")
+            assert mock_post.call_args.args[0] == "http://node-b:52101/agent/task"
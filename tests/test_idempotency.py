@@ -0,0 +1,78 @@
+"""
+测试幂等键
+"""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src.main import execute_browser_task
+
+
+@pytest.fixture
+def state_dir(tmp_path):
+    with patch("src.main.DATA_STATE", tmp_path):
+        yield tmp_path
+
+
+class TestIdempotency:
+    """测试相同幂等键的任务只执行一次"""
+
+    def test_retry_returns_recorded_result(self, fake_backend, state_dir):
+        """测试重试直接返回记录的结果，并通过请求头发送幂等键"""
+        first = execute_browser_task(urls="https://example.com", query="下载报表", idempotency_key="order-1")
+        retry = execute_browser_task(urls="https://example.com", query="下载报表", idempotency_key="order-1")
+
+        assert len(fake_backend.requests) == 1
+        assert fake_backend.idempotency_keys == ["order-1"]
+        assert "replayed" not in first
+        assert retry == {**first, "replayed": True}
+
+    def test_concurrent_retry_attaches(self, fake_backend, state_dir):
+        """测试执行中的相同任务被重试时等待并共享结果"""
+        fake_backend.task_delay = 0.3
+        results = []
+
+        def call():
+            results.append(execute_browser_task(urls="https://example.com", query="q", idempotency_key="k"))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(fake_backend.requests) == 1
+        assert all(r["success"] for r in results)
+        assert sum(1 for r in results if r.get("replayed")) == 2
+
+    def test_auto_key(self, fake_backend, state_dir):
+        """测试自动推导的幂等键对等价 URL 保持一致"""
+        execute_browser_task(urls="https://example.com/?utm_source=a", query="q", idempotency_key="auto")
+        retry = execute_browser_task(urls="https://example.com", query="q", idempotency_key="auto")
+        other = execute_browser_task(urls="https://example.com", query="另一个任务", idempotency_key="auto")
+
+        assert retry["replayed"] is True
+        assert "replayed" not in other
+        assert len(fake_backend.requests) == 2
+        assert len(fake_backend.idempotency_keys[0]) == 32
+
+    def test_failure_not_recorded(self, fake_backend, state_dir):
+        """测试失败结果不记录，重试时重新执行"""
+        fake_backend.task_result = {"status": "error", "error": "页面加载失败"}
+        execute_browser_task(urls="https://example.com", query="q", idempotency_key="k")
+        execute_browser_task(urls="https://example.com", query="q", idempotency_key="k")
+        assert len(fake_backend.requests) == 2
+
+    def test_sharded_keys(self, fake_backend, state_dir):
+        """测试分片执行时每个分片使用独立的幂等键"""
+        urls = [f"https://example.com/{i}" for i in range(4)]
+        execute_browser_task(urls=urls, query="q", max_urls_per_task=2, idempotency_key="batch")
+        assert sorted(fake_backend.idempotency_keys) == ["batch-0", "batch-1"]
+
+    def test_no_key_by_default(self, fake_backend, state_dir):
+        """测试未指定幂等键时不发送请求头，重复调用各自执行"""
+        execute_browser_task(urls="https://example.com", query="q")
+        execute_browser_task(urls="https://example.com", query="q")
+        assert fake_backend.idempotency_keys == [None, None]
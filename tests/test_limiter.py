@@ -0,0 +1,123 @@
+"""
+测试后端背压与自适应并发限制
+"""
+
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+
+from src.limiter import AdaptiveLimiter, BackendOverloaded, LimiterGroup, install_limiter_group, parse_retry_after
+from src.main import execute_browser_task
+
+
+@pytest.fixture
+def limiter_group():
+    """安装限制器组，测试结束后停用"""
+    group = LimiterGroup(initial_limit=4, cooldown=0.0, default_retry_after=0.05)
+    previous = install_limiter_group(group)
+    yield group
+    install_limiter_group(previous)
+
+
+class TestRetryAfter:
+    """测试 Retry-After 解析"""
+
+    def test_parse(self):
+        """测试秒数、HTTP 日期和无效值"""
+        assert parse_retry_after("3") == 3.0
+        assert 25 <= parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+
+class TestAdaptiveLimiter:
+    """测试 AIMD 调整和排队"""
+
+    def test_additive_increase_multiplicative_decrease(self):
+        """测试完成约一个窗口的任务后上限加 1，拒绝时减半且冷却期内只减一次"""
+        limiter = AdaptiveLimiter(initial_limit=4, cooldown=60)
+        for _ in range(5):
+            limiter.acquire()
+            limiter.release(latency=0.1)
+        assert limiter.limit == 5
+
+        for _ in range(2):
+            limiter.acquire()
+            limiter.release(rejected=True, retry_after=0)
+        assert limiter.limit == 2
+        assert limiter.stats()["rejections"] == 2
+
+    def test_latency_threshold_is_congestion_signal(self):
+        """测试耗时超过阈值时减少上限，连接失败等无信号的结果不调整"""
+        limiter = AdaptiveLimiter(initial_limit=8, latency_threshold=1.0)
+        limiter.acquire()
+        limiter.release(latency=5.0)
+        assert limiter.limit == 4
+        limiter.acquire()
+        limiter.release()
+        assert limiter.limit == 4
+
+    def test_queue_and_timeout(self):
+        """测试超出上限的请求排队，等待超时抛出 BackendOverloaded"""
+        limiter = AdaptiveLimiter(initial_limit=1)
+        limiter.acquire()
+
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+        waiter.start()
+        time.sleep(0.05)
+        assert limiter.stats()["queued"] == 1
+        with pytest.raises(BackendOverloaded):
+            limiter.acquire(timeout=0.05)
+
+        limiter.release(latency=0.1)
+        assert acquired.wait(1)
+        waiter.join()
+        assert limiter.stats()["queued"] == 0
+
+    def test_retry_after_pauses_dispatch(self):
+        """测试 Retry-After 期间不放行新请求"""
+        limiter = AdaptiveLimiter(initial_limit=4)
+        limiter.acquire()
+        limiter.release(rejected=True, retry_after=0.2)
+
+        started = time.monotonic()
+        limiter.acquire()
+        assert time.monotonic() - started >= 0.15
+
+
+class TestBackpressure:
+    """测试任务请求的背压处理"""
+
+    def test_rejections_retried_under_limiter(self, fake_backend, limiter_group):
+        """测试 429 的任务在 Retry-After 后重试成功，并发上限随拒绝下降"""
+        fake_backend.capacity = 2
+        fake_backend.retry_after = 0.05
+        fake_backend.task_delay = 0.2
+
+        results = [None] * 6
+
+        def run(index):
+            results[index] = execute_browser_task(urls=f"https://example.com/{index}", query="提取")
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(result["success"] for result in results)
+        assert fake_backend.max_running <= 2
+        stats = limiter_group.stats()[fake_backend.url]
+        assert stats["rejections"] == fake_backend.rejected > 0
+        assert stats["limit"] < 4
+        assert stats["in_flight"] == 0
+
+    def test_rejection_without_limiter(self, fake_backend):
+        """测试未启用限制器时 429 直接返回后端繁忙"""
+        fake_backend.capacity = 0
+        result = execute_browser_task(urls="https://example.com", query="提取")
+        assert result == {"success": False, "error": "后端繁忙，请稍后重试"}
+        assert fake_backend.rejected == 1
@@ -2,6 +2,7 @@
 测试浏览器自动化代理预制件的核心功能
 """
 
+import json
 import os
 from pathlib import Path
 from unittest.mock import Mock, patch
@@ -60,6 +61,7 @@ class TestExecuteBrowserTask:
                 "content": "这是页面内容"
             }
         }
+        mock_response.iter_content.return_value = [json.dumps(mock_response.json.return_value).encode()]
         mock_post.return_value = mock_response
 
         result = execute_browser_task(
@@ -94,12 +96,14 @@ class TestExecuteBrowserTask:
                 "size_bytes": 1024
             }
         }
+        mock_post_response.iter_content.return_value = [json.dumps(mock_post_response.json.return_value).encode()]
         mock_post.return_value = mock_post_response
 
         # 模拟文件下载
         mock_get_response = Mock()
         mock_get_response.status_code = 200
         mock_get_response.content = b"PDF content"
+        mock_get_response.iter_content.return_value = [b"PDF content"]
         mock_get.return_value = mock_get_response
 
         # 创建临时输出目录
@@ -136,6 +140,7 @@ class TestExecuteBrowserTask:
                 "content": "已访问所有网站"
             }
         }
+        mock_response.iter_content.return_value = [json.dumps(mock_response.json.return_value).encode()]
         mock_post.return_value = mock_response
 
         result = execute_browser_task(
@@ -160,6 +165,7 @@ class TestExecuteBrowserTask:
                 "message": "任务执行失败"
             }
         }
+        mock_response.iter_content.return_value = [json.dumps(mock_response.json.return_value).encode()]
         mock_post.return_value = mock_response
 
         result = execute_browser_task(
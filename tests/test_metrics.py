@@ -0,0 +1,113 @@
+"""
+测试延迟直方图
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.main import download_bundle, execute_browser_task
+from src.metrics import LatencyHistogram, LatencyRecorder
+from src.worker import aggregate_metrics
+
+
+class TestLatencyHistogram:
+    """测试直方图的记录、分位数和合并"""
+
+    def test_percentiles_within_precision(self):
+        """测试分位数的相对误差在精度范围内"""
+        histogram = LatencyHistogram()
+        for ms in range(1, 1001):
+            histogram.record(ms / 1000)
+
+        assert histogram.count == 1000
+        for p, expected in ((50, 0.5), (95, 0.95), (99, 0.99)):
+            assert histogram.percentile(p) == pytest.approx(expected, rel=0.01)
+        assert histogram.percentile(100) == 1.0
+        assert histogram.summary()["min"] == 0.001
+
+    def test_bounded_memory(self):
+        """测试计数数组长度只取决于配置，超出范围的值计入最后一个桶"""
+        histogram = LatencyHistogram(highest=10)
+        size = len(histogram._counts)
+        histogram.record(50.0)
+        histogram.record(0.2)
+
+        assert len(histogram._counts) == size
+        assert histogram.percentile(100) == 50.0
+        assert histogram.percentile(50) == pytest.approx(0.2, rel=0.01)
+
+    def test_merge_and_reset(self):
+        """测试合并快照等价于在同一个直方图中记录，且快照可 JSON 序列化"""
+        a, b, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for i in range(100):
+            a.record(i / 10)
+            b.record(i / 100)
+            combined.record(i / 10)
+            combined.record(i / 100)
+
+        merged = LatencyHistogram.from_snapshot(json.loads(json.dumps(a.snapshot())))
+        merged.merge(b)
+        assert merged.summary() == combined.summary()
+
+        merged.reset()
+        assert merged.percentile(50) is None
+        with pytest.raises(ValueError):
+            merged.merge(LatencyHistogram(significant_figures=3))
+
+
+class TestLatencyRecorder:
+    """测试按名称记录和跨进程汇总"""
+
+    def test_reset_returns_window(self):
+        """测试 reset 返回当前窗口并开始新窗口"""
+        recorder = LatencyRecorder()
+        recorder.record("task", 2.0)
+        with recorder.timer("download"):
+            pass
+
+        window = recorder.reset()
+        assert set(window) == {"task", "download"}
+        assert recorder.percentiles() == {}
+        assert LatencyRecorder.from_snapshot(window).percentiles("task")["p99"] == 2.0
+
+    def test_aggregate_worker_metrics(self):
+        """测试多个工作进程的直方图快照合并后计算分位数"""
+        snapshots = []
+        for seconds in (1.0, 3.0):
+            recorder = LatencyRecorder()
+            recorder.record("task", seconds)
+            snapshots.append({
+                "worker_id": f"w-{seconds}", "processed": 1, "succeeded": 1, "failed": 0, "busy_seconds": seconds,
+                "latency": recorder.snapshot()
+            })
+
+        summary = aggregate_metrics(snapshots)
+        assert summary["latency"]["task"]["count"] == 2
+        assert summary["latency"]["task"]["max"] == 3.0
+        assert all("latency" not in m for m in summary["per_process"])
+
+
+class TestInstrumentation:
+    """测试任务和下载的耗时记录"""
+
+    def test_task_phases_recorded(self, fake_backend, tmp_path):
+        """测试记录端到端、后端请求、结果处理和下载耗时"""
+        fake_backend.files["f1"] = b"%PDF"
+        fake_backend.bundles["fake-session"] = b"PK"
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "完成",
+            "session_id": "fake-session",
+            "result": {"type": "file_reference", "file_id": "f1", "filename": "a.pdf"}
+        }
+        recorder = LatencyRecorder()
+        with patch("src.main.DATA_OUTPUTS", tmp_path), patch("src.metrics.default_recorder", recorder):
+            assert execute_browser_task(urls="https://example.com", query="下载")["success"]
+            assert download_bundle("fake-session")["success"]
+
+        stats = recorder.percentiles()
+        assert set(stats) == {"task", "task.backend", "task.results", "download", "bundle"}
+        assert all(entry["count"] == 1 for entry in stats.values())
+        assert stats["task"]["max"] >= stats["task.backend"]["max"]
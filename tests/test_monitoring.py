@@ -0,0 +1,92 @@
+"""
+测试监控任务的变化检测
+"""
+
+import base64
+
+import pytest
+
+from src.main import monitor_browser_task
+from src.monitoring import FingerprintStore, result_fingerprint
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    """将暂存目录指向临时目录（输出目录和状态目录由公共夹具处理）"""
+    spool = tmp_path / "spool"
+    monkeypatch.setattr("src.main.DATA_SPOOL", spool)
+    return spool
+
+
+class TestFingerprint:
+    """测试指纹计算和存储"""
+
+    def test_ignores_volatile_fields(self, tmp_path):
+        """测试文件ID等每次变化的字段不影响指纹，文件内容影响指纹"""
+        def inline(content, file_id):
+            return {"response": "完成", "result": {
+                "type": "file_inline", "filename": "a.pdf", "file_id": file_id,
+                "content": base64.b64encode(content).decode()
+            }}
+        assert result_fingerprint(inline(b"v1", "x")) == result_fingerprint(inline(b"v1", "y"))
+        assert result_fingerprint(inline(b"v1", "x")) != result_fingerprint(inline(b"v2", "x"))
+
+        store = FingerprintStore(tmp_path)
+        assert store.get("k/../1") is None
+        store.record("k/../1", "abc")
+        assert store.get("k/../1")["fingerprint"] == "abc"
+
+
+class TestMonitorTask:
+    """测试监控方式执行任务"""
+
+    def test_text_unchanged(self, fake_backend, outputs, spool):
+        """测试文本结果未变化时 changed 为 False，上次的指纹发给后端"""
+        fake_backend.task_result = {"status": "success", "response": "公告: A", "session_id": "fake-session"}
+        first = monitor_browser_task(urls="https://example.com/notices", query="提取公告")
+        assert first["changed"] is True
+        assert "previous_fingerprint" not in fake_backend.requests[0]
+
+        second = monitor_browser_task(urls="https://example.com/notices", query="提取公告")
+        assert second == {
+            "success": True, "changed": False, "fingerprint": first["fingerprint"],
+            "message": "内容未变化", "session_id": "fake-session"
+        }
+        assert fake_backend.requests[1]["previous_fingerprint"] == first["fingerprint"]
+
+        fake_backend.task_result = {"status": "success", "response": "公告: A, B", "session_id": "fake-session"}
+        third = monitor_browser_task(urls="https://example.com/notices", query="提取公告")
+        assert third["changed"] is True
+        assert third["message"] == "公告: A, B"
+
+    def test_file_unchanged_not_written(self, fake_backend, outputs, spool):
+        """测试文件内容未变化时不写入输出目录，暂存文件被删除"""
+        fake_backend.files["f1"] = b"%PDF-v1"
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "已下载",
+            "result": {"type": "file_reference", "file_id": "f1", "filename": "a.pdf"}
+        }
+        assert monitor_browser_task(urls="https://example.com", query="下载报表")["files"] == ["a.pdf"]
+        (outputs / "a.pdf").unlink()
+
+        assert monitor_browser_task(urls="https://example.com", query="下载报表")["changed"] is False
+        assert not (outputs / "a.pdf").exists()
+        assert not list(spool.iterdir())
+
+        fake_backend.files["f1"] = b"%PDF-v2"
+        result = monitor_browser_task(urls="https://example.com", query="下载报表")
+        assert result["changed"] is True
+        assert (outputs / "a.pdf").read_bytes() == b"%PDF-v2"
+
+    def test_backend_short_circuit(self, fake_backend, outputs, spool):
+        """测试后端返回 unchanged 时直接报告未变化"""
+        fake_backend.task_result = {"status": "success", "response": "公告: A", "fingerprint": "fp-1"}
+        assert monitor_browser_task(urls="https://example.com", query="提取公告")["fingerprint"] == "fp-1"
+
+        fake_backend.task_result = lambda body: (
+            {"status": "unchanged"} if body.get("previous_fingerprint") == "fp-1" else {"status": "success"}
+        )
+        result = monitor_browser_task(urls="https://example.com", query="提取公告")
+        assert result["changed"] is False
+        assert result["fingerprint"] == "fp-1"
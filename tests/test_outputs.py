@@ -0,0 +1,124 @@
+"""
+测试大文本结果与结构化记录的文件输出
+"""
+
+from unittest.mock import patch
+
+from src.main import _process_success_result, execute_browser_task
+from src.outputs import iter_records, iter_text, spill_text, text_preview, write_records
+
+
+def _text_result(content: str) -> dict:
+    return {
+        "status": "success",
+        "response": content,
+        "session_id": "test-session",
+        "result": {"type": "text", "data": {"content": content}}
+    }
+
+
+class TestSpillText:
+    """测试文本写入与分块读取"""
+
+    def test_spill_and_iter(self, tmp_path):
+        """测试写入后分块读回完整内容"""
+        text = "逾期承兑人名单\n" * 1000
+        filename, size = spill_text(text, tmp_path)
+        assert size == len(text.encode("utf-8"))
+        assert not list(tmp_path.glob(".*.part"))
+
+        chunks = list(iter_text(filename, chunk_size=100, output_dir=tmp_path))
+        assert len(chunks) > 1
+        assert "".join(chunks) == text
+
+    def test_preview(self):
+        """测试预览截断"""
+        assert text_preview("短文本", 10) == "短文本"
+        assert text_preview("abcdefgh", 3) == "abc…"
+
+
+class TestSpillLargeResults:
+    """测试成功结果中的大文本处理"""
+
+    def test_large_text_spilled(self, tmp_path):
+        """测试超过阈值的文本写入文件，message 只保留预览"""
+        content = "数据行\n" * 10000
+        with patch("src.main.DATA_OUTPUTS", tmp_path):
+            result = _process_success_result(_text_result(content), result_options={"spill_threshold": 1024})
+
+        assert result["success"] is True
+        assert len(result["message"]) < 1024
+        assert result["files"] == [result["text_file"]]
+        assert (tmp_path / result["text_file"]).read_text(encoding="utf-8") == content
+
+    def test_small_text_inline(self, tmp_path):
+        """测试未超过阈值的文本保留在 message 中"""
+        with patch("src.main.DATA_OUTPUTS", tmp_path):
+            result = _process_success_result(_text_result("标题"), result_options={"spill_threshold": 1024})
+
+        assert result["message"] == "标题"
+        assert "files" not in result
+        assert not list(tmp_path.iterdir())
+
+    def test_threshold_disabled(self, tmp_path):
+        """测试 spill_threshold 为 None 时不写入文件"""
+        content = "x" * 5000
+        with patch("src.main.DATA_OUTPUTS", tmp_path):
+            result = _process_success_result(_text_result(content), result_options={"spill_threshold": None})
+
+        assert result["message"] == content
+
+
+class TestRecords:
+    """测试结构化记录输出"""
+
+    ROWS = [
+        {"承兑人名称": "甲公司", "逾期金额": 1200.5, "笔数": 3},
+        {"承兑人名称": "乙公司", "逾期金额": 80.0, "笔数": 1, "备注": {"地区": "上海"}},
+    ]
+
+    def test_ndjson_roundtrip(self, tmp_path):
+        """测试 NDJSON 写入后逐行读回，并推断字段"""
+        info = write_records(iter(self.ROWS), tmp_path, "ndjson")
+        assert info["row_count"] == 2
+        assert info["schema"] == [
+            {"name": "承兑人名称", "type": "string"},
+            {"name": "逾期金额", "type": "number"},
+            {"name": "笔数", "type": "integer"},
+            {"name": "备注", "type": "object"},
+        ]
+        assert list(iter_records(info["file"], output_dir=tmp_path)) == self.ROWS
+
+    def test_csv_with_schema(self, tmp_path):
+        """测试按给定字段顺序写入 CSV"""
+        schema = [{"name": "笔数", "type": "integer"}, {"name": "承兑人名称", "type": "string"}]
+        info = write_records(self.ROWS, tmp_path, "csv", schema=schema)
+        assert info["file"].endswith(".csv")
+        rows = list(iter_records(tmp_path / info["file"]))
+        assert rows == [{"笔数": "3", "承兑人名称": "甲公司"}, {"笔数": "1", "承兑人名称": "乙公司"}]
+
+    def test_records_result(self, tmp_path):
+        """测试后端返回记录时写入文件并返回 records 信息"""
+        api_result = {
+            "status": "success",
+            "response": "提取了 2 行",
+            "session_id": "test-session",
+            "result": {"type": "records", "records": self.ROWS}
+        }
+        with patch("src.main.DATA_OUTPUTS", tmp_path):
+            result = _process_success_result(api_result, result_options={"output_format": "csv"})
+
+        assert result["records"]["row_count"] == 2
+        assert result["records"]["format"] == "csv"
+        assert result["files"] == [result["records"]["file"]]
+        assert (tmp_path / result["records"]["file"]).exists()
+
+    def test_requests_records_from_backend(self, fake_backend):
+        """测试指定 output_format 时请求后端返回记录"""
+        execute_browser_task(urls="https://example.com", query="提取表格", output_format="ndjson")
+        assert fake_backend.requests[-1]["result_format"] == "records"
+
+    def test_invalid_format(self):
+        """测试不支持的输出格式"""
+        result = execute_browser_task(urls="https://example.com", query="提取表格", output_format="xlsx")
+        assert result["error"] == "输出格式不正确，应为 ndjson 或 csv"
@@ -0,0 +1,118 @@
+"""
+测试多步骤任务计划
+"""
+
+import time
+
+import pytest
+
+from src.main import execute_task_plan
+
+STEPS = [
+    {"url": "https://example.com/login", "query": "登录"},
+    {"query": "下载报表0", "expected_output": "file"},
+    {"query": "下载报表1", "expected_output": "file"},
+]
+
+
+@pytest.fixture
+def plan_backend(fake_backend):
+    """按步骤描述返回文本或文件引用"""
+    def result(body):
+        query = body["query"]
+        if "失败" in query:
+            return {"status": "error", "error": {"message": "找不到报表"}}
+        if "报表" in query:
+            index = query[-1]
+            return {
+                "status": "success",
+                "response": f"已下载报表{index}",
+                "result": {"type": "file_reference", "file_id": f"f{index}", "filename": f"report{index}.pdf"}
+            }
+        return {"status": "success", "response": "已登录", "session_id": "plan-session"}
+
+    fake_backend.files.update({"f0": b"%PDF-0", "f1": b"%PDF-1"})
+    fake_backend.task_result = result
+    return fake_backend
+
+
+class TestPipelinedPlan:
+    """测试经 /agent/plan 执行"""
+
+    def test_steps_streamed_and_downloads_overlap(self, plan_backend, outputs):
+        """测试一次提交所有步骤，前面步骤的下载在后续步骤执行期间完成"""
+        plan_backend.task_delay = 0.3
+        result = execute_task_plan(STEPS)
+
+        assert result["success"] is True
+        assert result["message"] == "完成 3/3 个步骤"
+        assert result["session_id"] == "plan-session"
+        assert result["files"] == ["report0.pdf", "report1.pdf"]
+        assert [step["message"] for step in result["steps"]] == ["已登录", "已下载报表0", "已下载报表1"]
+        assert (outputs / "report1.pdf").read_bytes() == b"%PDF-1"
+
+        assert len(plan_backend.plans) == 1 and not plan_backend.requests
+        plan = plan_backend.plans[0]
+        assert "https://example.com/login" in plan["steps"][0]["query"]
+        assert plan["steps"][1] == {"query": "下载报表0", "expected_output": "file"}
+        assert plan_backend.events.index("download f0") < plan_backend.events.index("step 2")
+
+    def test_failed_step_stops_plan(self, plan_backend, outputs):
+        """测试后端在失败的步骤后停止，未执行的步骤标记为失败"""
+        result = execute_task_plan([STEPS[0], {"query": "下载失败的报表"}, STEPS[1]], session_id="plan-session")
+        assert result["success"] is False
+        assert result["error"] == "找不到报表"
+        assert [step["success"] for step in result["steps"]] == [True, False, False]
+        assert result["steps"][2]["error"] == "步骤未执行"
+        assert plan_backend.plans[0]["session_id"] == "plan-session"
+
+    def test_stall_mid_stream_cancels_plan(self, plan_backend, outputs):
+        """测试结果流中途停顿超过读取超时时，未完成的步骤标记为超时并取消后端计划"""
+        def result(body):
+            if body["query"] == "下载报表0":
+                time.sleep(1.5)
+            return {"status": "success", "response": "已登录", "session_id": "plan-session"}
+
+        plan_backend.task_result = result
+        result = execute_task_plan(STEPS, timeout=1, task_id="stalled-plan")
+
+        assert result["success"] is False
+        assert [step.get("error") for step in result["steps"]] == [None, "任务超时", "任务超时"]
+        assert plan_backend.wait_cancelled("stalled-plan")
+
+
+class TestSequentialFallback:
+    """测试后端不支持 /agent/plan 时逐步执行"""
+
+    def test_sequential_in_one_session(self, plan_backend, outputs):
+        """测试逐步调用任务接口，后续步骤使用第一步的会话"""
+        plan_backend.plans_supported = False
+        result = execute_task_plan(STEPS, task_id="plan-1")
+
+        assert result["success"] is True
+        assert result["files"] == ["report0.pdf", "report1.pdf"]
+        assert [body["task_id"] for body in plan_backend.requests] == ["plan-1-0", "plan-1-1", "plan-1-2"]
+        assert "session_id" not in plan_backend.requests[0]
+        assert all(body["session_id"] == "plan-session" for body in plan_backend.requests[1:])
+        assert plan_backend.requests[1]["query"] == "下载报表0"
+
+    def test_failure_skips_remaining(self, plan_backend, outputs):
+        """测试某一步失败后不再执行后续步骤"""
+        plan_backend.plans_supported = False
+        result = execute_task_plan([{"query": "下载失败的报表"}, STEPS[1]])
+        assert [step.get("error") for step in result["steps"]] == ["找不到报表", "前序步骤失败，未执行"]
+        assert len(plan_backend.requests) == 1
+
+
+class TestValidation:
+    """测试参数验证"""
+
+    @pytest.mark.parametrize("steps, error", [
+        ([], "步骤列表不能为空"),
+        ([{"query": "登录"}, {"url": "https://example.com"}], "第 2 步的任务描述不能为空"),
+        ([{"query": "提取", "url": ""}], "第 1 步的 URL 格式不正确"),
+        ([{"query": "提取", "expected_output": "video"}], "第 1 步的预期输出不正确，应为 text、file 或 records"),
+    ])
+    def test_invalid_steps(self, steps, error, fake_backend):
+        """测试步骤格式错误"""
+        assert execute_task_plan(steps) == {"success": False, "error": error}
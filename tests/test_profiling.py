@@ -0,0 +1,81 @@
+"""
+测试步骤耗时分析
+"""
+
+import json
+from unittest.mock import patch
+
+from src.main import execute_browser_task
+from src.profiling import ToolProfile, to_chrome_trace
+
+STEPS = [
+    {"name": "打开页面", "tool": "navigate", "start": 0.0, "duration": 2.0, "steps": [
+        {"name": "等待表格", "tool": "wait_for_selector", "start": 0.5, "duration": 1.5}
+    ]},
+    {"name": "规划下一步", "tool": "llm", "start": 2.0, "duration": 3.0},
+    {"name": "下载 PDF", "tool": "download", "start": 5.0, "duration": 1.0},
+]
+
+
+class TestChromeTrace:
+    """测试 trace-event 转换"""
+
+    def test_events(self):
+        """测试嵌套步骤展开为完整事件，时间单位为微秒"""
+        trace = to_chrome_trace(STEPS, "t1", elapsed=6.5)
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        assert [e["name"] for e in events] == ["task", "打开页面", "等待表格", "规划下一步", "下载 PDF"]
+        assert events[0]["dur"] == 6_500_000
+        assert events[2] == {
+            "name": "等待表格", "cat": "wait_for_selector", "ph": "X", "ts": 500_000, "dur": 1_500_000,
+            "pid": 1, "tid": 1, "args": {"depth": 1}
+        }
+
+
+class TestToolProfile:
+    """测试按工具汇总"""
+
+    def test_self_time_summary(self):
+        """测试父步骤只计自身耗时，汇总按总耗时降序"""
+        profile = ToolProfile()
+        profile.record(STEPS)
+        profile.record(STEPS)
+
+        summary = profile.summary()
+        assert summary["tasks"] == 2
+        assert list(summary["tools"]) == ["llm", "wait_for_selector", "download", "navigate"]
+        assert summary["tools"]["navigate"]["total_seconds"] == 1.0
+        assert summary["tools"]["llm"]["avg_seconds"] == 3.0
+        assert summary["tools"]["llm"]["share"] == 0.5
+
+        profile.reset()
+        assert profile.summary() == {"tasks": 0, "tools": {}}
+
+
+class TestProfileInTask:
+    """测试任务执行中的耗时采集"""
+
+    def test_trace_file_written(self, fake_backend, tmp_path):
+        """测试启用 profile 时请求步骤耗时并写入 trace 文件"""
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "完成",
+            "session_id": "s",
+            "debug_trace": {"steps": STEPS}
+        }
+        profile = ToolProfile()
+        with patch("src.main.DATA_OUTPUTS", tmp_path), patch("src.profiling.default_profile", profile):
+            result = execute_browser_task(urls="https://example.com", query="下载", profile=True, task_id="job-1")
+
+        assert fake_backend.requests[-1]["profile"] is True
+        assert result["trace_file"] == "trace_job-1.json"
+        trace = json.loads((tmp_path / "trace_job-1.json").read_text(encoding="utf-8"))
+        assert len(trace["traceEvents"]) == 6
+        assert profile.summary()["tasks"] == 1
+
+    def test_profile_off_by_default(self, fake_backend, tmp_path):
+        """测试默认不请求步骤耗时"""
+        with patch("src.main.DATA_OUTPUTS", tmp_path):
+            result = execute_browser_task(urls="https://example.com", query="下载")
+        assert "profile" not in fake_backend.requests[-1]
+        assert "trace_file" not in result
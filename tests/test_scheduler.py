@@ -0,0 +1,119 @@
+"""
+测试按域名限流的任务调度器
+"""
+
+import threading
+import time
+
+from src.scheduler import TaskScheduler, TokenBucket, task_domains
+
+
+class TestTokenBucket:
+    """测试令牌桶"""
+
+    def test_wait_after_burst(self):
+        """测试突发额度用完后需要等待"""
+        bucket = TokenBucket(rate=2.0, burst=1)
+        now = bucket.updated
+        assert bucket.wait_time(now) == 0
+        bucket.consume(now)
+        assert bucket.wait_time(now) == 0.5
+        assert bucket.wait_time(now + 0.5) == 0
+
+
+class TestTaskScheduler:
+    """测试调度器"""
+
+    def test_task_domains(self):
+        """测试提取并规范化任务域名"""
+        assert task_domains(["https://B.com/x", "https://a.com", "https://b.com/y"]) == ["a.com", "b.com"]
+
+    def test_per_domain_concurrency_cap(self):
+        """测试同一域名的并发上限，且不阻塞其他域名"""
+        lock = threading.Lock()
+        running = {}
+        peak = {}
+
+        def fake_task(urls, query):
+            domain = task_domains(urls)[0]
+            with lock:
+                running[domain] = running.get(domain, 0) + 1
+                peak[domain] = max(peak.get(domain, 0), running[domain])
+            time.sleep(0.02)
+            with lock:
+                running[domain] -= 1
+            return {"success": True, "message": domain}
+
+        with TaskScheduler(max_workers=6, max_per_domain=1, rate_per_domain=None, task_fn=fake_task) as scheduler:
+            futures = [scheduler.submit(f"https://slow.com/{i}", "q") for i in range(4)]
+            futures += [scheduler.submit(f"https://fast{i}.com", "q") for i in range(4)]
+            results = [f.result(timeout=5) for f in futures]
+
+        assert all(r["success"] for r in results)
+        assert peak["slow.com"] == 1
+        stats = scheduler.stats()
+        assert stats["slow.com"]["completed"] == 4
+        assert stats["slow.com"]["queued"] == 0
+        assert stats["slow.com"]["max_wait"] > stats["fast0.com"]["max_wait"]
+
+    def test_rate_limit_spaces_starts(self):
+        """测试令牌桶限制同一域名的启动速率"""
+        starts = []
+
+        def fake_task(urls, query):
+            starts.append(time.monotonic())
+            return {"success": True}
+
+        with TaskScheduler(max_workers=2, max_per_domain=2, rate_per_domain=20.0, task_fn=fake_task) as scheduler:
+            for _ in range(3):
+                scheduler.submit("https://example.com", "q")
+
+        gaps = [b - a for a, b in zip(sorted(starts), sorted(starts)[1:])]
+        assert all(gap >= 0.04 for gap in gaps)
+
+    def test_priority_and_deadline_order(self):
+        """测试高优先级、截止时间更早的任务先执行"""
+        order = []
+        started = threading.Event()
+        gate = threading.Event()
+
+        def fake_task(urls, query, timeout=600):
+            started.set()
+            gate.wait(timeout=5)
+            order.append(query)
+            return {"success": True}
+
+        with TaskScheduler(max_workers=1, max_per_domain=1, rate_per_domain=None, task_fn=fake_task) as scheduler:
+            scheduler.submit("https://a.com", "blocker")
+            started.wait(timeout=5)
+            now = time.time()
+            scheduler.submit("https://b.com", "bulk")
+            scheduler.submit("https://c.com", "urgent-late", priority=5, deadline=now + 60)
+            scheduler.submit("https://d.com", "urgent-soon", priority=5, deadline=now + 30)
+            gate.set()
+
+        assert order == ["blocker", "urgent-soon", "urgent-late", "bulk"]
+
+    def test_expired_task_dropped_and_budget_passed(self):
+        """测试过期任务被丢弃，剩余预算作为 timeout 传入"""
+        timeouts = []
+        started = threading.Event()
+        gate = threading.Event()
+
+        def fake_task(urls, query, timeout=600):
+            started.set()
+            gate.wait(timeout=5)
+            timeouts.append(timeout)
+            return {"success": True}
+
+        with TaskScheduler(max_workers=1, max_per_domain=1, rate_per_domain=None, task_fn=fake_task) as scheduler:
+            scheduler.submit("https://a.com", "blocker")
+            started.wait(timeout=5)
+            expired = scheduler.submit("https://b.com", "q", deadline=time.time() + 1.2)
+            scheduler.submit("https://c.com", "q", deadline=time.time() + 30, timeout=600)
+            time.sleep(0.3)
+            gate.set()
+
+        assert expired.result() == {"success": False, "error": "任务已过期"}
+        assert scheduler.stats()["b.com"]["expired"] == 1
+        assert 25 < timeouts[-1] <= 30
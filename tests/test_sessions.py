@@ -0,0 +1,308 @@
+"""
+测试浏览器会话池与会话生命周期管理
+"""
+
+import itertools
+import time
+
+import pytest
+
+from src.health import HealthProber, install_health_prober
+from src.main import close_session, execute_browser_task
+from src.sessions import SessionManager, SessionPool, install_session_manager, install_session_pool
+from tests.fake_backend import FakeBackend
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestSessionPool:
+    """测试热会话池"""
+
+    def test_prefill_and_hit(self):
+        """测试后台预热会话，并在取用时统计命中"""
+        counter = itertools.count()
+        pool = SessionPool(size=2, create_fn=lambda: f"s{next(counter)}", close_fn=lambda sid: None)
+        try:
+            assert _wait_for(lambda: pool.stats()["idle"] == 2)
+            assert pool.acquire() == "s0"
+            stats = pool.stats()
+            assert stats["hits"] == 1
+            assert stats["in_use"] == 1
+        finally:
+            pool.close()
+
+    def test_miss_when_empty(self):
+        """测试池中无就绪会话时返回 None"""
+        def failing_create():
+            raise RuntimeError("后端不可用")
+
+        pool = SessionPool(size=1, refill_interval=0.05, create_fn=failing_create, close_fn=lambda sid: None)
+        try:
+            assert pool.acquire() is None
+            assert pool.stats()["misses"] == 1
+            assert _wait_for(lambda: pool.stats()["create_failures"] >= 1)
+        finally:
+            pool.close()
+
+    def test_recycle_after_max_uses(self):
+        """测试会话达到使用次数上限后关闭"""
+        closed = []
+        counter = itertools.count()
+        pool = SessionPool(
+            size=1, max_uses=2, create_fn=lambda: f"s{next(counter)}", close_fn=closed.append, reset_fn=lambda sid: None
+        )
+        try:
+            assert _wait_for(lambda: pool.stats()["idle"] == 1)
+            for _ in range(2):
+                session_id = pool.acquire()
+                pool.release(session_id)
+            assert closed == ["s0"]
+            assert _wait_for(lambda: pool.acquire() == "s1")
+        finally:
+            pool.close()
+
+    def test_reset_before_reuse(self):
+        """测试归还的会话先重置再放回池中，重置失败的会话被关闭"""
+        closed, reset = [], []
+        counter = itertools.count()
+
+        def reset_fn(session_id):
+            reset.append(session_id)
+            if session_id == "s1":
+                raise RuntimeError("重置失败")
+
+        pool = SessionPool(size=1, create_fn=lambda: f"s{next(counter)}", close_fn=closed.append, reset_fn=reset_fn)
+        try:
+            assert _wait_for(lambda: pool.stats()["idle"] == 1)
+            pool.release(pool.acquire())
+            assert reset == ["s0"] and not closed
+            assert pool.acquire() == "s0"
+            pool.release("s0", discard=True)
+            assert _wait_for(lambda: pool.stats()["idle"] == 1)
+            pool.release(pool.acquire())
+            assert reset == ["s0", "s1"]
+            assert closed == ["s0", "s1"]
+            assert pool.stats()["reset_failures"] == 1
+        finally:
+            pool.close()
+
+    def test_idle_ttl_expiry(self):
+        """测试空闲超时的会话被回收"""
+        closed = []
+        counter = itertools.count()
+        pool = SessionPool(
+            size=1, idle_ttl=0.05, refill_interval=0.02, create_fn=lambda: f"s{next(counter)}", close_fn=closed.append
+        )
+        try:
+            assert _wait_for(lambda: "s0" in closed)
+        finally:
+            pool.close()
+
+
+class TestSessionPoolInTask:
+    """测试任务执行使用热会话"""
+
+    def test_task_uses_warm_session(self, fake_backend):
+        """测试未指定 session_id 的任务使用池中的热会话，归还前重置，关闭时释放后端会话"""
+        pool = SessionPool(size=1)
+        previous = install_session_pool(pool)
+        try:
+            assert _wait_for(lambda: pool.stats()["idle"] == 1)
+            result = execute_browser_task(urls="https://example.com", query="提取标题")
+            warm_session = fake_backend.requests[-1]["session_id"]
+            assert warm_session.startswith("warm-")
+            assert pool.stats()["hit_rate"] == 1.0
+            assert fake_backend.reset_sessions == [warm_session]
+        finally:
+            install_session_pool(previous)
+            pool.close()
+
+        # 池中的会话会交给其他任务，不返回给调用方
+        assert result["success"] is True
+        assert "session_id" not in result
+        assert warm_session in fake_backend.closed_sessions
+
+
+class TestSessionPoolWithHealth:
+    """测试会话池按健康探测结果选择后端"""
+
+    @pytest.fixture
+    def backends(self, monkeypatch):
+        first, second = FakeBackend().start(), FakeBackend().start()
+        first.capacity = second.capacity = 4
+        monkeypatch.setenv("BROWSER_API_URL", f"{first.url},{second.url}")
+        prober = HealthProber(max_staleness=60)
+        previous = install_health_prober(prober)
+        yield first, second, prober
+        install_health_prober(previous)
+        first.stop()
+        second.stop()
+
+    def test_pool_sessions_created_on_healthy_backend(self, backends):
+        """测试主后端不健康时热会话在健康的后端创建，任务随会话发往该后端"""
+        first, second, prober = backends
+        first.healthy = False
+        prober.probe_all()
+        pool = SessionPool(size=1)
+        previous = install_session_pool(pool)
+        try:
+            assert _wait_for(lambda: pool.stats()["idle"] == 1)
+            result = execute_browser_task(urls="https://example.com", query="提取标题")
+        finally:
+            install_session_pool(previous)
+            pool.close()
+
+        assert result["success"] is True
+        assert not first.sessions and not first.requests
+        assert second.requests[-1]["session_id"].startswith("warm-")
+        assert second.reset_sessions == [second.requests[-1]["session_id"]]
+
+    def test_session_on_unhealthy_backend_discarded(self, backends):
+        """测试热会话所在后端变为不健康时关闭该会话，任务改发健康的后端"""
+        first, second, prober = backends
+        prober.probe_all()
+        pool = SessionPool(size=1, refill_interval=60)
+        previous = install_session_pool(pool)
+        try:
+            assert _wait_for(lambda: pool.stats()["idle"] == 1)
+            warm_session = next(iter(first.sessions))
+            first.healthy = False
+            prober.probe_all()
+            result = execute_browser_task(urls="https://example.com", query="提取标题")
+        finally:
+            install_session_pool(previous)
+            pool.close()
+
+        assert result["success"] is True
+        assert not first.requests
+        assert "session_id" not in second.requests[-1]
+        assert warm_session in first.closed_sessions
+
+
+class TestSessionManager:
+    """测试会话生命周期管理器"""
+
+    def test_evicts_least_recently_used(self):
+        """测试超出会话上限时关闭最久未使用的会话"""
+        closed = []
+        manager = SessionManager(max_sessions=2, reap_interval=None, close_fn=closed.append)
+        manager.touch("a")
+        manager.touch("b")
+        manager.touch("a")
+        manager.touch("c")
+        assert closed == ["b"]
+        assert manager.stats()["open"] == 2
+
+    def test_active_session_not_closed(self):
+        """测试执行中的会话不会因空闲超时或超出上限被关闭"""
+        closed = []
+        manager = SessionManager(max_sessions=1, idle_ttl=0.0, reap_interval=None, close_fn=closed.append)
+        manager.acquire("a")
+        manager.touch("b")
+        assert closed == ["b"]
+        time.sleep(0.01)
+        assert manager.close_idle() == 0
+
+        manager.release("a")
+        time.sleep(0.01)
+        assert manager.close_idle() == 1
+        assert closed == ["b", "a"]
+
+    def test_background_reaper(self):
+        """测试后台线程关闭空闲会话"""
+        closed = []
+        manager = SessionManager(idle_ttl=0.05, reap_interval=0.02, close_fn=closed.append)
+        try:
+            manager.touch("a")
+            assert _wait_for(lambda: closed == ["a"])
+        finally:
+            manager.close_all()
+
+    def test_context_manager_closes_session(self, fake_backend):
+        """测试多步骤工作流结束后立即关闭后端会话"""
+        manager = SessionManager(reap_interval=None)
+        with manager.session() as session:
+            first = session.run("https://example.com/login", "登录")
+            session.run("https://example.com/report", "下载报表")
+            assert fake_backend.requests[-1]["session_id"] == first["session_id"]
+
+        assert fake_backend.closed_sessions == [first["session_id"]]
+        assert manager.stats()["open"] == 0
+
+    def test_workflow_does_not_use_pool(self, fake_backend):
+        """测试启用会话池时工作流使用自己的会话，退出时不会关闭池中的会话"""
+        pool = SessionPool(size=1)
+        manager = SessionManager(reap_interval=None)
+        previous_pool = install_session_pool(pool)
+        previous_manager = install_session_manager(manager)
+        try:
+            assert _wait_for(lambda: pool.stats()["idle"] == 1)
+            with manager.session() as session:
+                session.run("https://example.com/login", "登录")
+                session.run("https://example.com/report", "下载报表")
+            workflow_session = session.session_id
+            assert not pool.owns(workflow_session)
+            assert [body["session_id"] for body in fake_backend.requests] == [workflow_session] * 2
+            assert fake_backend.closed_sessions == [workflow_session]
+
+            # 池中的会话仍然可用，且管理器不跟踪、不关闭它
+            execute_browser_task(urls="https://example.com", query="提取标题")
+            warm_session = fake_backend.requests[-1]["session_id"]
+            assert pool.owns(warm_session)
+            manager.touch(warm_session)
+            assert manager.close(warm_session) is False
+            assert manager.stats()["open"] == 0
+            assert warm_session not in fake_backend.closed_sessions
+        finally:
+            install_session_manager(previous_manager)
+            install_session_pool(previous_pool)
+            pool.close()
+
+    def test_tracks_task_sessions(self, fake_backend):
+        """测试安装后自动跟踪任务返回的会话"""
+        manager = SessionManager(idle_ttl=0.0, reap_interval=None)
+        previous = install_session_manager(manager)
+        try:
+            result = execute_browser_task(urls="https://example.com", query="提取标题")
+            assert manager.stats()["open"] == 1
+            time.sleep(0.01)
+            assert manager.close_idle() == 1
+        finally:
+            install_session_manager(previous)
+
+        assert fake_backend.closed_sessions == [result["session_id"]]
+
+
+class TestCloseSession:
+    """测试显式关闭会话"""
+
+    def test_close_session(self, fake_backend):
+        """测试关闭会话并停止跟踪"""
+        manager = SessionManager(reap_interval=None, close_fn=lambda sid: None)
+        previous = install_session_manager(manager)
+        try:
+            result = execute_browser_task(urls="https://example.com", query="提取标题")
+            closed = close_session(result["session_id"])
+        finally:
+            install_session_manager(previous)
+
+        assert closed == {"success": True, "message": "会话已关闭"}
+        assert fake_backend.closed_sessions == [result["session_id"]]
+        assert manager.stats()["open"] == 0
+
+    def test_close_unknown_session(self, fake_backend):
+        """测试关闭不存在的会话"""
+        result = close_session("missing")
+        assert result["success"] is False
+        assert result["error"] == "会话不存在或已过期"
+
+    def test_invalid_session_id(self):
+        """测试会话ID格式不正确"""
+        assert close_session("")["error"] == "会话ID格式不正确"
@@ -0,0 +1,129 @@
+"""
+测试 URL 分片与断点续跑
+"""
+
+import os
+from unittest.mock import Mock, patch
+
+from src.main import execute_browser_task
+from src.sharding import ShardCheckpoint, merge_shard_results, split_urls
+from tests.fake_backend import json_response
+
+
+def _success_response(text):
+    return json_response({
+        "status": "success",
+        "response": text,
+        "session_id": "shard-session"
+    })
+
+
+class TestSplitUrls:
+    """测试分片拆分"""
+
+    def test_split_by_count(self):
+        """测试按数量拆分"""
+        urls = [f"https://example.com/{i}" for i in range(5)]
+        shards = split_urls(urls, max_urls=2, max_chars=10000)
+        assert shards == [urls[0:2], urls[2:4], urls[4:5]]
+
+    def test_split_by_chars(self):
+        """测试按字符预算拆分，超长 URL 独占分片"""
+        urls = ["https://a.com", "https://b.com", "https://" + "x" * 50 + ".com"]
+        shards = split_urls(urls, max_urls=10, max_chars=30)
+        assert shards == [urls[0:2], urls[2:3]]
+
+
+class TestShardResults:
+    """测试检查点与结果合并"""
+
+    def test_checkpoint_roundtrip(self, tmp_path):
+        """测试检查点落盘后可重新加载"""
+        path = tmp_path / "run.json"
+        ShardCheckpoint(path).record("k1", {"success": True, "message": "ok"})
+        assert ShardCheckpoint(path).get("k1") == {"success": True, "message": "ok"}
+
+    def test_checkpoint_expires(self, tmp_path):
+        """测试超过有效期的分片结果视为未完成"""
+        path = tmp_path / "run.json"
+        with patch('src.sharding.time.time', return_value=1000):
+            ShardCheckpoint(path, ttl=60).record("k1", {"success": True, "message": "ok"})
+        with patch('src.sharding.time.time', return_value=1030):
+            assert ShardCheckpoint(path, ttl=60).get("k1") == {"success": True, "message": "ok"}
+        with patch('src.sharding.time.time', return_value=1100):
+            assert ShardCheckpoint(path, ttl=60).get("k1") is None
+
+    def test_merge_partial_failure(self):
+        """测试部分分片失败时的合并结果"""
+        merged = merge_shard_results([
+            {"success": True, "message": "a", "session_id": "s1", "files": ["a.pdf"]},
+            {"success": False, "error": "任务超时"}
+        ])
+        assert merged["success"] is False
+        assert merged["message"] == "a"
+        assert merged["files"] == ["a.pdf"]
+        assert merged["shards"] == {"total": 2, "succeeded": 1, "failed": 1}
+
+
+class TestShardedExecution:
+    """测试分片执行"""
+
+    @patch.dict(os.environ, {'BROWSER_API_URL': 'http://localhost:52101'})
+    @patch('src.main.requests.post')
+    def test_rerun_skips_completed_shards(self, mock_post, tmp_path):
+        """测试重跑时跳过已成功的分片"""
+        import requests
+
+        urls = [f"https://example.com/{i}" for i in range(4)]
+        outcomes = [_success_response("第一片"), requests.exceptions.Timeout(), _success_response("第二片")]
+        task_calls = []
+
+        def fake_post(url, json=None, timeout=None, **kwargs):
+            if url.endswith("/cancel"):
+                return Mock(status_code=200)
+            task_calls.append(json["query"])
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        mock_post.side_effect = fake_post
+
+        with patch('src.main.DATA_STATE', tmp_path), patch('src.main.SHARD_MAX_WORKERS', 1):
+            first = execute_browser_task(urls=urls, query="提取标题", max_urls_per_task=2)
+            assert first["success"] is False
+            assert first["shards"] == {"total": 2, "succeeded": 1, "failed": 1}
+
+            second = execute_browser_task(urls=urls, query="提取标题", max_urls_per_task=2)
+
+        assert second["success"] is True
+        assert second["message"] == "第一片\n\n第二片"
+        assert len(task_calls) == 3
+        assert not list((tmp_path / "shards").glob("*.json"))
+
+    @patch.dict(os.environ, {'BROWSER_API_URL': 'http://localhost:52101'})
+    @patch('src.main.requests.post')
+    def test_options_change_invalidates_checkpoint(self, mock_post, tmp_path):
+        """测试输出选项不同的重跑不复用已成功的分片"""
+        import requests
+
+        urls = [f"https://example.com/{i}" for i in range(4)]
+        outcomes = [_success_response("第一片")]
+
+        def fake_post(url, json=None, timeout=None, **kwargs):
+            if url.endswith("/cancel"):
+                return Mock(status_code=200)
+            if outcomes:
+                return outcomes.pop(0)
+            raise requests.exceptions.Timeout()
+
+        mock_post.side_effect = fake_post
+
+        with patch('src.main.DATA_STATE', tmp_path), patch('src.main.SHARD_MAX_WORKERS', 1):
+            def run(**kwargs):
+                return execute_browser_task(urls=urls, query="提取标题", max_urls_per_task=2, **kwargs)
+
+            assert run()["shards"]["succeeded"] == 1
+            assert run(output_format="csv")["shards"]["succeeded"] == 0
+            assert run(session_id="other-session")["shards"]["succeeded"] == 0
+            assert run()["shards"]["succeeded"] == 1
@@ -0,0 +1,135 @@
+"""
+测试任务响应的流式解析
+"""
+
+import base64
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src import streaming
+from src.main import execute_browser_task
+from src.streaming import parse_task_response
+
+
+def _chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestParseTaskResponse:
+    """测试流式 JSON 解析"""
+
+    def test_matches_json_loads(self, tmp_path):
+        """测试普通字段的解析结果与 json.loads 一致（含转义和多字节字符）"""
+        payload = {
+            "status": "success",
+            "response": "完成 \"引号\" \\ 😀\n",
+            "values": [1, -2.5e3, True, False, None, {}, []],
+            "result": {"type": "text", "content": "这是页面内容"}
+        }
+        for ensure_ascii in (True, False):
+            data = json.dumps(payload, ensure_ascii=ensure_ascii).encode("utf-8")
+            assert parse_task_response(_chunks(data, 3), tmp_path) == payload
+        assert not list(tmp_path.iterdir())
+
+    def test_inline_content_spooled(self, tmp_path):
+        """测试内联文件内容流式解码到暂存文件"""
+        content = os.urandom(200_000)
+        payload = {
+            "status": "success",
+            "result": {
+                "type": "file_inline",
+                "filename": "report.pdf",
+                "content": base64.encodebytes(content).decode(),
+                "mime_type": "application/pdf"
+            }
+        }
+        result = parse_task_response(_chunks(json.dumps(payload).encode(), 4096), tmp_path)
+
+        assert "content" not in result["result"]
+        assert result["result"]["content_size"] == len(content)
+        assert open(result["result"]["content_path"], "rb").read() == content
+        assert result["result"]["filename"] == "report.pdf"
+
+    def test_invalid_base64(self, tmp_path):
+        """测试内联内容不是有效 base64 时标记错误并删除暂存文件"""
+        payload = {"result": {"type": "file_inline", "content": "!!!不是base64"}}
+        result = parse_task_response([json.dumps(payload).encode()], tmp_path)
+        assert "content_path" not in result["result"]
+        assert result["result"]["content_error"]
+        assert not list(tmp_path.iterdir())
+
+    def test_streams_only_large_inline_files(self, tmp_path):
+        """测试超过缓冲上限且含内联文件的响应才流式解析，其余响应用 json.loads"""
+        content = os.urandom(3000)
+        inline = {"status": "success", "result": {"type": "file_inline", "content": base64.b64encode(content).decode()}}
+        records = {"status": "success", "result": {"type": "records", "records": [{"id": i} for i in range(500)]}}
+
+        with patch("src.streaming.BUFFERED_PARSE_LIMIT", 1000), \
+                patch("src.streaming._parse_streaming", wraps=streaming._parse_streaming) as streamed:
+            result = parse_task_response(_chunks(json.dumps(records).encode(), 512), tmp_path)
+            assert result == records
+            assert not streamed.called
+
+            result = parse_task_response(_chunks(json.dumps(inline).encode(), 512), tmp_path)
+            assert streamed.call_count == 1
+            assert open(result["result"]["content_path"], "rb").read() == content
+
+    def test_truncated_response(self, tmp_path):
+        """测试响应不完整时报错并清理暂存文件"""
+        data = json.dumps({"result": {"type": "file_inline", "content": "QUJD" * 100}}).encode()
+        with pytest.raises(ValueError):
+            parse_task_response([data[:-10]], tmp_path)
+        assert not list(tmp_path.iterdir())
+
+
+class TestInlineFileTask:
+    """测试任务执行中的内联文件保存"""
+
+    def test_inline_file_saved(self, fake_backend, tmp_path):
+        """测试内联文件从暂存目录移动到输出目录"""
+        content = os.urandom(100_000)
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "已下载",
+            "session_id": "s",
+            "result": {
+                "type": "file_inline",
+                "filename": "名单.pdf",
+                "content": base64.b64encode(content).decode(),
+                "mime_type": "application/pdf"
+            }
+        }
+        with patch("src.main.DATA_OUTPUTS", tmp_path / "outputs"), patch("src.main.DATA_SPOOL", tmp_path / "spool"):
+            result = execute_browser_task(urls="https://example.com", query="下载名单")
+
+        assert result["files"] == ["名单.pdf"]
+        assert (tmp_path / "outputs" / "名单.pdf").read_bytes() == content
+        assert not list((tmp_path / "spool").iterdir())
+
+    def test_unused_inline_file_removed(self, fake_backend, tmp_path):
+        """测试结果未被保存时（如任务失败）删除内联文件的暂存内容"""
+        fake_backend.task_result = {
+            "status": "error",
+            "error": {"message": "页面加载失败"},
+            "result": {"type": "file_inline", "filename": "a.pdf", "content": base64.b64encode(b"%PDF").decode()}
+        }
+        with patch("src.main.DATA_OUTPUTS", tmp_path / "outputs"), patch("src.main.DATA_SPOOL", tmp_path / "spool"):
+            result = execute_browser_task(urls="https://example.com", query="下载")
+
+        assert result["success"] is False
+        assert not list((tmp_path / "spool").iterdir())
+
+    def test_invalid_inline_file(self, fake_backend, tmp_path):
+        """测试内联内容无效时返回文件保存失败"""
+        fake_backend.task_result = {
+            "status": "success",
+            "result": {"type": "file_inline", "filename": "a.pdf", "content": "!!!"}
+        }
+        with patch("src.main.DATA_OUTPUTS", tmp_path / "outputs"), patch("src.main.DATA_SPOOL", tmp_path / "spool"):
+            result = execute_browser_task(urls="https://example.com", query="下载")
+
+        assert result["success"] is False
+        assert result["error"] == "文件保存失败"
@@ -0,0 +1,105 @@
+"""
+测试自适应超时
+"""
+
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.main import _download_file_from_api, execute_browser_task
+from src.timeouts import LatencyTracker, iter_with_throughput
+from tests.fake_backend import json_response
+
+
+class TestLatencyTracker:
+    """测试滚动耗时统计"""
+
+    def test_default_until_enough_samples(self):
+        """测试样本不足时使用默认超时"""
+        tracker = LatencyTracker(min_samples=5)
+        for _ in range(4):
+            tracker.record("example.com", "task", 10)
+        assert tracker.adaptive_timeout("example.com", "task", default=600) == 600
+
+    def test_timeout_from_percentile(self):
+        """测试按分位数和系数推算超时，并限制上下限"""
+        tracker = LatencyTracker(min_samples=5)
+        for seconds in [10, 20, 30, 40, 50]:
+            tracker.record("example.com", "task", seconds)
+        assert tracker.percentile("example.com", "task", 50) == 30
+        assert tracker.adaptive_timeout("example.com", "task", default=600, percentile=99) == 100
+        assert tracker.adaptive_timeout("example.com", "task", default=80) == 80
+        assert tracker.adaptive_timeout("example.com", "task", default=600, percentile=1, floor=30) == 30
+
+    def test_window_is_bounded(self):
+        """测试只保留最近的样本"""
+        tracker = LatencyTracker(window=3, min_samples=1)
+        for seconds in [100, 1, 1, 1]:
+            tracker.record("example.com", "task", seconds)
+        assert tracker.percentile("example.com", "task", 100) == 1
+
+
+class TestThroughput:
+    """测试按吞吐量判定的下载超时"""
+
+    def test_slow_stream_aborts(self):
+        """测试宽限期后速度过低时中止"""
+        with patch('src.timeouts.time.monotonic', side_effect=[0, 20]):
+            chunks = iter_with_throughput(
+                [b"a" * 100, b"a" * 100], min_bytes_per_sec=1000, grace=10, expected_bytes=1000)
+            assert next(chunks) == b"a" * 100
+            with pytest.raises(TimeoutError):
+                next(chunks)
+
+    def test_time_to_first_byte_not_counted(self):
+        """测试首字节前的等待不计入速度，小文件晚到也能完成"""
+        with patch('src.timeouts.time.monotonic', side_effect=[30, 31]):
+            chunks = iter_with_throughput(
+                [b"a" * 50, b"a" * 50], min_bytes_per_sec=1000, grace=0, expected_bytes=100)
+            assert list(chunks) == [b"a" * 50, b"a" * 50]
+
+    def test_complete_or_unknown_size_not_checked(self):
+        """测试已收完或总大小未知时不做速度判定"""
+        with patch('src.timeouts.time.monotonic', side_effect=[0, 20, 0, 20]):
+            assert len(list(iter_with_throughput(
+                [b"a", b"a"], min_bytes_per_sec=1000, grace=10, expected_bytes=2))) == 2
+            assert len(list(iter_with_throughput([b"a", b"a"], min_bytes_per_sec=1000, grace=10))) == 2
+
+    @patch.dict(os.environ, {'BROWSER_API_URL': 'http://localhost:52101'})
+    @patch('src.main.requests.get')
+    def test_partial_download_removed(self, mock_get, tmp_path):
+        """测试下载中断时删除未写完的文件"""
+        def broken_stream(chunk_size):
+            yield b"partial"
+            raise TimeoutError()
+
+        mock_get.return_value.iter_content.side_effect = broken_stream
+
+        with patch('src.main.DATA_OUTPUTS', Path(tmp_path)):
+            result = _download_file_from_api({"result": {"file_id": "f1", "filename": "big.zip"}})
+
+        assert result is None
+        assert not (tmp_path / "big.zip").exists()
+
+
+class TestAdaptiveTimeoutInTask:
+    """测试任务执行使用自适应超时"""
+
+    @patch.dict(os.environ, {'BROWSER_API_URL': 'http://localhost:52101'})
+    @patch('src.main.requests.post')
+    def test_learned_timeout_used(self, mock_post):
+        """测试启用后按历史耗时设置请求超时"""
+        mock_post.return_value = json_response({"status": "success", "response": "ok"})
+
+        tracker = LatencyTracker(min_samples=3)
+        for _ in range(3):
+            tracker.record("slow-site.com", "task", 40)
+
+        with patch('src.main._LATENCY', tracker):
+            execute_browser_task(urls="https://slow-site.com", query="提取", adaptive_timeout=True)
+            assert mock_post.call_args.kwargs["timeout"] == 80
+
+            execute_browser_task(urls="https://slow-site.com", query="提取")
+            assert mock_post.call_args.kwargs["timeout"] == 600
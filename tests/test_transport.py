@@ -0,0 +1,139 @@
+"""
+测试传输层
+"""
+
+import sys
+
+import pytest
+
+from src.main import download_bundle, execute_browser_task
+from src.transport import (
+    HttpxTransport,
+    RequestsTransport,
+    create_transport,
+    get_transport,
+    install_transport,
+    normalize_base_url,
+    split_unix_url,
+)
+from tests.fake_backend import FakeBackend
+
+
+@pytest.fixture
+def http2_transport():
+    """安装 httpx 传输，测试结束后恢复"""
+    pytest.importorskip("httpx")
+    pytest.importorskip("h2")
+    transport = create_transport("http2")
+    previous = install_transport(transport)
+    yield transport
+    install_transport(previous)
+    transport.close()
+
+
+class TestTransportSelection:
+    """测试默认传输的选择"""
+
+    def test_env_selection_falls_back(self, monkeypatch):
+        """测试不支持的传输方式回退到 requests"""
+        previous = install_transport(None)
+        try:
+            monkeypatch.setenv("BROWSER_API_TRANSPORT", "carrier-pigeon")
+            assert isinstance(get_transport(), RequestsTransport)
+        finally:
+            install_transport(previous)
+
+    def test_unknown_name_rejected(self):
+        """测试 create_transport 拒绝未知名称"""
+        with pytest.raises(ValueError):
+            create_transport("carrier-pigeon")
+
+    def test_missing_httpx(self, monkeypatch):
+        """测试缺少 httpx 时给出明确的 ImportError"""
+        monkeypatch.setitem(sys.modules, "httpx", None)
+        with pytest.raises(ImportError, match="httpx"):
+            HttpxTransport()
+
+
+class TestHttpxTransport:
+    """测试 httpx 传输与后端的完整往返"""
+
+    def test_tasks_and_downloads_reuse_connections(self, fake_backend, http2_transport, outputs):
+        """测试任务、文件下载和文件包下载经连接池完成"""
+        fake_backend.files["f1"] = b"%PDF-1.7"
+        fake_backend.bundles["fake-session"] = b"PK\x03\x04"
+        fake_backend.task_result = {
+            "status": "success",
+            "response": "完成",
+            "session_id": "fake-session",
+            "result": {"type": "file_reference", "file_id": "f1", "filename": "a.pdf"}
+        }
+
+        for _ in range(3):
+            result = execute_browser_task(urls="https://example.com", query="下载")
+            assert result["files"] == ["a.pdf"]
+        assert download_bundle("fake-session")["success"]
+
+        assert (outputs / "a.pdf").read_bytes() == b"%PDF-1.7"
+        assert len(fake_backend.connections) < 7
+
+    def test_errors_mapped_to_requests_exceptions(self, fake_backend, http2_transport, outputs):
+        """测试 HTTP 错误和超时按 requests 异常处理"""
+        assert download_bundle("missing")["error"] == "未找到该会话的文件"
+
+        fake_backend.task_delay = 2
+        result = execute_browser_task(urls="https://example.com", query="慢任务", timeout=0.3, task_id="slow")
+        assert result["error"] == "任务超时"
+        assert fake_backend.wait_cancelled("slow")
+
+
+class TestUnixSocket:
+    """测试经 Unix 域套接字访问后端"""
+
+    @pytest.fixture
+    def unix_backend(self, tmp_path, monkeypatch, outputs):
+        backend = FakeBackend().start(unix_socket=str(tmp_path / "backend.sock"))
+        monkeypatch.setenv("BROWSER_API_URL", backend.url)
+        backend.files["f1"] = b"%PDF-1.7" * 10000
+        backend.bundles["fake-session"] = b"PK\x03\x04"
+        backend.task_result = {
+            "status": "success",
+            "response": "完成",
+            "session_id": "fake-session",
+            "result": {"type": "file_reference", "file_id": "f1", "filename": "a.pdf"}
+        }
+        yield backend
+        backend.stop()
+
+    def test_normalize_base_url(self):
+        """测试 unix:// 地址转换为可拼接路径的形式"""
+        url = normalize_base_url("unix:///run/browser api.sock/")
+        assert url == "http+unix://%2Frun%2Fbrowser%20api.sock"
+        assert split_unix_url(f"{url}/downloads/f1?x=1") == ("/run/browser api.sock", "/downloads/f1?x=1")
+        assert normalize_base_url(" http://host:52101/ ") == "http://host:52101"
+
+    @pytest.mark.parametrize("name", ["requests", "http2"])
+    def test_tasks_and_downloads(self, unix_backend, outputs, name):
+        """测试任务、流式下载和文件包下载都经套接字完成，连接被复用"""
+        if name == "http2":
+            pytest.importorskip("httpx")
+            pytest.importorskip("h2")
+        transport = create_transport(name)
+        previous = install_transport(transport)
+        try:
+            for _ in range(3):
+                assert execute_browser_task(urls="https://example.com", query="下载")["files"] == ["a.pdf"]
+            assert download_bundle("fake-session")["success"]
+            assert download_bundle("missing")["error"] == "未找到该会话的文件"
+        finally:
+            install_transport(previous)
+            transport.close()
+
+        assert (outputs / "a.pdf").read_bytes() == unix_backend.files["f1"]
+        assert len(unix_backend.requests) == 3
+        assert len(unix_backend.connections) <= 2
+
+    def test_missing_socket(self, tmp_path, monkeypatch):
+        """测试套接字不存在时按连接失败处理"""
+        monkeypatch.setenv("BROWSER_API_URL", f"unix://{tmp_path}/missing.sock")
+        assert execute_browser_task(urls="https://example.com", query="提取")["error"] == "API 请求失败"
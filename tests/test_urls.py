@@ -0,0 +1,76 @@
+"""
+测试 URL 规范化与去重
+"""
+
+import os
+from unittest.mock import patch
+
+from src.main import execute_browser_task
+from src.urls import canonicalize_url, dedupe_urls, resolve_url_rules
+from tests.fake_backend import json_response
+
+
+class TestCanonicalizeUrl:
+    """测试 URL 规范化规则"""
+
+    def test_default_rules(self):
+        """测试默认规则：小写主机、默认端口、跟踪参数、片段、尾部斜杠"""
+        url = "HTTPS://Example.COM:443/list/?utm_source=feed&page=2&gclid=abc#top"
+        assert canonicalize_url(url) == "https://example.com/list?page=2"
+
+    def test_query_encoding_preserved(self):
+        """测试保留查询参数的原始编码，只移除跟踪参数"""
+        url = "https://example.com/s?flag&q=a%20b&path=/x/y"
+        assert canonicalize_url(url) == url
+        stripped = canonicalize_url("https://example.com/s?flag&utm_medium=x&q=a%20b")
+        assert stripped == "https://example.com/s?flag&q=a%20b"
+
+    def test_keep_non_default_port(self):
+        """测试保留非默认端口"""
+        assert canonicalize_url("http://example.com:8080/") == "http://example.com:8080"
+
+    def test_rules_override(self):
+        """测试覆盖默认规则"""
+        rules = resolve_url_rules({"drop_fragment": False, "strip_tracking_params": False})
+        url = "https://example.com/a?utm_source=x#section"
+        assert canonicalize_url(url, rules) == "https://example.com/a?utm_source=x#section"
+
+    def test_unparseable_url_unchanged(self):
+        """测试无法解析的 URL 原样返回"""
+        assert canonicalize_url(" example.com/path ") == "example.com/path"
+
+    def test_hash_routes_kept(self):
+        """测试单页应用的哈希路由不被当作锚点去除，不同路由不会合并"""
+        urls = ["https://app.example.com/#/reports/a", "https://app.example.com/#/reports/b", "https://a.com/#!/x"]
+        unique, _ = dedupe_urls(urls)
+        assert unique == [
+            "https://app.example.com#/reports/a", "https://app.example.com#/reports/b", "https://a.com#!/x"
+        ]
+
+    def test_dedupe_keeps_first_order(self):
+        """测试去重保持首次出现顺序并记录映射"""
+        unique, url_map = dedupe_urls(["https://b.com/", "https://a.com", "https://B.com#x"])
+        assert unique == ["https://b.com", "https://a.com"]
+        assert url_map["https://B.com#x"] == "https://b.com"
+
+
+class TestCanonicalizeInTask:
+    """测试任务执行中的 URL 去重"""
+
+    @patch.dict(os.environ, {'BROWSER_API_URL': 'http://localhost:52101'})
+    @patch('src.main.requests.post')
+    def test_duplicates_visited_once(self, mock_post):
+        """测试等价 URL 只出现在查询中一次，并映射回原始 URL"""
+        mock_post.return_value = json_response({"status": "success", "response": "完成", "session_id": "s"})
+
+        result = execute_browser_task(
+            urls=["https://example.com/", "https://example.com/?utm_medium=email"],
+            query="提取标题"
+        )
+
+        sent_query = mock_post.call_args.kwargs["json"]["query"]
+        assert sent_query == "访问 https://example.com，然后提取标题"
+        assert result["url_map"] == {
+            "https://example.com/": "https://example.com",
+            "https://example.com/?utm_medium=email": "https://example.com"
+        }